@@ -0,0 +1,160 @@
+# benchmarks/calibrate.py
+"""
+Finds the split of CPU cores into inference processes and threads that enhances the most images
+per second on this machine.
+
+    python -m benchmarks.calibrate
+    python -m benchmarks.calibrate --splits 1x8 2x4 4x2 --affinity cores --seconds 120
+
+Every split runs that many processes, each a PicturePerfectEnhancer with its share of the
+threads, enhancing the same synthetic image back to back for --seconds. The face detector is
+replaced by one that finds the synthetic faces, as in the pipeline benchmark, and randomly
+initialized weights stand in for missing checkpoints. The best split is printed as the
+INFERENCE_PROCESSES and THREADS_PER_WORKER to put in config.py.
+"""
+import os
+import json
+import time
+import queue
+import argparse
+import tempfile
+import multiprocessing
+from threading import BrokenBarrierError
+
+import config
+from benchmarks.run import environment, parse_resolution, pipeline_settings
+from benchmarks.workloads import ensure_checkpoints, fixed_detector, synthetic_image
+from src.core.cpu import AFFINITY_MODES, plan_workers, usable_cores
+
+
+def _worker(settings, workspace, plan, image, faces, seconds, barrier, results):
+    """One inference process of a split: loads the models, then counts the images it enhances in `seconds`."""
+    from src.core.enhancer import PicturePerfectEnhancer
+
+    try:
+        # The face helper looks for its models relative to the working directory.
+        os.chdir(workspace)
+        enhancer = PicturePerfectEnhancer(settings, worker_plan=plan)
+        enhancer.load_models_into_memory()
+        enhancer.face_helper.face_det.detect_faces = fixed_detector(faces)
+        enhancer.enhance_timed(image, settings.UPSCALE_FACTOR)  # Warm-up
+        # Every process starts timing together, so the split is measured under full load.
+        barrier.wait()
+        count, start = 0, time.perf_counter()
+        while time.perf_counter() - start < seconds:
+            enhancer.enhance_timed(image, settings.UPSCALE_FACTOR)
+            count += 1
+        results.put((plan.index, count, time.perf_counter() - start, None))
+        enhancer.close()
+    except BrokenBarrierError:
+        results.put((plan.index, 0, 0.0, "another process of the split failed"))
+    except Exception as e:
+        barrier.abort()
+        results.put((plan.index, 0, 0.0, f"{type(e).__name__}: {e}"))
+
+
+def candidate_splits(cores: int, max_processes: int) -> list:
+    """(processes, threads) pairs that use every core: 1 x cores, 2 x cores/2, ..."""
+    return [(processes, cores // processes) for processes in range(1, min(cores, max_processes) + 1)
+            if cores % processes == 0]
+
+
+def run_split(settings, workspace, processes, threads, args, image, faces) -> dict:
+    context = multiprocessing.get_context("spawn")
+    plans = plan_workers(processes, threads, args.affinity, config.INTEROP_THREADS)
+    barrier = context.Barrier(processes)
+    results = context.Queue()
+    workers = [context.Process(target=_worker, name=f"calibrate-{plan.index}", daemon=True,
+                               args=(settings, workspace, plan, image, faces, args.seconds, barrier, results))
+               for plan in plans]
+    for worker in workers:
+        worker.start()
+    reports = []
+    while len(reports) < processes:
+        try:
+            reports.append(results.get(timeout=5))
+        except queue.Empty:
+            # A process that died without reporting (e.g. killed for memory) fails the split.
+            if any(not worker.is_alive() and worker.exitcode for worker in workers):
+                barrier.abort()
+                reports.append((None, 0, 0.0, "an inference process exited unexpectedly"))
+                break
+    for worker in workers:
+        worker.join(timeout=30)
+        if worker.is_alive():
+            worker.kill()
+
+    entry = {"processes": processes, "threads": threads, "affinity": args.affinity,
+             "cores": [plan.to_dict()["cores"] for plan in plans]}
+    errors = [error for _, _, _, error in reports if error]
+    if errors:
+        entry["error"] = errors[0]
+        return entry
+    entry["images"] = sum(count for _, count, _, _ in reports)
+    entry["images_per_second"] = round(sum(count / elapsed for _, count, elapsed, _ in reports), 4)
+    return entry
+
+
+def parse_split(value: str):
+    processes, threads = value.lower().split("x")
+    return int(processes), int(threads)
+
+
+def main(argv=None):
+    cores = len(usable_cores())
+    parser = argparse.ArgumentParser(description="Measures which split of the CPU cores into inference "
+                                                 "processes and threads enhances the most images per second.")
+    parser.add_argument("--splits", nargs="+", type=parse_split,
+                        help="PROCESSESxTHREADS pairs to try (default: every even split of the cores)")
+    parser.add_argument("--max-processes", type=int, default=cores,
+                        help="skip splits with more processes; each one holds its own copy of the models")
+    parser.add_argument("--affinity", choices=AFFINITY_MODES[1:], help="pin the processes, as config.CPU_AFFINITY")
+    parser.add_argument("--resolution", type=parse_resolution, default=(512, 512), help="image size, as WIDTHxHEIGHT")
+    parser.add_argument("--faces", type=int, default=1)
+    parser.add_argument("--seconds", type=float, default=60, help="how long each split is measured")
+    parser.add_argument("--precision", default=config.CPU_PRECISION, help="CPU precision (fp32, bf16, int8)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--random-weights", action="store_true", help="ignore downloaded checkpoints")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    splits = args.splits or candidate_splits(cores, args.max_processes)
+    image, faces = synthetic_image(*args.resolution, args.faces, args.seed)
+    results = []
+    with tempfile.TemporaryDirectory(prefix="pp-calibrate-") as temp_dir:
+        use_real = not args.random_weights and all(
+            os.path.exists(os.path.join(dest_dir, filename)) for _, filename, _, dest_dir, _ in config.REQUIRED_MODELS)
+        workspace = config.BASE_DIR if use_real else temp_dir
+        settings = pipeline_settings(args, workspace)
+        if not use_real:
+            generated = ensure_checkpoints(settings.REQUIRED_MODELS, args.seed)
+            print(f"Using randomly initialized weights for: {', '.join(generated)}", flush=True)
+
+        print(f"Calibrating on {cores} core(s) with a {args.resolution[1]}x{args.resolution[0]} image "
+              f"and {args.faces} face(s), {args.seconds:g}s per split.", flush=True)
+        for processes, threads in splits:
+            entry = run_split(settings, workspace, processes, threads, args, image, faces)
+            results.append(entry)
+            outcome = entry.get("error") or f"{entry['images_per_second']:.3f} images/s ({entry['images']} images)"
+            print(f"  {processes:>3} process(es) x {threads:>3} thread(s): {outcome}", flush=True)
+
+    measured = [entry for entry in results if "error" not in entry]
+    best = max(measured, key=lambda entry: entry["images_per_second"]) if measured else None
+    if best:
+        print(f"\nBest: {best['processes']} process(es) x {best['threads']} thread(s), "
+              f"{best['images_per_second']:.3f} images/s. In config.py:")
+        print(f"  INFERENCE_PROCESSES = {best['processes'] if best['processes'] > 1 else 0}")
+        print(f"  THREADS_PER_WORKER = {best['threads']}")
+        if args.affinity:
+            print(f"  CPU_AFFINITY = \"{args.affinity}\"")
+
+    report = {"environment": environment(), "arguments": vars(args), "results": results, "best": best}
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nWrote {len(results)} results to {args.output}")
+    return report
+
+
+if __name__ == "__main__":
+    main()
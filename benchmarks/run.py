@@ -0,0 +1,423 @@
+# benchmarks/run.py
+"""
+Offline CPU benchmarks for the enhancement pipeline, from single layers up to whole images.
+
+    python -m benchmarks.run --output results.json
+    python -m benchmarks.run --suites micro models --threads 1 4 --batch-sizes 1 4
+    python -m benchmarks.run --output after.json --compare before.json
+
+Suites:
+    micro     ModulatedConv2d (reference and fused), StyleConv, ToRGB and ResBlock
+    models    GFPGAN (eager and frozen), GFPGANv1Clean as loaded by the enhancer (reference and
+              fused modulation), the StyleGAN2 decoder, RetinaFace, RRDBNet and SRVGGNet
+    pipeline  PicturePerfectEnhancer.enhance on synthetic images, with per-stage timings
+
+Randomly initialized weights stand in for missing checkpoints (or for all of them with
+--random-weights), so every suite runs without downloads. In the pipeline suite the face
+detector is replaced by one that finds the synthetic faces, which fixes the face count; the
+RetinaFace network itself is timed in the models suite.
+"""
+import os
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+import numpy as np
+import torch
+
+import config
+from benchmarks.workloads import ensure_checkpoints, fixed_detector, synthetic_image
+from src.core.metrics import resident_memory_bytes
+from src.core.workers import config_snapshot
+
+SUITES = ("micro", "models", "pipeline")
+
+
+class PeakMemory:
+    """Samples this process's resident memory in the background and keeps the peak."""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.start_bytes = 0
+        self.peak_bytes = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak_bytes = max(self.peak_bytes, resident_memory_bytes())
+
+    def __enter__(self):
+        self.start_bytes = self.peak_bytes = resident_memory_bytes()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak_bytes = max(self.peak_bytes, resident_memory_bytes())
+
+
+def seed_everything(seed: int):
+    random.seed(seed)
+    np.random.seed(seed)
+    torch.manual_seed(seed)
+
+
+def percentile(values, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def summarize(times, items: int, memory: PeakMemory) -> dict:
+    mean = sum(times) / len(times)
+    return {
+        "latency_ms": {
+            "mean": round(mean * 1000, 3),
+            "p50": round(percentile(times, 0.5) * 1000, 3),
+            "p90": round(percentile(times, 0.9) * 1000, 3),
+            "min": round(min(times) * 1000, 3),
+            "max": round(max(times) * 1000, 3),
+        },
+        "throughput_per_s": round(items / mean, 3),
+        "peak_rss_mb": round(memory.peak_bytes / 2**20, 1),
+        "rss_growth_mb": round((memory.peak_bytes - memory.start_bytes) / 2**20, 1),
+    }
+
+
+@torch.no_grad()
+def measure(fn, warmup: int, repeat: int, items: int = 1) -> dict:
+    """Times `repeat` calls of `fn` after `warmup` untimed ones. `items` is the work per call."""
+    for _ in range(warmup):
+        fn()
+    times = []
+    with PeakMemory() as memory:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - start)
+    return summarize(times, items, memory)
+
+
+@contextmanager
+def torch_threads(num_threads: int):
+    previous = torch.get_num_threads()
+    torch.set_num_threads(num_threads)
+    try:
+        yield
+    finally:
+        torch.set_num_threads(previous)
+
+
+class Runner:
+    """Runs benchmarks across the requested thread counts and collects their results."""
+
+    def __init__(self, args):
+        self.args = args
+        self.results = []
+
+    def run(self, suite: str, name: str, params: dict, build, items: int = 1, details=None):
+        """
+        `build()` returns the function to time; it is called once per thread count. `details()`,
+        if given, returns extra fields for the result once the function has been timed.
+        """
+        for num_threads in self.args.threads:
+            entry = {"suite": suite, "name": name, "params": {**params, "threads": num_threads}}
+            seed_everything(self.args.seed)
+            try:
+                with torch_threads(num_threads):
+                    entry.update(measure(build(), self.args.warmup, self.args.repeat, items))
+                    if details:
+                        entry.update(details())
+            except Exception as e:
+                entry["error"] = f"{type(e).__name__}: {e}"
+            self.results.append(entry)
+            print(format_result(entry), flush=True)
+
+
+def format_result(entry: dict) -> str:
+    params = " ".join(f"{key}={value}" for key, value in entry["params"].items())
+    label = f"{entry['suite']:<9} {entry['name']:<24} {params:<44}"
+    if "error" in entry:
+        return f"{label} ERROR {entry['error']}"
+    return (f"{label} {entry['latency_ms']['mean']:>10.2f} ms  {entry['throughput_per_s']:>9.2f}/s"
+            f"  {entry['peak_rss_mb']:>8.1f} MB")
+
+
+# --- Micro-benchmarks ---
+
+def micro_suite(runner: Runner):
+    from src.archs.gfpgan_arch import ResBlock
+    from src.archs.stylegan2_arch import ModulatedConv2d, StyleConv, ToRGB
+
+    # Channel counts and sizes of GFPGAN v1.4's decoder levels (channel_multiplier=2).
+    levels = [(512, 16), (256, 128)]
+    for batch in runner.args.batch_sizes:
+        for channels, size in levels:
+            params = {"batch": batch, "channels": channels, "size": size}
+            x = torch.randn(batch, channels, size, size)
+            style = torch.randn(batch, 512)
+            for fused in (False, True):
+                def build_conv(fused=fused):
+                    module = ModulatedConv2d(channels, channels, 3, 512).eval()
+                    module.fused_modulation = fused
+                    return lambda: module(x, style)
+                runner.run("micro", "ModulatedConv2d" + ("/fused" if fused else ""), params, build_conv, batch)
+
+            def build_style_conv():
+                module = StyleConv(channels, channels, 3, 512).eval()
+                noise = torch.randn(batch, 1, size, size)
+                return lambda: module(x, style, noise)
+            runner.run("micro", "StyleConv", params, build_style_conv, batch)
+
+            def build_to_rgb():
+                module = ToRGB(channels, 512).eval()
+                skip = torch.randn(batch, 3, size // 2, size // 2)
+                return lambda: module(x, style, skip)
+            runner.run("micro", "ToRGB", params, build_to_rgb, batch)
+
+            def build_res_block():
+                module = ResBlock(channels, channels, mode="down").eval()
+                return lambda: module(x)
+            runner.run("micro", "ResBlock/down", params, build_res_block, batch)
+
+
+# --- Whole networks ---
+
+def gfpgan_network():
+    from src.archs.gfpgan_arch import GFPGAN
+    return GFPGAN(out_size=512, num_style_feat=512, channel_multiplier=2, decoder_load_path=None, fix_decoder=False,
+                  num_mlp=8, input_is_latent=True, different_w=True, narrow=1, sft_half=True).eval()
+
+
+def clean_gfpgan_network():
+    """The network the enhancer restores faces with (GFPGAN v1.3 and v1.4)."""
+    from gfpgan.archs.gfpganv1_clean_arch import GFPGANv1Clean
+    return GFPGANv1Clean(out_size=512, num_style_feat=512, channel_multiplier=2, decoder_load_path=None,
+                         fix_decoder=False, num_mlp=8, input_is_latent=True, different_w=True, narrow=1,
+                         sft_half=True).eval()
+
+
+def model_suite(runner: Runner):
+    from basicsr.archs.rrdbnet_arch import RRDBNet
+    from facexlib.detection.retinaface import RetinaFace
+    from realesrgan.archs.srvgg_arch import SRVGGNetCompact
+    from src.archs.stylegan2_arch import StyleGAN2Generator, set_fused_modulation
+
+    tile = runner.args.tile
+    for batch in runner.args.batch_sizes:
+        faces = torch.rand(batch, 3, 512, 512) * 2 - 1
+
+        def build_gfpgan():
+            net = gfpgan_network()
+            return lambda: net(faces)
+        runner.run("models", "GFPGAN", {"batch": batch}, build_gfpgan, batch)
+
+        def build_frozen_gfpgan():
+            net = gfpgan_network()
+            net.stylegan_decoder.set_fused_modulation(True)
+            frozen = net.freeze_for_inference()
+            return lambda: frozen(faces)
+        runner.run("models", "GFPGAN/frozen+fused", {"batch": batch}, build_frozen_gfpgan, batch)
+
+        for fused in (False, True):
+            def build_clean_gfpgan(fused=fused):
+                net = clean_gfpgan_network()
+                if fused:
+                    set_fused_modulation(net)
+                return lambda: net(faces, return_rgb=False)
+            runner.run("models", "GFPGANv1Clean" + ("/fused" if fused else ""), {"batch": batch},
+                       build_clean_gfpgan, batch)
+
+        def build_stylegan2():
+            generator = StyleGAN2Generator(out_size=512, num_style_feat=512, channel_multiplier=2).eval()
+            latents = torch.randn(batch, generator.num_latent, 512)
+            return lambda: generator([latents], input_is_latent=True, randomize_noise=False)
+        runner.run("models", "StyleGAN2Generator", {"batch": batch}, build_stylegan2, batch)
+
+        def build_retinaface():
+            net = RetinaFace(network_name="resnet50", half=False, device="cpu").eval()
+            image = torch.rand(batch, 3, 640, 640) * 255
+            return lambda: net(image)
+        runner.run("models", "RetinaFace", {"batch": batch, "size": 640}, build_retinaface, batch)
+
+        tiles = torch.rand(batch, 3, tile, tile)
+
+        def build_rrdbnet():
+            net = RRDBNet(num_in_ch=3, num_out_ch=3, num_feat=64, num_block=23, num_grow_ch=32, scale=4).eval()
+            return lambda: net(tiles)
+        runner.run("models", "RRDBNet", {"batch": batch, "tile": tile}, build_rrdbnet, batch)
+
+        def build_srvgg():
+            net = SRVGGNetCompact(num_in_ch=3, num_out_ch=3, num_feat=64, num_conv=32, upscale=4, act_type="prelu").eval()
+            return lambda: net(tiles)
+        runner.run("models", "SRVGGNetCompact", {"batch": batch, "tile": tile}, build_srvgg, batch)
+
+
+# --- End-to-end pipeline ---
+
+def pipeline_settings(args, workspace: str):
+    """The app's settings with everything stateful moved into the workspace and caching turned off."""
+    settings = config_snapshot(config)
+    if workspace != config.BASE_DIR:
+        model_dirs = {
+            config.GFPGAN_MODEL_DIR: os.path.join(workspace, "gfpgan", "weights"),
+            config.REALESRGAN_MODEL_DIR: os.path.join(workspace, "realesrgan", "models"),
+        }
+        for key in ("REQUIRED_MODELS", "OPTIONAL_MODELS"):
+            settings[key] = [(name, filename, url, model_dirs.get(dest_dir, dest_dir), sha256)
+                             for name, filename, url, dest_dir, sha256 in settings[key]]
+        settings["GFPGAN_MODEL_DIR"] = model_dirs[config.GFPGAN_MODEL_DIR]
+        settings["REALESRGAN_MODEL_DIR"] = model_dirs[config.REALESRGAN_MODEL_DIR]
+        settings["PREPARED_WEIGHTS_DIR"] = os.path.join(workspace, "cache", "weights")
+        settings["COMPILED_MODEL_DIR"] = os.path.join(workspace, "gfpgan", "compiled")
+    settings.update(FACE_CACHE_SIZE=0, INFERENCE_WORKERS=1, CPU_PRECISION=args.precision)
+    return SimpleNamespace(**settings)
+
+
+def pipeline_suite(runner: Runner):
+    from src.core.enhancer import PicturePerfectEnhancer
+
+    args = runner.args
+    with tempfile.TemporaryDirectory(prefix="pp-bench-") as temp_dir:
+        models = config.REQUIRED_MODELS + config.OPTIONAL_MODELS
+        use_real = not args.random_weights and all(
+            os.path.exists(os.path.join(dest_dir, filename)) for _, filename, _, dest_dir, _ in models)
+        workspace = config.BASE_DIR if use_real else temp_dir
+        settings = pipeline_settings(args, workspace)
+        if not use_real:
+            generated = ensure_checkpoints(settings.REQUIRED_MODELS + settings.OPTIONAL_MODELS, args.seed)
+            print(f"Using randomly initialized weights for: {', '.join(generated)}", flush=True)
+
+        # The face helper looks for its models relative to the working directory.
+        previous_dir = os.getcwd()
+        os.chdir(workspace)
+        try:
+            enhancer = PicturePerfectEnhancer(settings)
+            enhancer.load_models_into_memory()
+        except Exception as e:
+            runner.results.append({"suite": "pipeline", "name": "load", "params": {},
+                                   "error": f"{type(e).__name__}: {e}"})
+            print(format_result(runner.results[-1]), flush=True)
+            return
+        finally:
+            os.chdir(previous_dir)
+
+        try:
+            face_det = enhancer.face_helper.face_det
+            for height, width in args.resolutions:
+                for num_faces in args.faces:
+                    image, faces = synthetic_image(height, width, num_faces, args.seed)
+                    face_det.detect_faces = fixed_detector(faces)
+                    for mode in args.background_modes:
+                        stages = []
+
+                        def build(mode=mode):
+                            stages.clear()
+
+                            def enhance():
+                                _, timings, _ = enhancer.enhance_timed(image, config.UPSCALE_FACTOR, background_mode=mode)
+                                stages.append(timings)
+                            return enhance
+
+                        def stage_means():
+                            # Only the timed calls count; the warmup calls come first.
+                            timed = stages[args.warmup:]
+                            names = dict.fromkeys(stage for timings in timed for stage in timings)
+                            return {"stages_ms": {
+                                stage: round(sum(t.get(stage, 0) for t in timed) / len(timed) * 1000, 3) for stage in names
+                            }}
+
+                        params = {"resolution": f"{width}x{height}", "faces": num_faces, "background": mode,
+                                  "weights": "checkpoints" if use_real else "random"}
+                        runner.run("pipeline", "enhance", params, build, details=stage_means)
+        finally:
+            enhancer.close()
+
+
+# --- Reporting ---
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=config.BASE_DIR, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "torch": torch.__version__,
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def result_key(entry: dict) -> str:
+    return f"{entry['suite']}/{entry['name']} " + json.dumps(entry["params"], sort_keys=True)
+
+
+def compare(results, baseline_path: str):
+    """Prints the speedup of every benchmark over the same benchmark in a baseline run."""
+    with open(baseline_path) as f:
+        baseline = {result_key(entry): entry for entry in json.load(f)["results"]}
+    print(f"\nCompared with {baseline_path} (speedup > 1 is faster):")
+    for entry in results:
+        before = baseline.get(result_key(entry))
+        if before is None or "error" in before or "error" in entry:
+            continue
+        old, new = before["latency_ms"]["mean"], entry["latency_ms"]["mean"]
+        print(f"  {result_key(entry):<90} {old:>10.2f} -> {new:>10.2f} ms  x{old / new:.2f}")
+
+
+def parse_resolution(value: str):
+    width, height = value.lower().split("x")
+    return int(height), int(width)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks the enhancement pipeline on CPU.")
+    parser.add_argument("--suites", nargs="+", choices=SUITES, default=list(SUITES))
+    parser.add_argument("--threads", nargs="+", type=int, default=[torch.get_num_threads()],
+                        help="torch thread counts to run every benchmark with")
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=[1, 4])
+    parser.add_argument("--resolutions", nargs="+", type=parse_resolution, default=[(256, 256), (512, 512)],
+                        help="pipeline image sizes, as WIDTHxHEIGHT")
+    parser.add_argument("--faces", nargs="+", type=int, default=[0, 1, 4], help="pipeline face counts")
+    parser.add_argument("--background-modes", nargs="+", default=["realesrgan", "resize"])
+    parser.add_argument("--precision", default="fp32", help="CPU precision for the pipeline (fp32, bf16, int8)")
+    parser.add_argument("--tile", type=int, default=128, help="tile size for the background networks")
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--random-weights", action="store_true", help="ignore downloaded checkpoints")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="a previous JSON result file to compare against")
+    args = parser.parse_args(argv)
+
+    runner = Runner(args)
+    suites = {"micro": micro_suite, "models": model_suite, "pipeline": pipeline_suite}
+    for suite in args.suites:
+        suites[suite](runner)
+
+    report = {"environment": environment(), "arguments": vars(args), "results": runner.results}
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nWrote {len(runner.results)} results to {args.output}")
+    if args.compare:
+        compare(runner.results, args.compare)
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+# benchmarks/workloads.py
+import os
+
+import cv2
+import numpy as np
+import torch
+
+
+def synthetic_image(height: int, width: int, num_faces: int = 0, seed: int = 0):
+    """
+    A textured BGR test image with `num_faces` face-like shapes in a row across its middle.
+    Returns the image and the face rows in RetinaFace's detect_faces() layout: box, score and
+    five landmarks (eyes, nose, mouth corners).
+    """
+    rng = np.random.RandomState(seed)
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    image = np.stack([x / width * 180 + 40, y / height * 160 + 50, (x + y) / (width + height) * 120 + 60], axis=-1)
+    image = np.clip(image + rng.normal(0, 12, image.shape), 0, 255).astype(np.uint8)
+
+    faces = []
+    for k in range(num_faces):
+        cx, cy = width * (k + 1) / (num_faces + 1), height / 2
+        size = min(height / 2, width / (num_faces + 1)) * 0.8
+        half = size / 2
+        cv2.ellipse(image, (int(cx), int(cy)), (int(half * 0.75), int(half)), 0, 0, 360, (120, 160, 210), -1)
+        eyes = [(cx - half * 0.35, cy - half * 0.25), (cx + half * 0.35, cy - half * 0.25)]
+        nose = (cx, cy + half * 0.05)
+        mouth = [(cx - half * 0.3, cy + half * 0.45), (cx + half * 0.3, cy + half * 0.45)]
+        for ex, ey in eyes:
+            cv2.circle(image, (int(ex), int(ey)), max(1, int(half * 0.08)), (40, 40, 40), -1)
+        cv2.line(image, tuple(map(int, mouth[0])), tuple(map(int, mouth[1])), (60, 60, 150), max(1, int(half * 0.05)))
+        landmarks = [coord for point in (*eyes, nose, *mouth) for coord in point]
+        faces.append([cx - half, cy - half, cx + half, cy + half, 0.99, *landmarks])
+    return image, np.array(faces, dtype=np.float32).reshape(-1, 15)
+
+
+def fixed_detector(faces):
+    """A stand-in for RetinaFace.detect_faces that always finds `faces`, so face count is controlled."""
+    def detect_faces(image, conf_threshold=0.8, *args, **kwargs):
+        return faces
+    return detect_faces
+
+
+def _random_models():
+    """Randomly initialized versions of every model the enhancer loads, by checkpoint filename."""
+    from basicsr.archs.rrdbnet_arch import RRDBNet
+    from facexlib.detection.retinaface import RetinaFace
+    from facexlib.parsing.parsenet import ParseNet
+    from gfpgan.archs.gfpganv1_clean_arch import GFPGANv1Clean
+    from realesrgan.archs.srvgg_arch import SRVGGNetCompact
+
+    gfpgan = lambda: {"params_ema": GFPGANv1Clean(
+        out_size=512, num_style_feat=512, channel_multiplier=2, decoder_load_path=None, fix_decoder=False,
+        num_mlp=8, input_is_latent=True, different_w=True, narrow=1, sft_half=True).state_dict()}
+    return {
+        "GFPGANv1.4.pth": gfpgan,
+        "GFPGANv1.3.pth": gfpgan,
+        "RealESRGAN_x4plus.pth": lambda: {"params_ema": RRDBNet(
+            num_in_ch=3, num_out_ch=3, num_feat=64, num_block=23, num_grow_ch=32, scale=4).state_dict()},
+        "RealESRGAN_x2plus.pth": lambda: {"params_ema": RRDBNet(
+            num_in_ch=3, num_out_ch=3, num_feat=64, num_block=23, num_grow_ch=32, scale=2).state_dict()},
+        "realesr-general-x4v3.pth": lambda: {"params": SRVGGNetCompact(
+            num_in_ch=3, num_out_ch=3, num_feat=64, num_conv=32, upscale=4, act_type="prelu").state_dict()},
+        "detection_Resnet50_Final.pth": lambda: RetinaFace(network_name="resnet50", half=False, device="cpu").state_dict(),
+        "parsing_parsenet.pth": lambda: ParseNet(in_size=512, out_size=512, parsing_ch=19).state_dict(),
+    }
+
+
+def ensure_checkpoints(models, seed: int = 0):
+    """
+    Writes a randomly initialized checkpoint for every `(name, filename, url, dest_dir, sha256)` entry
+    whose file is missing. Returns the names of the models that were generated.
+    """
+    builders = _random_models()
+    generated = []
+    for name, filename, _, dest_dir, _ in models:
+        path = os.path.join(dest_dir, filename)
+        if os.path.exists(path) or filename not in builders:
+            continue
+        torch.manual_seed(seed)
+        os.makedirs(dest_dir, exist_ok=True)
+        torch.save(builders[filename](), path)
+        generated.append(name)
+    return generated
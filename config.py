@@ -1,6 +1,5 @@
 # config.py
 import os
-import torch
 
 # --- Project Details ---
 PROJECT_VERSION = "2.0.0"
@@ -10,39 +9,258 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 STATIC_DIR = os.path.join(BASE_DIR, "static")
 INPUT_DIR = os.path.join(BASE_DIR, "inputs")
 OUTPUT_DIR = os.path.join(BASE_DIR, "outputs")
+PREVIEW_DIR = os.path.join(BASE_DIR, "outputs", "previews")
 GFPGAN_MODEL_DIR = os.path.join(BASE_DIR, "gfpgan", "weights")
 REALESRGAN_MODEL_DIR = os.path.join(BASE_DIR, "realesrgan", "models")
+COMPILED_MODEL_DIR = os.path.join(BASE_DIR, "gfpgan", "compiled")
+RESULT_CACHE_DIR = os.path.join(BASE_DIR, "cache", "results")
+PREPARED_WEIGHTS_DIR = os.path.join(BASE_DIR, "cache", "weights")
 
 # --- Model Configuration List ---
 # A single source of truth for all required models.
-# Structure: (model_name, filename, download_url, destination_directory)
+# Structure: (model_name, filename, download_url, destination_directory, sha256)
+# Downloads are rejected unless their SHA-256 matches. A sha256 of None skips verification; the
+# digest of the downloaded file is logged so it can be pinned here.
 REQUIRED_MODELS = [
     (
         "GFPGAN", "GFPGANv1.4.pth",
         "https://github.com/Md-Siam-Mia-Code/PicturePerfect/releases/download/1.0.0/GFPGANv1.4.pth",
-        GFPGAN_MODEL_DIR
+        GFPGAN_MODEL_DIR,
+        "e2cd4703ab14f4d01fd1383a8a8b266f9a5833dacee8e6a79d3bf21a1b6be5ad"
     ),
     (
         "RealESRGAN", "RealESRGAN_x4plus.pth",
         "https://github.com/Md-Siam-Mia-Code/PicturePerfect/releases/download/1.0.0/RealESRGAN_x4plus.pth",
-        REALESRGAN_MODEL_DIR
+        REALESRGAN_MODEL_DIR,
+        "4fa0d38905f75ac06eb49a7951b426670021be3018265fd191d2125df9d682f1"
     ),
     (
         "Face Detector", "detection_Resnet50_Final.pth",
         "https://github.com/Md-Siam-Mia-Code/PicturePerfect/releases/download/1.0.0/detection_Resnet50_Final.pth",
-        GFPGAN_MODEL_DIR # This helper model belongs with GFPGAN
+        GFPGAN_MODEL_DIR, # This helper model belongs with GFPGAN
+        "6d1de9c2944f2ccddca5f5e010ea5ae64a39845a86311af6fdf30841b0a5a16d"
     ),
     (
         "Face Parser", "parsing_parsenet.pth",
         "https://github.com/Md-Siam-Mia-Code/PicturePerfect/releases/download/1.0.0/parsing_parsenet.pth",
-        GFPGAN_MODEL_DIR # This helper model also belongs with GFPGAN
+        GFPGAN_MODEL_DIR, # This helper model also belongs with GFPGAN
+        "3d558d8d0e42c20224f13cf5a29c79eba2d59913419f945545d8cf7b72920de2"
+    )
+]
+# Models that are not needed to start. They can be fetched through /api/download_model as well.
+OPTIONAL_MODELS = [
+    (
+        "RealESRGAN General", "realesr-general-x4v3.pth",
+        "https://github.com/xinntao/Real-ESRGAN/releases/download/v0.2.5.0/realesr-general-x4v3.pth",
+        REALESRGAN_MODEL_DIR, # Compact model behind the "light" background mode
+        "8dc7edb9ac80ccdc30c3a5dca6616509367f05fbc184ad95b731f05bece96292"
+    ),
+    (
+        "RealESRGAN x2", "RealESRGAN_x2plus.pth",
+        "https://github.com/xinntao/Real-ESRGAN/releases/download/v0.2.1/RealESRGAN_x2plus.pth",
+        REALESRGAN_MODEL_DIR, # Cheaper background model for outputs up to 2x
+        "49fafd45f8fd7aa8d31ab2a22d14d91b536c34494a5cfe31eb5d89c2fa266abb"
+    ),
+    (
+        "GFPGAN v1.3", "GFPGANv1.3.pth",
+        "https://github.com/TencentARC/GFPGAN/releases/download/v1.3.0/GFPGANv1.3.pth",
+        GFPGAN_MODEL_DIR,
+        "c953a88f2727c85c3d9ae72e2bd4846bbaf59fe6972ad94130e23e7017524a70"
     )
 ]
 
 # --- Model Settings ---
+# Default output scale. Requests can ask for another one (`upscale`, up to MAX_UPSCALE_FACTOR) or
+# cap the output size (`max_long_edge`); below the background model's native x4, the input is
+# shrunk before the model rather than its output shrunk after, which saves most of the work.
 UPSCALE_FACTOR = 4
+MAX_UPSCALE_FACTOR = 8
 ARCH = 'clean'
-USE_HALF_PRECISION = torch.cuda.is_available()
+# None = on whenever a CUDA device is used. Resolved when the models load, so that importing
+# this config doesn't have to import torch.
+USE_HALF_PRECISION = None
+
+# --- Model Variants ---
+# Models a request can pick with `face_model` and `background_model`. "model" names the
+# checkpoint in REQUIRED_MODELS or OPTIONAL_MODELS; variants whose checkpoint is missing can't be
+# picked. Without a `background_model`, the "realesrgan" and "light" background modes use the
+# downloaded variant of their family with the smallest scale that reaches the output scale.
+FACE_MODEL_VARIANTS = {
+    "gfpgan-1.4": {"model": "GFPGAN", "arch": ARCH, "channel_multiplier": 2},
+    "gfpgan-1.3": {"model": "GFPGAN v1.3", "arch": ARCH, "channel_multiplier": 2},
+}
+BACKGROUND_MODEL_VARIANTS = {
+    "realesrgan-x4": {"model": "RealESRGAN", "family": "realesrgan", "arch": "rrdb", "scale": 4},
+    "realesrgan-x2": {"model": "RealESRGAN x2", "family": "realesrgan", "arch": "rrdb", "scale": 2},
+    "general-x4": {"model": "RealESRGAN General", "family": "light", "arch": "srvgg", "scale": 4},
+}
+DEFAULT_FACE_MODEL = "gfpgan-1.4"
+# Variants load on first use and stay in memory up to this budget (per inference process); beyond
+# it, the least recently used ones are dropped. Variants in use by a request are never dropped.
+MODEL_MEMORY_BUDGET_MB = 1024
+
+# --- CPU Precision Settings ---
+# Precision for CPU inference: "fp32", "bf16" (autocast; needs a CPU with AVX512-BF16 or AMX)
+# or "int8" (dynamically quantized convs and linears). CUDA devices use USE_HALF_PRECISION instead.
+CPU_PRECISION = "fp32"
+# A reduced-precision model is only kept if its output on sample images stays above this PSNR
+# against fp32; the check and measured speedup are logged when the models load.
+PRECISION_MIN_PSNR = 35.0
+
+# --- Inference Worker Settings ---
+# Number of worker threads that run model inference off the web server's event loop.
+# Each worker gets its own face-processing state while sharing the loaded model weights.
+INFERENCE_WORKERS = 1
+# Run inference in this many separate processes instead (0 = off, use the threads above).
+# Processes sidestep the GIL and torch's shared thread pool, so throughput scales with cores.
+INFERENCE_PROCESSES = 0
+# Torch and OpenCV threads per inference worker: per process with INFERENCE_PROCESSES, otherwise
+# per thread (None = the usable cores split evenly between the workers, so concurrent forward
+# passes don't oversubscribe them). `python -m benchmarks.calibrate` measures the best split.
+THREADS_PER_WORKER = None
+# Torch inter-op threads per worker. Requests already run in parallel across workers.
+INTEROP_THREADS = 1
+# Pin each inference process to its own cores: None (off), "cores" (a separate slice of cores per
+# process) or "numa" (processes spread over the NUMA nodes, each kept on its node's cores, which
+# also keeps its memory local). Threads of one process share its thread pools and aren't pinned.
+CPU_AFFINITY = None
+# Load CPU weights as memory-mapped views of the checkpoint files, so that every inference
+# process shares one copy in the OS page cache instead of holding a private one.
+MMAP_WEIGHTS = True
+
+# --- Face Batching Settings ---
+# Aligned faces from one image, or from requests arriving together, share GFPGAN forward passes.
+FACE_BATCH_SIZE = 8
+# How long a batch waits for faces from other in-flight requests before it runs.
+FACE_BATCH_WAIT_MS = 20
+
+# Detected faces, alignment and parse masks are kept for this many recent images (per face model,
+# as the masks come from its restored faces), so re-running an image with other settings skips
+# straight to restoration. 0 disables the cache.
+FACE_CACHE_SIZE = 32
+
+# --- Inference Export Settings ---
+# Run the StyleGAN2 decoder of the "clean" GFPGAN variants (v1.3, v1.4) through the fused
+# modulation path: styles scale the activations instead of building per-face weights, and the
+# high-resolution 2x upsamples are folded into their convs. Each layer is checked against the
+# reference path when the model loads, which falls back to it on a mismatch.
+FUSED_MODULATION = True
+# Trace the GFPGAN network for inference. The traces share the loaded weights. With fused
+# modulation one trace serves every face batch size; otherwise batches are padded to a power of
+# two up to FACE_BATCH_SIZE, with one trace each. Traces are cached in COMPILED_MODEL_DIR, so
+# warm restarts skip the export.
+EXPORT_GFPGAN = False
+
+# --- Background Mode Settings ---
+# How the background is upscaled: "realesrgan" (full RRDBNet), "light" (compact SRVGG model, if
+# downloaded), "resize" (Lanczos; only faces are restored) or "auto", which picks from how much
+# of the image the detected faces cover. Requests can override it with a `background_mode` field.
+BACKGROUND_MODE = "realesrgan"
+# In "auto" mode, faces covering at least this share of the image get a Lanczos background...
+AUTO_RESIZE_FACE_RATIO = 0.3
+# ...and at least this share gets the light model. Anything less uses full Real-ESRGAN.
+AUTO_LIGHT_FACE_RATIO = 0.1
+
+# --- Background Tiling Settings ---
+# Real-ESRGAN tile size in pixels. None plans it per image from the image size and free memory;
+# a number fixes it, and 0 disables tiling. Requests can override it with a `tile_size` field.
+TILE_SIZE = None
+TILE_PAD = 10
+# Share of the currently free device memory the tile planner may use.
+TILE_MEMORY_FRACTION = 0.5
+# Maximum number of tiles upscaled together in one forward pass.
+MAX_TILE_BATCH = 4
+
+# --- Streaming Settings ---
+# PNG outputs above this many megapixels (a 6000x4000 photo at 4x is 384) are built and written
+# a strip of rows at a time instead of in memory; None turns streaming off. Other formats are
+# always encoded in memory.
+STREAM_OUTPUT_MEGAPIXELS = 64
+# Memory for one strip of upscaled output, including the upsampler's float intermediates.
+STREAM_STRIP_MB = 256
+# Input rows of context above and below each strip, so the strip seams don't show.
+STREAM_STRIP_PAD = 16
+
+# --- Preview Settings ---
+# Jobs submitted with `preview=true` get a quick preview of each image as soon as its faces are
+# restored: the restored faces on a Lanczos-resized background, sent as a "preview" event before
+# the background model runs. Previews are JPEGs with a long edge of at most this many pixels.
+PREVIEW_MAX_LONG_EDGE = 1024
+PREVIEW_QUALITY = 80
+
+# --- Result Cache Settings ---
+# Enhanced images are cached by a hash of the input bytes and every setting that affects the
+# output, so re-uploads are answered from disk. Least recently used entries are evicted beyond
+# this size; 0 disables the cache.
+RESULT_CACHE_MAX_MB = 2048
+
+# --- Upload Settings ---
+# Uploads are decoded straight from memory; set this to also keep a copy of each one in INPUT_DIR.
+PERSIST_INPUTS = False
+# Uploads are read in chunks of UPLOAD_CHUNK_SIZE bytes and rejected with HTTP 413 beyond this size.
+MAX_UPLOAD_MB = 100
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# --- Output Encoding Settings ---
+# Output format: "png", "jpeg", "webp" or "avif" (if OpenCV was built with AVIF support).
+# Requests can override it with `output_format` and `quality` fields.
+OUTPUT_FORMAT = "png"
+# Quality (1-100) for JPEG, WebP and AVIF.
+OUTPUT_QUALITY = 90
+# zlib level (0-9) for PNG. Higher levels shrink 4x outputs a little but take several times longer.
+PNG_COMPRESSION = 1
+# Threads encoding finished images while the inference workers move on to the next image.
+ENCODE_WORKERS = 2
+
+# --- Job Queue Settings ---
+# Jobs waiting beyond this limit are rejected with HTTP 429 until the queue drains.
+MAX_QUEUED_JOBS = 16
+# Number of finished jobs kept around for status polling.
+JOB_HISTORY_LIMIT = 100
+
+# --- Batch CLI Settings ---
+# `python main.py enhance <in_dir> <out_dir>` runs read, decode, enhance, encode and write as
+# separate stages. Threads decoding images ahead of the inference workers (which follow
+# INFERENCE_WORKERS or INFERENCE_PROCESSES) and encoding threads (ENCODE_WORKERS):
+BATCH_DECODE_WORKERS = 2
+# Images waiting between two stages; bounds the memory a large batch can take.
+BATCH_QUEUE_SIZE = 4
+
+# --- Video Settings ---
+# `python main.py video <input> <output>` enhances a video file or a directory of frames. Faces
+# are detected every VIDEO_DETECT_INTERVAL frames, and whenever tracking loses them, and are
+# tracked with optical flow on the frames in between.
+VIDEO_DETECT_INTERVAL = 10
+# Consecutive frames whose faces are restored in shared batches (FACE_BATCH_SIZE faces per
+# forward pass). Also the most frames being enhanced at once.
+VIDEO_FRAME_WINDOW = 8
+# Frames decoded ahead of the enhancer, and enhanced frames waiting to be encoded.
+VIDEO_QUEUE_SIZE = 8
+# Codec of video outputs: a FourCC the OpenCV build can write. Only the frames are written; the
+# audio track is not carried over.
+VIDEO_FOURCC = "mp4v"
+# Frame rate of videos made from an image sequence.
+VIDEO_SEQUENCE_FPS = 25
+
+# --- Startup Settings ---
+# Load the models in the background as soon as the server starts (when they are all downloaded),
+# instead of on the first call to /api/load_models. /api/ready reports when they are loaded.
+PRELOAD_MODELS = True
+# Convert each checkpoint once into a plain state dict in PREPARED_WEIGHTS_DIR, which loads
+# faster than the original checkpoint and can be memory-mapped.
+PREPARE_WEIGHTS = True
+
+# --- Model Download Settings ---
+# Missing models are downloaded concurrently, up to this many at a time.
+DOWNLOAD_WORKERS = 4
+# Attempts to resume an interrupted download before giving up. Partial downloads are kept as
+# ".part" files and resumed with HTTP Range requests, also across restarts.
+DOWNLOAD_RETRIES = 5
+DOWNLOAD_TIMEOUT = 20
+# Progress events are sent at most every DOWNLOAD_PROGRESS_INTERVAL seconds, or every
+# DOWNLOAD_PROGRESS_STEP percent, whichever comes first.
+DOWNLOAD_PROGRESS_INTERVAL = 0.5
+DOWNLOAD_PROGRESS_STEP = 1.0
 
 # --- Web Server Settings ---
 SERVER_HOST = "127.0.0.1"
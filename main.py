@@ -1,10 +1,11 @@
 # main.py
 import uvicorn
 import os
+import json
 import logging
+import argparse
 import sys
 import config
-from src.web.app import app
 
 # --- Enhanced Logging Setup ---
 def setup_logging():
@@ -30,15 +31,137 @@ def setup_logging():
     for lib_name in noisy_libraries:
         logging.getLogger(lib_name).setLevel(logging.ERROR)
 
+# --- Batch Mode ---
+def run_batch(args):
+    """
+    Enhances every image under args.input_dir into args.output_dir without starting the server.
+    """
+    from src.core.batch import BatchPipeline
+    from src.core.workers import create_enhancer
+
+    logger = logging.getLogger(__name__)
+    enhancer = create_enhancer(config)
+
+    # Fetch any missing models first, the same way the web UI does on first launch.
+    for model in enhancer.check_models():
+        for update in enhancer.download_model(model):
+            if update["status"] == "error":
+                logger.error(f"❌ Cannot enhance without {model['name']}: {update['error_message']}")
+                sys.exit(1)
+
+    enhancer.load_models_into_memory()
+    try:
+        pipeline = BatchPipeline(
+            enhancer, config, args.input_dir, args.output_dir, fmt=args.format, quality=args.quality,
+            upscale_factor=args.upscale, overwrite=args.overwrite,
+            options={"tile_size": args.tile_size, "background_mode": args.background_mode,
+                     "max_long_edge": args.max_long_edge, "face_model": args.face_model,
+                     "background_model": args.background_model}
+        )
+        report = pipeline.run()
+    finally:
+        enhancer.close()
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
+        logger.info(f"📝 Report written to {args.report}")
+    if report["failed"]:
+        sys.exit(1)
+
+def run_video(args):
+    """
+    Enhances a video file or an image sequence into args.output without starting the server.
+    """
+    from src.core.enhancer import PicturePerfectEnhancer
+    from src.core.video import VideoPipeline
+
+    logger = logging.getLogger(__name__)
+    # Frames are tracked in order through one enhancer, so this always runs in-process.
+    enhancer = PicturePerfectEnhancer(config)
+
+    for model in enhancer.check_models():
+        for update in enhancer.download_model(model):
+            if update["status"] == "error":
+                logger.error(f"❌ Cannot enhance without {model['name']}: {update['error_message']}")
+                sys.exit(1)
+
+    enhancer.load_models_into_memory()
+    try:
+        pipeline = VideoPipeline(
+            enhancer, config, args.input, args.output, upscale_factor=args.upscale, fps=args.fps,
+            fmt=args.format, quality=args.quality,
+            options={"tile_size": args.tile_size, "background_mode": args.background_mode,
+                     "max_long_edge": args.max_long_edge, "face_model": args.face_model,
+                     "background_model": args.background_model, "detect_interval": args.detect_interval}
+        )
+        report = pipeline.run()
+    finally:
+        enhancer.close()
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
+        logger.info(f"📝 Report written to {args.report}")
+
+def parse_args(argv=None):
+    from src.core.encoding import OUTPUT_FORMATS
+    from src.core.enhancer import BACKGROUND_MODES
+
+    parser = argparse.ArgumentParser(description="PicturePerfect image enhancer.")
+    commands = parser.add_subparsers(dest="command")
+    commands.add_parser("serve", help="Run the web server (the default).")
+    batch = commands.add_parser("enhance", help="Enhance every image in a directory, without the web server.")
+    batch.add_argument("input_dir", help="Directory with the images to enhance; sub-directories are included.")
+    batch.add_argument("output_dir", help="Where the enhanced images go, in the same layout as the input.")
+    batch.add_argument("--format", choices=list(OUTPUT_FORMATS), help=f"Output format (default: {config.OUTPUT_FORMAT}).")
+    batch.add_argument("--quality", type=int, help="Quality (1-100) for the lossy formats.")
+    batch.add_argument("--upscale", type=float, help=f"Upscale factor (default: {config.UPSCALE_FACTOR}).")
+    batch.add_argument("--max-long-edge", type=int, help="Cap the long edge of the outputs at this many pixels.")
+    batch.add_argument("--tile-size", type=int, help="Background tile size in pixels; 0 disables tiling.")
+    batch.add_argument("--background-mode", choices=BACKGROUND_MODES, help="How to upscale the background.")
+    batch.add_argument("--face-model", choices=list(config.FACE_MODEL_VARIANTS),
+                       help=f"Face restoration model (default: {config.DEFAULT_FACE_MODEL}).")
+    batch.add_argument("--background-model", choices=list(config.BACKGROUND_MODEL_VARIANTS),
+                       help="Background model (default: picked from the background mode and upscale factor).")
+    batch.add_argument("--overwrite", action="store_true", help="Enhance again images whose output already exists.")
+    batch.add_argument("--report", help="Also write the throughput report to this JSON file.")
+    video = commands.add_parser("video", help="Enhance a video, or a directory of frames, without the web server.")
+    video.add_argument("input", help="Video file, or directory of frames in name order.")
+    video.add_argument("output", help="Video file (.mp4, .avi, ...), or directory to write the frames to.")
+    video.add_argument("--upscale", type=float, help=f"Upscale factor (default: {config.UPSCALE_FACTOR}).")
+    video.add_argument("--max-long-edge", type=int, help="Cap the long edge of the output at this many pixels.")
+    video.add_argument("--tile-size", type=int, help="Background tile size in pixels; 0 disables tiling.")
+    video.add_argument("--background-mode", choices=BACKGROUND_MODES, help="How to upscale the background.")
+    video.add_argument("--face-model", choices=list(config.FACE_MODEL_VARIANTS),
+                       help=f"Face restoration model (default: {config.DEFAULT_FACE_MODEL}).")
+    video.add_argument("--background-model", choices=list(config.BACKGROUND_MODEL_VARIANTS),
+                       help="Background model (default: picked from the background mode and upscale factor).")
+    video.add_argument("--detect-interval", type=int,
+                       help=f"Detect faces every this many frames, tracking them in between (default: {config.VIDEO_DETECT_INTERVAL}).")
+    video.add_argument("--fps", type=float,
+                       help=f"Output frame rate (default: the input's, or {config.VIDEO_SEQUENCE_FPS} for frame directories).")
+    video.add_argument("--format", choices=list(OUTPUT_FORMATS), help=f"Frame format when writing frames (default: {config.OUTPUT_FORMAT}).")
+    video.add_argument("--quality", type=int, help="Quality (1-100) for the lossy frame formats.")
+    video.add_argument("--report", help="Also write the throughput report to this JSON file.")
+    return parser.parse_args(argv)
+
 # --- Main Application Entry Point ---
 def main():
     """
     The main function that prepares and runs the PicturePerfect application.
     """
+    args = parse_args()
+
     # 1. Configure our custom logger first
     setup_logging()
     logger = logging.getLogger(__name__)
 
+    if args.command == "enhance":
+        run_batch(args)
+        return
+    if args.command == "video":
+        run_video(args)
+        return
+
     # 2. Print a beautiful startup banner
     logger.info("======================================================")
     logger.info("        🚀 Welcome to PicturePerfect v2.0 🚀         ")
@@ -49,6 +172,7 @@ def main():
     try:
         os.makedirs(config.INPUT_DIR, exist_ok=True)
         os.makedirs(config.OUTPUT_DIR, exist_ok=True)
+        os.makedirs(config.PREVIEW_DIR, exist_ok=True)
         os.makedirs(config.GFPGAN_MODEL_DIR, exist_ok=True)
         os.makedirs(config.REALESRGAN_MODEL_DIR, exist_ok=True)
         logger.info("✅ Directories are ready.")
@@ -61,7 +185,9 @@ def main():
     logger.info(f"✅ Server is live! Access the UI at: http://{config.SERVER_HOST}:{config.SERVER_PORT}")
     logger.info("   (Press CTRL+C to stop the server)")
     
-    # 5. Run the Uvicorn server
+    # 5. Run the Uvicorn server. The app is imported here rather than at the top, so that
+    #    spawned inference processes, which re-import this module, don't build a second app.
+    from src.web.app import app
     uvicorn.run(
         app,
         host=config.SERVER_HOST,
@@ -67,10 +67,18 @@ class SFTStyleGAN2Generator(StyleGAN2Generator):
             if i < len(conditions) * 2:
                 cond_idx = (i - 1) // 2
                 sft_cond = conditions[cond_idx]
-                out = (
-                    out * sft_cond[:, : out.size(1), :, :]
-                    + sft_cond[:, out.size(1) :, :, :]
-                )
+                if self.sft_half:  # only apply SFT to half of the channels
+                    out_same, out_sft = torch.split(out, out.size(1) // 2, dim=1)
+                    out_sft = (
+                        out_sft * sft_cond[:, : out_sft.size(1), :, :]
+                        + sft_cond[:, out_sft.size(1) :, :, :]
+                    )
+                    out = torch.cat([out_same, out_sft], dim=1)
+                else:
+                    out = (
+                        out * sft_cond[:, : out.size(1), :, :]
+                        + sft_cond[:, out.size(1) :, :, :]
+                    )
 
             out = conv2(out, latents[:, i + 1], noise=noise2)
             skip = to_rgb(out, latents[:, i + 2], skip)
@@ -207,6 +215,8 @@ class GFPGAN(nn.Module):
 
         # Style code
         style_code = self.final_linear(feat.view(feat.size(0), -1))
+        if self.different_w:
+            style_code = style_code.view(style_code.size(0), -1, self.num_style_feat)
 
         # Decoder with SFT
         feat_up = feat
@@ -224,3 +234,181 @@ class GFPGAN(nn.Module):
         )
 
         return image, latents
+
+    def freeze_for_inference(self, randomize_noise: bool = True) -> "FrozenGFPGAN":
+        """Returns a trace-friendly copy of this network for inference; see FrozenGFPGAN."""
+        return FrozenGFPGAN(self, randomize_noise).eval()
+
+
+def _split_conv(conv: nn.Conv2d, split: int) -> Tuple[nn.Conv2d, nn.Conv2d]:
+    """Splits a conv into two convs producing its first `split` and remaining channels."""
+    halves = []
+    for weight, bias in zip(
+        torch.split(conv.weight.detach(), [split, conv.out_channels - split]),
+        torch.split(conv.bias.detach(), [split, conv.out_channels - split]),
+    ):
+        half = nn.Conv2d(
+            conv.in_channels, weight.size(0), conv.kernel_size, conv.stride, conv.padding
+        )
+        half.weight.data.copy_(weight)
+        half.bias.data.copy_(bias)
+        halves.append(half.to(conv.weight.device))
+    return halves[0], halves[1]
+
+
+class _FrozenSFTLevel(nn.Module):
+    """One decoder resolution of FrozenGFPGAN: U-Net up block, SFT condition and style convs."""
+
+    def __init__(
+        self,
+        up_block,
+        condition_body,
+        condition_scale,
+        condition_shift,
+        conv1,
+        conv2,
+        to_rgb,
+        sft_split,
+        noises,
+    ):
+        super().__init__()
+        self.up_block = up_block
+        self.condition_body = condition_body
+        self.condition_scale = condition_scale
+        self.condition_shift = condition_shift
+        self.conv1 = conv1
+        self.conv2 = conv2
+        self.to_rgb = to_rgb
+        # (unmodulated, modulated) channel counts of the SFT split.
+        self.sft_split = sft_split
+        self.fixed_noise = noises is not None
+        if self.fixed_noise:
+            self.register_buffer("noise1", noises[0])
+            self.register_buffer("noise2", noises[1])
+
+    def forward(self, feat, out, skip, styles):
+        feat = self.up_block(feat)
+        cond = self.condition_body(feat)
+        noise1 = self.noise1 if self.fixed_noise else None
+        noise2 = self.noise2 if self.fixed_noise else None
+
+        out = self.conv1(out, styles[0], noise=noise1)
+        if self.sft_split[0] == 0:
+            out = out * self.condition_scale(cond) + self.condition_shift(cond)
+        else:
+            out_same, out_sft = torch.split(out, self.sft_split, dim=1)
+            out_sft = out_sft * self.condition_scale(cond) + self.condition_shift(cond)
+            out = torch.cat([out_same, out_sft], dim=1)
+        out = self.conv2(out, styles[1], noise=noise2)
+        skip = self.to_rgb(out, styles[2], skip)
+        return feat, out, skip
+
+
+class FrozenGFPGAN(nn.Module):
+    """
+    GFPGAN with its inference-time settings resolved when it is built: the SFT conditions are
+    produced by separate scale and shift convs, the noise buffers and latent indices are bound
+    to each decoder level, and the U-Net decoder is interleaved with the StyleGAN2 decoder.
+    forward() is straight-line tensor code, ready for torch.jit.trace or torch.compile.
+    Takes and returns the restored image only.
+
+    Builds from our GFPGAN, whose combined condition convs are split into scale and shift
+    convs, or from the gfpgan package's GFPGANv1Clean (what the v1.3 and v1.4 checkpoints load
+    into), whose scale and shift convs are used as they are. Shares the source network's
+    weights, apart from the split convs.
+    """
+
+    @staticmethod
+    def supports(net: nn.Module) -> bool:
+        from gfpgan.archs.gfpganv1_clean_arch import GFPGANv1Clean
+
+        return isinstance(net, (GFPGAN, GFPGANv1Clean))
+
+    def __init__(self, gfpgan: nn.Module, randomize_noise: bool = True):
+        super().__init__()
+        decoder = gfpgan.stylegan_decoder
+        self.conv_body_first = gfpgan.conv_body_first
+        self.conv_body_down = gfpgan.conv_body_down
+        self.final_conv = gfpgan.final_conv
+        self.final_linear = gfpgan.final_linear
+        self.style_mlp = None if gfpgan.input_is_latent else decoder.style_mlp
+        self.num_style_feat = gfpgan.num_style_feat
+        self.different_w = gfpgan.different_w
+        self.num_latent = decoder.num_latent
+
+        self.constant_input = decoder.constant_input
+        self.style_conv1 = decoder.style_conv1
+        self.to_rgb1 = decoder.to_rgb1
+        self.fixed_noise = not randomize_noise
+        if self.fixed_noise:
+            self.register_buffer("noise0", decoder.noises.noise0)
+
+        self.levels = nn.ModuleList()
+        for level, (up_block, to_rgb) in enumerate(
+            zip(gfpgan.conv_body_up, decoder.to_rgbs)
+        ):
+            conv1 = decoder.style_convs[level * 2]
+            conv2 = decoder.style_convs[level * 2 + 1]
+            out_channels = conv1.modulated_conv.out_channels
+            noises = None
+            if self.fixed_noise:
+                noises = (
+                    getattr(decoder.noises, f"noise{level * 2 + 1}"),
+                    getattr(decoder.noises, f"noise{level * 2 + 2}"),
+                )
+            sft_channels = out_channels // 2 if decoder.sft_half else out_channels
+            sft_split = [out_channels - sft_channels, sft_channels]
+            if hasattr(gfpgan, "condition_convs"):
+                condition = gfpgan.condition_convs[level]
+                condition_body = nn.Sequential(condition[0], condition[1])
+                condition_scale, condition_shift = _split_conv(
+                    condition[2], sft_channels
+                )
+            else:
+                condition_body = nn.Identity()
+                condition_scale = gfpgan.condition_scale[level]
+                condition_shift = gfpgan.condition_shift[level]
+            self.levels.append(
+                _FrozenSFTLevel(
+                    up_block,
+                    condition_body,
+                    condition_scale,
+                    condition_shift,
+                    conv1,
+                    conv2,
+                    to_rgb,
+                    sft_split,
+                    noises,
+                )
+            )
+
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        feat = F.leaky_relu(self.conv_body_first(x), 0.2, True)
+        unet_skips = []
+        for down_block in self.conv_body_down:
+            feat = down_block(feat)
+            unet_skips.append(feat)
+        feat = F.leaky_relu(self.final_conv(feat), 0.2, True)
+
+        style_code = self.final_linear(feat.view(feat.size(0), -1))
+        if self.different_w:
+            style_code = style_code.view(style_code.size(0), -1, self.num_style_feat)
+        if self.style_mlp is not None:
+            style_code = self.style_mlp(style_code)
+        # Per-layer latents are views; a single latent is shared instead of repeated.
+        styles = (
+            style_code.unbind(1)
+            if style_code.ndim == 3
+            else [style_code] * self.num_latent
+        )
+
+        out = self.constant_input(x.size(0))
+        out = self.style_conv1(
+            out, styles[0], noise=self.noise0 if self.fixed_noise else None
+        )
+        skip = self.to_rgb1(out, styles[1])
+        for i, level in enumerate(self.levels):
+            feat, out, skip = level(
+                feat + unet_skips[-1 - i], out, skip, styles[2 * i + 1 : 2 * i + 4]
+            )
+        return skip
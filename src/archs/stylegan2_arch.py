@@ -9,6 +9,19 @@ from basicsr.archs.arch_util import default_init_weights
 from typing import List, Tuple
 
 
+# Bilinear 2x upsampling (align_corners=False) folded into the following 3x3 conv. For output
+# phase p (even/odd row or column), _UPSAMPLE_PHASES[p][t][d] is how much original tap d
+# contributes to the tap on input offset t - 1.
+_UPSAMPLE_PHASES = (
+    ((0.75, 0.25, 0.0), (0.25, 0.75, 0.75), (0.0, 0.0, 0.25)),
+    ((0.25, 0.0, 0.0), (0.75, 0.75, 0.25), (0.0, 0.25, 0.75)),
+)
+# Folding the upsample trades the 2x interpolated input for four phase kernels, which pays off
+# on the high-resolution levels, where StyleGAN2 has halved the channels and the kernels are
+# small. Upsampling convs with larger weights interpolate as usual.
+_MAX_FOLDED_WEIGHT = 256 * 128 * 3 * 3
+
+
 class NormStyleCode(nn.Module):
     def forward(self, x: torch.Tensor) -> torch.Tensor:
         return x * torch.rsqrt(torch.mean(x**2, dim=1, keepdim=True) + 1e-8)
@@ -38,6 +51,13 @@ class ModulatedConv2d(nn.Module):
             / math.sqrt(in_channels * kernel_size**2)
         )
         self.padding = kernel_size // 2
+        self.fused_modulation = False
+        self.fold_upsample = (
+            sample_mode == "upsample"
+            and kernel_size == 3
+            and self.weight.numel() <= _MAX_FOLDED_WEIGHT
+        )
+        self._weight_cache = None
         default_init_weights(
             self.modulation,
             scale=1,
@@ -48,6 +68,8 @@ class ModulatedConv2d(nn.Module):
         )
 
     def forward(self, x: torch.Tensor, style: torch.Tensor) -> torch.Tensor:
+        if self.fused_modulation and not self.training:
+            return self._fused_forward(x, style)
         b, c, h, w = x.shape
         style = self.modulation(style).view(b, 1, c, 1, 1)
         weight = self.weight * style
@@ -67,6 +89,150 @@ class ModulatedConv2d(nn.Module):
         out = F.conv2d(x.view(1, b * c, h, w), weight, padding=self.padding, groups=b)
         return out.view(b, self.out_channels, *out.shape[2:4])
 
+    def _cached_weights(self) -> dict:
+        """Style-independent tensors derived from the weight, rebuilt only when it changes."""
+        weight = self.weight
+        key = (weight.data_ptr(), weight._version, weight.dtype, weight.device)
+        if self._weight_cache is None or self._weight_cache["key"] != key:
+            base = weight.detach()[0]
+            cache = {"key": key, "weight_sq": base.pow(2).sum([2, 3])}
+            if self.fold_upsample:
+                taps = base.new_tensor(_UPSAMPLE_PHASES)
+                phases = torch.einsum("ptd,que,ocde->pqoctu", taps, taps, base)
+                cache["phases"] = [phases[p, q].contiguous() for p in (0, 1) for q in (0, 1)]
+            self._weight_cache = cache
+        return self._weight_cache
+
+    def _conv(
+        self,
+        x: torch.Tensor,
+        weight: torch.Tensor,
+        phases: List[torch.Tensor] = None,
+        groups: int = 1,
+    ) -> torch.Tensor:
+        """Conv with the module's resampling; `phases` folds a 2x upsample into the conv."""
+        # Sizes are traced values under torch.jit.trace; folded layers never see tiny inputs there.
+        if phases is None or (not torch.jit.is_tracing() and min(x.shape[2:]) < 2):
+            if self.sample_mode == "upsample":
+                x = F.interpolate(x, scale_factor=2, mode="bilinear", align_corners=False)
+            elif self.sample_mode == "downsample":
+                x = F.interpolate(x, scale_factor=0.5, mode="bilinear", align_corners=False)
+            return F.conv2d(x, weight, padding=self.padding, groups=groups)
+
+        # Each output phase is a 3x3 conv over the low-resolution input written straight into
+        # the strided output, so the 2x interpolated input is never materialized.
+        b, _, h, w = x.shape
+        padded = F.pad(x, (1, 1, 1, 1), mode="replicate")
+        out = x.new_empty(b, weight.shape[0], h * 2, w * 2)
+        for index, phase in enumerate(phases):
+            p, q = divmod(index, 2)
+            out[:, :, p::2, q::2] = F.conv2d(padded, phase, groups=groups)
+        # The phases see replicate padding around the upsampled image where the reference conv
+        # sees zeros, so the outermost rows and columns are recomputed from thin strips.
+        out[:, :, :1] = self._conv(x[:, :, :2], weight, groups=groups)[:, :, :1]
+        out[:, :, -1:] = self._conv(x[:, :, -2:], weight, groups=groups)[:, :, -1:]
+        out[:, :, :, :1] = self._conv(x[:, :, :, :2], weight, groups=groups)[:, :, :, :1]
+        out[:, :, :, -1:] = self._conv(x[:, :, :, -2:], weight, groups=groups)[:, :, :, -1:]
+        return out
+
+    def _fused_forward(self, x: torch.Tensor, style: torch.Tensor) -> torch.Tensor:
+        """
+        Inference path with cached demodulation and, on the high-resolution levels, the upsample
+        folded into the conv. The style scales the activations, so the whole batch runs through
+        one conv with the shared weight instead of a grouped conv over per-sample weights. For a
+        single sample, the weight is modulated once instead, which saves two passes over the
+        activations.
+
+        Which path runs never depends on the input's values, and under torch.jit.trace it is
+        always the batched one, so a trace holds for every batch size.
+        """
+        b, c, h, w = x.shape
+        cache = self._cached_weights()
+        # A view of the parameter, so traces keep using the (possibly memory-mapped) weight.
+        weight, phases = self.weight[0], cache.get("phases")
+        style = self.modulation(style)
+        demod = (
+            torch.rsqrt(style.pow(2) @ cache["weight_sq"].t() + self.eps)
+            if self.demodulate
+            else None
+        )
+
+        single = not torch.jit.is_tracing() and b == 1
+        if not single:
+            # Resampling is linear, so scaling before it is exact and touches fewer pixels.
+            out = self._conv(x * style[:, :, None, None], weight, phases)
+            if demod is not None:
+                out = out * demod[:, :, None, None]
+            return out
+
+        in_scale = style[:1].view(1, c, 1, 1)
+        out_scale = demod[:1].view(self.out_channels, 1, 1, 1) if demod is not None else 1
+
+        def modulate(kernel: torch.Tensor) -> torch.Tensor:
+            return kernel * in_scale * out_scale
+
+        weight = modulate(weight)
+        phases = None if phases is None else [modulate(phase) for phase in phases]
+        return self._conv(x, weight, phases)
+
+    @torch.no_grad()
+    def check_fused_modulation(self, batch: int = 2, size: int = 8) -> float:
+        """Returns the largest difference between the fused and reference paths on random input."""
+        x = self.weight.new_empty(batch, self.in_channels, size, size).normal_()
+        style = self.weight.new_empty(batch, self.modulation.in_features).normal_()
+        fused_modulation, self.fused_modulation = self.fused_modulation, False
+        try:
+            # A single sample takes the weight-side branch; check it as well.
+            errors = [
+                (self._fused_forward(x[:n], style[:n]) - self.forward(x[:n], style[:n])).abs().max()
+                for n in (batch, 1)
+            ]
+        finally:
+            self.fused_modulation = fused_modulation
+        return max(error.item() for error in errors)
+
+
+def set_fused_modulation(
+    net: nn.Module, enabled: bool = True, validate: bool = True, atol: float = 1e-3
+) -> int:
+    """
+    Switches every ModulatedConv2d in `net` to the fused inference path and returns how many
+    there are. The clean-arch ones of the gfpgan package (GFPGANv1Clean's decoder) compute the
+    same thing as ours, so they are replaced by ours, sharing their parameters: state dict keys
+    and memory-mapped weights are unaffected. With `validate`, each layer is first checked
+    against the reference path and a RuntimeError is raised on mismatch.
+    """
+    from gfpgan.archs.stylegan2_clean_arch import ModulatedConv2d as CleanModulatedConv2d
+
+    count = 0
+    for name, module in list(net.named_modules()):
+        if type(module) is CleanModulatedConv2d:
+            parent_name, _, child = name.rpartition(".")
+            parent = net.get_submodule(parent_name) if parent_name else net
+            ours = ModulatedConv2d(
+                module.in_channels,
+                module.out_channels,
+                module.kernel_size,
+                module.modulation.in_features,
+                module.demodulate,
+                module.sample_mode,
+                module.eps,
+            )
+            ours.weight, ours.modulation = module.weight, module.modulation
+            module = ours.train(module.training)
+            setattr(parent, child, module)
+        elif not isinstance(module, ModulatedConv2d):
+            continue
+        if enabled and validate:
+            error = module.check_fused_modulation()
+            if error > atol:
+                raise RuntimeError(
+                    f"Fused modulation mismatch in {name}: max error {error:.2e} > {atol:.0e}"
+                )
+        module.fused_modulation = enabled
+        count += 1
+    return count
+
 
 class StyleConv(nn.Module):
     def __init__(
@@ -133,7 +299,8 @@ class ConstantInput(nn.Module):
         return self.weight.repeat(batch, 1, 1, 1)
 
 
-@ARCH_REGISTRY.register()
+# basicsr registers its own StyleGAN2Generator, so ours is registered with a suffix.
+@ARCH_REGISTRY.register(suffix="picture_perfect")
 class StyleGAN2Generator(nn.Module):
     """Clean StyleGAN2 Generator"""
 
@@ -216,6 +383,13 @@ class StyleGAN2Generator(nn.Module):
             self.to_rgbs.append(ToRGB(out_channels, num_style_feat))
             in_channels = out_channels
 
+    def set_fused_modulation(
+        self, enabled: bool = True, validate: bool = True, atol: float = 1e-3
+    ):
+        """Switches every ModulatedConv2d to the fused inference path; see set_fused_modulation()."""
+        set_fused_modulation(self, enabled, validate, atol)
+        return self
+
     def _styles_to_latents(
         self,
         styles: List[torch.Tensor],
@@ -0,0 +1,61 @@
+# src/core/archive.py
+import io
+import os
+import zipfile
+
+# Formats that are already compressed; deflating them again costs CPU and saves nothing.
+COMPRESSED_EXTENSIONS = {".png", ".jpg", ".jpeg", ".webp", ".avif", ".gif", ".zip", ".mp4"}
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only, unseekable sink that collects what zipfile writes until it is drained."""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+        self._offset = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._offset += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._offset
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def stream_zip(files, chunk_size: int = 1024 * 1024):
+    """
+    Yields a ZIP archive of `(path, arcname)` pairs piece by piece, as it is built, without
+    writing anything to disk. Already-compressed formats are stored rather than deflated.
+    Files that disappear before their turn are skipped.
+    """
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, "w") as archive:
+        for path, arcname in files:
+            try:
+                info = zipfile.ZipInfo.from_file(path, arcname)
+                source = open(path, "rb")
+            except OSError:
+                continue
+            is_compressed = os.path.splitext(arcname)[1].lower() in COMPRESSED_EXTENSIONS
+            info.compress_type = zipfile.ZIP_STORED if is_compressed else zipfile.ZIP_DEFLATED
+            with source, archive.open(info, "w") as target:
+                while chunk := source.read(chunk_size):
+                    target.write(chunk)
+                    data = sink.drain()
+                    if data:
+                        yield data
+            data = sink.drain()
+            if data:
+                yield data
+    # Closing the archive writes the central directory.
+    yield sink.drain()
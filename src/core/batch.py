@@ -0,0 +1,212 @@
+# src/core/batch.py
+import os
+import time
+import queue
+import logging
+import threading
+
+import cv2
+import numpy as np
+
+from src.core.encoding import OUTPUT_FORMATS, encode_image
+from src.core.metrics import IMAGES_TOTAL
+from src.core.utils import atomic_write
+
+# File types the batch pipeline picks up from the input directory.
+INPUT_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp", ".bmp", ".tif", ".tiff", ".avif")
+
+# Passed down the queues once a stage has no more work.
+_DONE = object()
+
+
+class _Stage:
+    """One step of the pipeline: `workers` threads applying `fn` to items from `inbox`."""
+
+    def __init__(self, name, fn, workers, inbox, outbox):
+        self.name = name
+        self.fn = fn
+        self.workers = max(1, workers)
+        self.inbox = inbox
+        self.outbox = outbox
+        self.busy_seconds = 0.0
+        self._active = self.workers
+        self._lock = threading.Lock()
+
+
+class BatchPipeline:
+    """
+    Enhances every image in a directory tree with a pipelined read → decode → enhance → encode →
+    write engine. Each stage runs on its own threads and hands items to the next through a
+    bounded queue, so reading and decoding the next images and encoding the previous ones
+    overlap with inference, while at most BATCH_QUEUE_SIZE images wait between any two stages.
+    Within the enhance stage, face detection runs in parallel per worker and face restoration is
+    batched across workers, as for the web server.
+
+    Outputs that already exist are skipped, so an interrupted run resumes where it stopped.
+    Outputs are written under a temporary name and renamed, so a partial file is never mistaken
+    for a finished one.
+    """
+
+    def __init__(self, enhancer, config, input_dir: str, output_dir: str, fmt: str = None, quality: int = None,
+                 upscale_factor: float = None, options: dict = None, overwrite: bool = False):
+        self.enhancer = enhancer
+        self.config = config
+        self.input_dir = input_dir
+        self.output_dir = output_dir
+        self.fmt = fmt or config.OUTPUT_FORMAT
+        self.quality = quality or config.OUTPUT_QUALITY
+        self.upscale_factor = upscale_factor or config.UPSCALE_FACTOR
+        self.options = options or {}
+        self.overwrite = overwrite
+        self.logger = logging.getLogger(__name__)
+        self.failed = []
+        self._done = 0
+        self._total = 0
+        self._input_pixels = 0
+        self._lock = threading.Lock()
+
+    def plan(self):
+        """Lists (input path, output path) for every image, and how many were skipped as already done."""
+        pending, skipped = [], 0
+        for root, dirs, files in os.walk(self.input_dir):
+            dirs.sort()
+            for filename in sorted(files):
+                if not filename.lower().endswith(INPUT_EXTENSIONS):
+                    continue
+                source = os.path.join(root, filename)
+                # Keep the input's sub-directory layout, so same-named files in different folders never collide.
+                relative = os.path.relpath(os.path.splitext(source)[0], self.input_dir)
+                destination = os.path.join(self.output_dir, relative + OUTPUT_FORMATS[self.fmt])
+                if not self.overwrite and os.path.exists(destination):
+                    skipped += 1
+                    continue
+                pending.append((source, destination))
+        return pending, skipped
+
+    # --- Stages ---
+    # Each takes the item dict and returns it for the next stage, or None to drop it.
+
+    def _read(self, item):
+        item["started"] = time.perf_counter()
+        with open(item["source"], "rb") as f:
+            item["data"] = f.read()
+        return item
+
+    def _decode(self, item):
+        img = cv2.imdecode(np.frombuffer(item.pop("data"), dtype=np.uint8), cv2.IMREAD_COLOR)
+        if img is None:
+            raise ValueError("not a readable image")
+        item["image"] = img
+        return item
+
+    def _enhance(self, item):
+        img = item.pop("image")
+        with self._lock:
+            self._input_pixels += img.shape[0] * img.shape[1]
+        if self.enhancer.should_stream(img.shape, self.upscale_factor, self.fmt, self.options.get("max_long_edge")):
+            # Too large to build in memory: written strip by strip here, and skipped by encode and write.
+            os.makedirs(os.path.dirname(item["destination"]), exist_ok=True)
+            self.enhancer.enhance_to_png(img, item["destination"], upscale_factor=self.upscale_factor, **self.options)
+            item["streamed"] = True
+            return item
+        item["image"] = self.enhancer.enhance(img, upscale_factor=self.upscale_factor, **self.options)
+        return item
+
+    def _encode(self, item):
+        if item.get("streamed"):
+            return item
+        item["data"] = encode_image(item.pop("image"), self.fmt, self.quality, self.config.PNG_COMPRESSION)
+        return item
+
+    def _write(self, item):
+        destination = item["destination"]
+        if not item.get("streamed"):
+            os.makedirs(os.path.dirname(destination), exist_ok=True)
+            with atomic_write(destination) as temp_path, open(temp_path, "wb") as f:
+                f.write(item.pop("data"))
+        IMAGES_TOTAL.inc(outcome="enhanced")
+        with self._lock:
+            self._done += 1
+            done = self._done
+        self.logger.info(f"✅ [{done}/{self._total}] {os.path.relpath(item['source'], self.input_dir)} "
+                         f"({time.perf_counter() - item['started']:.2f}s)")
+        return None
+
+    def _stages(self, queue_size: int):
+        config = self.config
+        inference_workers = getattr(self.enhancer, "num_processes", None) or config.INFERENCE_WORKERS
+        layout = [
+            ("read", self._read, 1),
+            ("decode", self._decode, config.BATCH_DECODE_WORKERS),
+            ("enhance", self._enhance, inference_workers),
+            ("encode", self._encode, config.ENCODE_WORKERS),
+            ("write", self._write, 1),
+        ]
+        queues = [queue.Queue(maxsize=queue_size) for _ in layout]
+        return [_Stage(name, fn, workers, queues[i], queues[i + 1] if i + 1 < len(queues) else None)
+                for i, (name, fn, workers) in enumerate(layout)]
+
+    def _run_stage(self, stage: _Stage):
+        while (item := stage.inbox.get()) is not _DONE:
+            start = time.perf_counter()
+            try:
+                result = stage.fn(item)
+            except Exception as e:
+                self.logger.error(f"❌ Failed to {stage.name} {item['source']}: {e}")
+                IMAGES_TOTAL.inc(outcome="failed")
+                with self._lock:
+                    self.failed.append({"file": item["source"], "stage": stage.name, "error": str(e)})
+                result = None
+            with stage._lock:
+                stage.busy_seconds += time.perf_counter() - start
+            if result is not None:
+                stage.outbox.put(result)
+        # Leave the marker for this stage's other workers; the last one to stop passes it on.
+        stage.inbox.put(_DONE)
+        with stage._lock:
+            stage._active -= 1
+            last = stage._active == 0
+        if last and stage.outbox is not None:
+            stage.outbox.put(_DONE)
+
+    def run(self) -> dict:
+        """Runs the whole batch and returns a throughput report."""
+        pending, skipped = self.plan()
+        self._total = len(pending)
+        self.logger.info(f"📂 {len(pending)} image(s) to enhance in {self.input_dir}"
+                         + (f", {skipped} already done" if skipped else "") + ".")
+        stages = self._stages(max(1, self.config.BATCH_QUEUE_SIZE))
+        threads = [threading.Thread(target=self._run_stage, args=(stage,), name=f"batch-{stage.name}-{i}", daemon=True)
+                   for stage in stages for i in range(stage.workers)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        # Feeding the first queue blocks while it is full, which is what bounds the whole pipeline.
+        for source, destination in pending:
+            stages[0].inbox.put({"source": source, "destination": destination})
+        stages[0].inbox.put(_DONE)
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        report = {
+            "images": self._done,
+            "skipped": skipped,
+            "failed": len(self.failed),
+            "seconds": round(elapsed, 3),
+            "images_per_second": round(self._done / elapsed, 3) if elapsed > 0 else 0,
+            "input_megapixels_per_second": round(self._input_pixels / 1e6 / elapsed, 3) if elapsed > 0 else 0,
+            # Busy time per worker thread; the stage closest to 100% is the bottleneck.
+            "stage_utilization": {
+                stage.name: round(stage.busy_seconds / (elapsed * stage.workers), 3) if elapsed > 0 else 0
+                for stage in stages
+            },
+            "failures": self.failed,
+        }
+        self.logger.info(f"🏁 Enhanced {report['images']} image(s) in {elapsed:.2f}s "
+                         f"({report['images_per_second']:.2f} images/s, "
+                         f"{report['input_megapixels_per_second']:.2f} input MP/s); "
+                         f"{skipped} skipped, {len(self.failed)} failed.")
+        self.logger.info("   Stage utilization: " + ", ".join(
+            f"{name} {value:.0%}" for name, value in report["stage_utilization"].items()))
+        return report
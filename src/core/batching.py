@@ -0,0 +1,125 @@
+# src/core/batching.py
+import time
+import logging
+import threading
+from concurrent.futures import Future
+
+import torch
+from basicsr.utils import img2tensor, tensor2img
+from torchvision.transforms.functional import normalize
+
+
+class _RestoreRequest:
+    def __init__(self, faces):
+        self.faces = faces
+        self.results = [None] * len(faces)
+        self.future = Future()
+
+
+class FaceBatcher:
+    """
+    Restores aligned 512x512 faces through the GFPGAN network in shared batches.
+    `net` maps a normalized face batch to restored faces (see export.RestorationHead).
+
+    Callers on any thread hand over all the faces of one image with `restore()`. A single
+    batching thread stacks the faces of every request that arrives within a short window into
+    one tensor, runs the network once per `max_batch_size` faces and scatters the results back.
+    Callers that are still detecting faces can `announce()` themselves so the batcher waits for
+    them; when nobody is announced, a request is run immediately.
+    """
+
+    def __init__(self, net, device, max_batch_size: int = 8, max_wait_ms: float = 20):
+        self.net = net
+        self.device = device
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0, max_wait_ms) / 1000
+        self.logger = logging.getLogger(__name__)
+        self._cond = threading.Condition()
+        self._pending = []
+        self._announced = 0
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="face-batcher", daemon=True)
+        self._thread.start()
+
+    def announce(self):
+        """Signals that a request is on its way, so the current batch waits for it."""
+        with self._cond:
+            self._announced += 1
+
+    def withdraw(self):
+        """Cancels an announcement for a request that will never arrive."""
+        with self._cond:
+            self._announced -= 1
+            self._cond.notify_all()
+
+    def restore(self, faces, announced: bool = False):
+        """Restores a list of BGR uint8 faces and blocks until their batch has run."""
+        request = _RestoreRequest(list(faces))
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Face batcher has been closed.")
+            if announced:
+                self._announced -= 1
+            if request.faces:
+                self._pending.append(request)
+            self._cond.notify_all()
+        if not request.faces:
+            return []
+        return request.future.result()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+
+    def _pending_faces(self):
+        return sum(len(request.faces) for request in self._pending)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if not self._pending:
+                    return
+                # Hold the batch open while other callers are still detecting faces.
+                deadline = time.monotonic() + self.max_wait
+                while self._announced > 0 and self._pending_faces() < self.max_batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch, self._pending = self._pending, []
+            try:
+                self._run_batch(batch)
+            except Exception as e:
+                self.logger.error(f"❌ Face batch failed: {e}", exc_info=True)
+                for request in batch:
+                    if not request.future.done():
+                        request.future.set_exception(e)
+
+    def _run_batch(self, batch):
+        entries = [(request, index, face) for request in batch for index, face in enumerate(request.faces)]
+        for start in range(0, len(entries), self.max_batch_size):
+            chunk = entries[start:start + self.max_batch_size]
+            faces = [face for _, _, face in chunk]
+            try:
+                restored = self._forward(faces)
+            except RuntimeError as error:
+                self.logger.warning(f"⚠️  GFPGAN inference failed for a batch of {len(faces)} face(s): {error}")
+                restored = faces
+            for (request, index, _), face in zip(chunk, restored):
+                request.results[index] = face.astype("uint8")
+        for request in batch:
+            request.future.set_result(request.results)
+
+    @torch.no_grad()
+    def _forward(self, faces):
+        tensors = []
+        for face in faces:
+            face_t = img2tensor(face / 255., bgr2rgb=True, float32=True)
+            normalize(face_t, (0.5, 0.5, 0.5), (0.5, 0.5, 0.5), inplace=True)
+            tensors.append(face_t)
+        output = self.net(torch.stack(tensors).to(self.device))
+        return [tensor2img(face_t, rgb2bgr=True, min_max=(-1, 1)) for face_t in output]
@@ -0,0 +1,111 @@
+# src/core/cache.py
+import os
+import json
+import shutil
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+from src.core.utils import atomic_write, format_size
+
+
+class ResultCache:
+    """
+    Content-addressed store of enhanced images on disk. Entries are keyed by a hash of the input
+    bytes and everything that affects the output, and the least recently used entries are
+    evicted once the cache grows beyond `max_bytes`.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int, extension: str = ".bin"):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.extension = extension
+        self.logger = logging.getLogger(__name__)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load_index()
+
+    @staticmethod
+    def key(data: bytes, params: dict) -> str:
+        """Hashes the input bytes together with the parameters that shape the output."""
+        digest = hashlib.sha256(data)
+        digest.update(json.dumps(params, sort_keys=True, default=str).encode())
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}{self.extension}")
+
+    def _load_index(self):
+        # Rebuild the LRU order from modification times, which get() refreshes on every hit.
+        files = []
+        for filename in os.listdir(self.cache_dir):
+            if filename.endswith(self.extension):
+                stat = os.stat(os.path.join(self.cache_dir, filename))
+                files.append((stat.st_mtime, filename[:-len(self.extension)], stat.st_size))
+        for _, key, size in sorted(files):
+            self._entries[key] = size
+            self._size += size
+        if files:
+            self.logger.info(f"🗃️  Result cache holds {len(files)} image(s), {format_size(self._size)}.")
+
+    def get(self, key: str, destination: str) -> bool:
+        """Copies a cached result to `destination`. Returns False on a cache miss."""
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return False
+            self._entries.move_to_end(key)
+            self.hits += 1
+        path = self._path(key)
+        try:
+            os.utime(path)
+            if os.path.abspath(path) != os.path.abspath(destination):
+                shutil.copyfile(path, destination)
+            return True
+        except OSError as e:
+            # The file vanished behind our back; forget it and treat this as a miss.
+            self.logger.warning(f"⚠️  Dropping unreadable cache entry {key[:12]}: {e}")
+            with self._lock:
+                self._size -= self._entries.pop(key, 0)
+                self.hits -= 1
+                self.misses += 1
+            return False
+
+    def put(self, key: str, source: str):
+        """Stores a copy of `source` under `key` and evicts old entries beyond the size limit."""
+        size = os.path.getsize(source)
+        if size > self.max_bytes:
+            return
+        path = self._path(key)
+        with atomic_write(path) as temp_path:
+            shutil.copyfile(source, temp_path)
+        with self._lock:
+            self._size += size - self._entries.pop(key, 0)
+            self._entries[key] = size
+            while self._size > self.max_bytes and self._entries:
+                old_key, old_size = self._entries.popitem(last=False)
+                self._size -= old_size
+                self.evictions += 1
+                try:
+                    os.remove(self._path(old_key))
+                except OSError:
+                    pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "size_bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,121 @@
+# src/core/cpu.py
+import os
+import glob
+import logging
+
+logger = logging.getLogger(__name__)
+
+AFFINITY_MODES = (None, "cores", "numa")
+
+
+def usable_cores() -> list:
+    """The CPU cores this process may run on."""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def _parse_cpulist(text: str) -> list:
+    """Parses a kernel CPU list such as "0-3,8-11"."""
+    cores = []
+    for part in text.strip().split(","):
+        if "-" in part:
+            first, last = part.split("-")
+            cores.extend(range(int(first), int(last) + 1))
+        elif part:
+            cores.append(int(part))
+    return cores
+
+
+def numa_nodes(cores: list) -> list:
+    """`cores` grouped by NUMA node; a single group where the system reports no nodes."""
+    nodes = []
+    for path in sorted(glob.glob("/sys/devices/system/node/node[0-9]*/cpulist")):
+        with open(path) as f:
+            node = [core for core in _parse_cpulist(f.read()) if core in cores]
+        if node:
+            nodes.append(node)
+    return nodes or [list(cores)]
+
+
+def format_cores(cores) -> str:
+    """The inverse of _parse_cpulist, for logs: [0, 1, 2, 3, 6] -> "0-3,6"."""
+    ranges, cores = [], sorted(cores)
+    for core in cores:
+        if ranges and core == ranges[-1][1] + 1:
+            ranges[-1][1] = core
+        else:
+            ranges.append([core, core])
+    return ",".join(f"{a}-{b}" if a != b else f"{a}" for a, b in ranges)
+
+
+class WorkerPlan:
+    """The threads one inference worker runs with, and the cores it is pinned to (None = not pinned)."""
+
+    def __init__(self, index: int, threads: int, interop_threads: int = 1, cores=None):
+        self.index = index
+        self.threads = threads
+        self.interop_threads = interop_threads
+        self.cores = cores
+
+    def to_dict(self) -> dict:
+        return {"threads": self.threads, "interop_threads": self.interop_threads,
+                "cores": format_cores(self.cores) if self.cores else None}
+
+
+def plan_workers(num_workers: int, threads_per_worker: int = None, affinity: str = None,
+                 interop_threads: int = 1, cores: list = None) -> list:
+    """
+    Splits the usable cores between `num_workers` inference workers, so that the threads of
+    concurrent forward passes add up to the cores instead of each pass assuming all of them.
+    With `affinity`, each worker also gets the cores it is pinned to: its own slice of cores
+    ("cores"), or the cores of one NUMA node, with the workers spread over the nodes ("numa").
+    """
+    if affinity not in AFFINITY_MODES:
+        raise ValueError(f"Unknown CPU affinity '{affinity}'. Choose one of: {', '.join(map(str, AFFINITY_MODES))}")
+    cores = cores or usable_cores()
+    num_workers = max(1, num_workers)
+    if affinity == "numa":
+        nodes = numa_nodes(cores)
+        plans = []
+        for index in range(num_workers):
+            node = nodes[index % len(nodes)]
+            sharing = len(range(index % len(nodes), num_workers, len(nodes)))
+            threads = threads_per_worker or max(1, len(node) // sharing)
+            plans.append(WorkerPlan(index, threads, interop_threads, node))
+        return plans
+    threads = threads_per_worker or max(1, len(cores) // num_workers)
+    plans = []
+    for index in range(num_workers):
+        pinned = None
+        if affinity == "cores":
+            # Slices wrap around when the workers ask for more threads than there are cores.
+            pinned = [cores[(index * threads + i) % len(cores)] for i in range(min(threads, len(cores)))]
+        plans.append(WorkerPlan(index, threads, interop_threads, pinned))
+    return plans
+
+
+def thread_plan(config) -> WorkerPlan:
+    """
+    The plan of a process serving INFERENCE_WORKERS threads. They share one torch and one OpenCV
+    thread pool, so they get their share of the cores but can't be pinned separately.
+    """
+    return plan_workers(config.INFERENCE_WORKERS, config.THREADS_PER_WORKER, None, config.INTEROP_THREADS)[0]
+
+
+def apply_worker_plan(plan: WorkerPlan):
+    """Sets this process's torch and OpenCV thread counts, and its core affinity, to the plan."""
+    import cv2
+    import torch
+
+    torch.set_num_threads(plan.threads)
+    try:
+        torch.set_num_interop_threads(plan.interop_threads)
+    except RuntimeError:
+        # Only possible before the first inter-op parallel work; too late is harmless.
+        pass
+    cv2.setNumThreads(plan.threads)
+    if plan.cores and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, plan.cores)
+    logger.info(f"🧮 Running with {plan.threads} torch/OpenCV thread(s)"
+                + (f", pinned to cores {format_cores(plan.cores)}." if plan.cores else "."))
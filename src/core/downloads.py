@@ -0,0 +1,158 @@
+# src/core/downloads.py
+import os
+import time
+import hashlib
+import logging
+import threading
+
+import requests
+from requests.adapters import Retry, HTTPAdapter
+from requests.exceptions import RequestException
+from urllib3.exceptions import HTTPError as TransportError
+
+logger = logging.getLogger(__name__)
+
+MIN_CHUNK_SIZE = 64 * 1024
+MAX_CHUNK_SIZE = 8 * 1024 * 1024
+# Chunk sizes adapt so that reading one chunk takes about this long.
+TARGET_CHUNK_SECONDS = 0.25
+
+# One lock per destination, so two requests for the same model never write the same file.
+_locks = {}
+_locks_guard = threading.Lock()
+
+
+def _lock_for(path: str) -> threading.Lock:
+    with _locks_guard:
+        return _locks.setdefault(os.path.abspath(path), threading.Lock())
+
+
+def file_sha256(path: str, digest=None, chunk_size: int = MAX_CHUNK_SIZE):
+    """Hashes a file, or feeds it into an existing hash object. Returns the hash object."""
+    digest = digest or hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest
+
+
+def _session(retries: int) -> requests.Session:
+    session = requests.Session()
+    retry_strategy = Retry(total=retries, backoff_factor=1, status_forcelist=[429, 500, 502, 503, 504])
+    adapter = HTTPAdapter(max_retries=retry_strategy)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+class _Progress:
+    """Decides when a progress event is due: every `interval` seconds or `step` percent, whichever is first."""
+
+    def __init__(self, interval: float, step: float):
+        self.interval = interval
+        self.step = step
+        self._last_time = 0.0
+        self._last_percent = -step
+
+    def due(self, percent: float) -> bool:
+        now = time.monotonic()
+        if now - self._last_time >= self.interval or percent - self._last_percent >= self.step:
+            self._last_time, self._last_percent = now, percent
+            return True
+        return False
+
+
+def download_file(name: str, url: str, destination: str, sha256: str = None, retries: int = 5,
+                  timeout: float = 20, progress_interval: float = 0.5, progress_step: float = 1.0):
+    """
+    A generator that downloads `url` to `destination` and yields progress events for `name`.
+
+    The file is written to `destination + ".part"` and only moved into place once complete and,
+    if `sha256` is given, verified. An interrupted download, in this call or an earlier one,
+    resumes from the partial file with an HTTP Range request. Progress events are throttled to
+    one per `progress_interval` seconds or `progress_step` percent.
+    """
+    with _lock_for(destination):
+        if os.path.exists(destination):
+            # Finished by a concurrent request while this one waited for the lock.
+            yield {"status": "completed", "model_name": name}
+            return
+
+        partial = f"{destination}.part"
+        session = _session(retries)
+        progress = _Progress(progress_interval, progress_step)
+        failures = 0
+        while True:
+            try:
+                digest, total_size = yield from _fetch(name, url, partial, session, timeout, progress)
+                break
+            except (RequestException, TransportError, OSError) as e:
+                failures += 1
+                if failures > retries:
+                    logger.error(f"❌ Download failed for {name}: {e}")
+                    yield {"status": "error", "model_name": name, "error_message": str(e)}
+                    return
+                logger.warning(f"⚠️  Download of {name} interrupted ({e}); resuming (attempt {failures}/{retries}).")
+                time.sleep(min(2 ** failures, 30))
+
+        yield {"status": "verifying", "model_name": name}
+        actual = digest.hexdigest()
+        if sha256 and actual != sha256.lower():
+            os.remove(partial)
+            message = f"Checksum mismatch for {name}: expected {sha256}, got {actual}."
+            logger.error(f"❌ {message}")
+            yield {"status": "error", "model_name": name, "error_message": message}
+            return
+        if not sha256:
+            logger.info(f"   - {name} has no pinned checksum; its SHA-256 is {actual}.")
+        os.replace(partial, destination)
+        logger.info(f"✅ Download complete for {name}.")
+        yield {"status": "completed", "model_name": name, "sha256": actual, "total_bytes": total_size}
+
+
+def _fetch(name, url, partial, session, timeout, progress):
+    """Downloads into `partial`, resuming from its current size. Returns the hash and total size."""
+    offset = os.path.getsize(partial) if os.path.exists(partial) else 0
+    headers = {"Range": f"bytes={offset}-"} if offset else {}
+    with session.get(url, stream=True, timeout=timeout, headers=headers) as response:
+        if response.status_code == 416 and offset:
+            # The partial file already holds everything the server has.
+            total_size = offset
+            return file_sha256(partial), total_size
+        response.raise_for_status()
+        if offset and response.status_code == 206:
+            logger.info(f"⬇️  Resuming {name} at {offset} bytes...")
+            total_size = offset + int(response.headers.get("content-length", 0))
+            mode, digest = "ab", file_sha256(partial)
+        else:
+            # No partial file, or the server ignored the range and is sending the whole file.
+            logger.info(f"⬇️  Downloading {name} from {url}...")
+            total_size = int(response.headers.get("content-length", 0))
+            mode, digest, offset = "wb", hashlib.sha256(), 0
+
+        downloaded = offset
+        chunk_size = MIN_CHUNK_SIZE
+        with open(partial, mode) as f:
+            while True:
+                start = time.monotonic()
+                chunk = response.raw.read(chunk_size, decode_content=True)
+                if not chunk:
+                    break
+                elapsed = time.monotonic() - start
+                f.write(chunk)
+                digest.update(chunk)
+                downloaded += len(chunk)
+                # Fast links get bigger chunks, which means fewer syscalls and fewer progress checks.
+                if elapsed < TARGET_CHUNK_SECONDS / 2:
+                    chunk_size = min(chunk_size * 2, MAX_CHUNK_SIZE)
+                elif elapsed > TARGET_CHUNK_SECONDS * 2:
+                    chunk_size = max(chunk_size // 2, MIN_CHUNK_SIZE)
+                percent = (downloaded / total_size) * 100 if total_size > 0 else 0
+                if progress.due(percent):
+                    yield {"status": "downloading", "model_name": name, "progress": percent,
+                           "downloaded_bytes": downloaded, "total_bytes": total_size}
+        if total_size and downloaded < total_size:
+            raise OSError(f"connection closed after {downloaded} of {total_size} bytes")
+        yield {"status": "downloading", "model_name": name, "progress": 100.0,
+               "downloaded_bytes": downloaded, "total_bytes": total_size or downloaded}
+        return digest, total_size or downloaded
@@ -0,0 +1,46 @@
+# src/core/encoding.py
+import time
+
+import cv2
+
+from src.core.utils import atomic_write
+
+# Output format name -> file extension.
+OUTPUT_FORMATS = {"png": ".png", "jpeg": ".jpg", "webp": ".webp", "avif": ".avif"}
+
+
+def available_formats():
+    """Output formats this OpenCV build can encode (AVIF needs a build with libavif)."""
+    return [fmt for fmt, ext in OUTPUT_FORMATS.items() if cv2.haveImageWriter(f"output{ext}")]
+
+
+def encode_params(fmt: str, quality: int, png_compression: int):
+    """cv2.imencode parameters for a format. `quality` (1-100) applies to the lossy formats."""
+    if fmt == "png":
+        return [cv2.IMWRITE_PNG_COMPRESSION, png_compression]
+    if fmt == "jpeg":
+        return [cv2.IMWRITE_JPEG_QUALITY, quality, cv2.IMWRITE_JPEG_OPTIMIZE, 1]
+    if fmt == "webp":
+        return [cv2.IMWRITE_WEBP_QUALITY, quality]
+    if fmt == "avif":
+        return [cv2.IMWRITE_AVIF_QUALITY, quality]
+    raise ValueError(f"Unknown output format '{fmt}'. Choose one of: {', '.join(OUTPUT_FORMATS)}")
+
+
+def encode_image(img, fmt: str = "png", quality: int = 90, png_compression: int = 1) -> bytes:
+    """Encodes a BGR image in memory."""
+    ok, buffer = cv2.imencode(OUTPUT_FORMATS[fmt], img, encode_params(fmt, quality, png_compression))
+    if not ok:
+        raise RuntimeError(f"OpenCV could not encode the image as {fmt}.")
+    return buffer.tobytes()
+
+
+def write_image(img, path: str, fmt: str = "png", quality: int = 90, png_compression: int = 1) -> dict:
+    """Encodes and writes an image, and reports the format, encoded size and encode time."""
+    start = time.perf_counter()
+    data = encode_image(img, fmt, quality, png_compression)
+    encode_seconds = time.perf_counter() - start
+    # Write under a temporary name first, so readers never see a half-written output.
+    with atomic_write(path) as temp_path, open(temp_path, "wb") as f:
+        f.write(data)
+    return {"format": fmt, "output_bytes": len(data), "encode_seconds": round(encode_seconds, 4)}
@@ -1,119 +1,656 @@
 # src/core/enhancer.py
 import os
+import copy
+import queue
 import logging
-import requests
 import time
-import torch
-from basicsr.archs.rrdbnet_arch import RRDBNet
-from gfpgan import GFPGANer
-from realesrgan import RealESRGANer
-from requests.adapters import Retry, HTTPAdapter
-from requests.exceptions import RequestException
+
+from src.core.downloads import download_file
+from src.core.metrics import record_enhance
+from src.core.utils import PhaseTimer
+
+# torch, basicsr, gfpgan and the modules built on them are imported when the models load rather
+# than here, so the web server can start and answer status requests without waiting for them.
+
+BACKGROUND_MODES = ("auto", "realesrgan", "light", "resize")
+
+
+def _windows(items, size: int):
+    """Groups an iterable into lists of up to `size` items, without reading further ahead."""
+    window = []
+    for item in items:
+        window.append(item)
+        if len(window) == size:
+            yield window
+            window = []
+    if window:
+        yield window
 
 class PicturePerfectEnhancer:
-    def __init__(self, config):
+    def __init__(self, config, worker_plan=None):
         self.config = config
+        # Threads and cores to run with; by default, this process's share for INFERENCE_WORKERS threads.
+        self.worker_plan = worker_plan
         self.logger = logging.getLogger(__name__)
-        self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
-        self.gfpganer = None
-        self.bg_upsampler = None
+        self.device = None
+        self.device_name = None
+        self.half_precision = None
+        self.face_helper = None
+        self.models = None
+        self.face_cache = None
+        self.last_tile_report = None
+        self.cpu_precision = {}
+        self._face_helper_pool = queue.Queue()
+        self.load_timings = {}
         self.is_initialized = False
-        self.logger.info(f"ℹ️  Enhancer initialized on device: {self.device}")
+        self.logger.info("ℹ️  Enhancer initialized.")
 
     def check_models(self):
         """Checks for all required models and returns a list of missing ones."""
         missing_models = []
-        for name, filename, url, dest_dir in self.config.REQUIRED_MODELS:
+        for name, filename, url, dest_dir, _ in self.config.REQUIRED_MODELS:
             path = os.path.join(dest_dir, filename)
             if not os.path.exists(path):
                 missing_models.append({"name": name, "filename": filename, "url": url})
         return missing_models
 
     def download_model(self, model_info):
-        """A generator that downloads a single model and yields progress."""
+        """A generator that downloads a single model and yields progress. Resumes partial downloads."""
         name = model_info['name']
-        url = model_info['url']
-        filename = model_info['filename']
-        dest_dir = next((m[3] for m in self.config.REQUIRED_MODELS if m[0] == name), None)
-        if not dest_dir: raise ValueError(f"Unknown model name: {name}")
+        model = next((m for m in self.config.REQUIRED_MODELS + self.config.OPTIONAL_MODELS if m[0] == name), None)
+        if not model: raise ValueError(f"Unknown model name: {name}")
+        # Only the name comes from the client; the URL, path and checksum come from the config.
+        _, filename, url, dest_dir, sha256 = model
 
         os.makedirs(dest_dir, exist_ok=True)
-        destination = os.path.join(dest_dir, filename)
-
-        self.logger.info(f"⬇️  Downloading {name} from {url}...")
-
-        if os.path.exists(destination):
-            self.logger.info(f"   - Cleaning up previous incomplete download for {name}.")
-            os.remove(destination)
-        
-        session = requests.Session()
-        retry_strategy = Retry(total=3, backoff_factor=1, status_forcelist=[429, 500, 502, 503, 504])
-        adapter = HTTPAdapter(max_retries=retry_strategy)
-        session.mount("https://", adapter)
-
-        try:
-            response = session.get(url, stream=True, timeout=20)
-            response.raise_for_status()
-            total_size = int(response.headers.get('content-length', 0))
-            downloaded_size = 0
-            
-            with open(destination, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    f.write(chunk)
-                    downloaded_size += len(chunk)
-                    progress = (downloaded_size / total_size) * 100 if total_size > 0 else 0
-                    yield {"status": "downloading", "model_name": name, "progress": progress}
-            
-            self.logger.info(f"✅ Download complete for {name}.")
-            yield {"status": "completed", "model_name": name}
-
-        except RequestException as e:
-            self.logger.error(f"❌ Download failed for {name}: {e}")
-            if os.path.exists(destination):
-                os.remove(destination)
-            yield {"status": "error", "model_name": name, "error_message": str(e)}
+        yield from download_file(
+            name, url, os.path.join(dest_dir, filename), sha256=sha256,
+            retries=self.config.DOWNLOAD_RETRIES, timeout=self.config.DOWNLOAD_TIMEOUT,
+            progress_interval=self.config.DOWNLOAD_PROGRESS_INTERVAL,
+            progress_step=self.config.DOWNLOAD_PROGRESS_STEP
+        )
 
     def load_models_into_memory(self):
         """Loads the models into the GPU/CPU memory after they are downloaded."""
         if self.is_initialized:
             return
 
+        timer = PhaseTimer()
+        with timer.phase("imports"):
+            import torch
+            from facexlib.utils.face_restoration_helper import FaceRestoreHelper
+            from src.core.cpu import apply_worker_plan, thread_plan
+            from src.core.faces import FaceCache
+            from src.core.registry import ModelRegistry
+
+        self.worker_plan = self.worker_plan or thread_plan(self.config)
+        apply_worker_plan(self.worker_plan)
+
+        self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+        self.device_name = torch.cuda.get_device_name(0) if self.device.type == "cuda" else "CPU"
+        self.half_precision = self.device.type == "cuda" if self.config.USE_HALF_PRECISION is None else self.config.USE_HALF_PRECISION
         self.logger.info(f"🧠 Loading models into memory on device: {self.device}")
-        
-        realesrgan_model_path = next(os.path.join(m[3], m[1]) for m in self.config.REQUIRED_MODELS if m[0] == "Real-ESRGAN x4+")
-        bg_model = RRDBNet(num_in_ch=3, num_out_ch=3, num_feat=64, num_block=23, num_grow_ch=32, scale=4)
-        self.bg_upsampler = RealESRGANer(
-            scale=4, model_path=realesrgan_model_path, model=bg_model, tile=400,
-            tile_pad=10, pre_pad=0, half=self.config.USE_HALF_PRECISION, device=self.device
+
+        with timer.phase("face helpers"):
+            # The detector and parser are shared by every face and background variant.
+            self.face_helper = FaceRestoreHelper(
+                self.config.UPSCALE_FACTOR, face_size=512, crop_ratio=(1, 1), det_model='retinaface_resnet50',
+                save_ext='png', use_parse=True, device=self.device, model_rootpath='gfpgan/weights'
+            )
+            if self.device.type == "cpu" and self.config.MMAP_WEIGHTS:
+                self._map_helper_weights()
+
+        self.models = ModelRegistry(self._load_variant, self.config.MODEL_MEMORY_BUDGET_MB * 1024 * 1024)
+        # The default variants load now, so the first requests don't wait for them; others load on first use.
+        with timer.phase("face models"):
+            with self.models.use(self.config.DEFAULT_FACE_MODEL):
+                pass
+        with timer.phase("background models"):
+            for name in self._default_background_variants():
+                with self.models.use(name):
+                    pass
+
+        with timer.phase("workers"):
+            # Every inference worker gets its own face helper so concurrent requests never share per-image state.
+            self._face_helper_pool.put(self.face_helper)
+            for _ in range(max(1, self.config.INFERENCE_WORKERS) - 1):
+                clone = copy.copy(self.face_helper)
+                clone.clean_all()
+                self._face_helper_pool.put(clone)
+            self.face_cache = FaceCache(self.config.FACE_CACHE_SIZE) if self.config.FACE_CACHE_SIZE > 0 else None
+
+        self.load_timings = timer.phases
+        self.is_initialized = True
+        self.logger.info(f"✅ All models loaded and ready to enhance ({timer.summary()}).")
+
+    def _prepared_weights(self, model_path: str) -> str:
+        """The fast-loading conversion of a checkpoint, or the checkpoint itself if that is disabled."""
+        if not self.config.PREPARE_WEIGHTS:
+            return model_path
+        from src.core.weights import prepare_weights
+        return prepare_weights(model_path, self.config.PREPARED_WEIGHTS_DIR)
+
+    def _model_path(self, name: str) -> str:
+        return next(os.path.join(m[3], m[1]) for m in self.config.REQUIRED_MODELS + self.config.OPTIONAL_MODELS if m[0] == name)
+
+    def _variant_spec(self, name: str) -> dict:
+        spec = self.config.FACE_MODEL_VARIANTS.get(name) or self.config.BACKGROUND_MODEL_VARIANTS.get(name)
+        if spec is None:
+            raise ValueError(f"Unknown model variant '{name}'.")
+        return spec
+
+    def available_variants(self, kind: str, family: str = None) -> list:
+        """Names of the "face" or "background" variants whose checkpoints are downloaded."""
+        variants = self.config.FACE_MODEL_VARIANTS if kind == "face" else self.config.BACKGROUND_MODEL_VARIANTS
+        return [name for name, spec in variants.items()
+                if (family is None or spec.get("family") == family) and os.path.exists(self._model_path(spec["model"]))]
+
+    def _default_background_variants(self) -> list:
+        """The variant of each background family that plain 4x requests use."""
+        names = []
+        for family in ("realesrgan", "light"):
+            available = self.available_variants("background", family)
+            if available:
+                names.append(max(available, key=lambda name: self.config.BACKGROUND_MODEL_VARIANTS[name]["scale"]))
+        return names
+
+    def _load_variant(self, name: str):
+        """Loads a face or background variant for the registry. Returns it with the bytes its weights hold."""
+        spec = self._variant_spec(name)
+        model_path = self._model_path(spec["model"])
+        if not os.path.exists(model_path):
+            raise ValueError(f"Model variant '{name}' needs {spec['model']}, which has not been downloaded.")
+        if name in self.config.FACE_MODEL_VARIANTS:
+            return self._load_face_variant(name, spec, model_path)
+        return self._load_background_variant(name, spec, model_path)
+
+    def _load_background_variant(self, name: str, spec: dict, model_path: str):
+        from basicsr.archs.rrdbnet_arch import RRDBNet
+        from realesrgan.archs.srvgg_arch import SRVGGNetCompact
+        from src.core.registry import module_bytes
+        from src.core.tiling import AdaptiveRealESRGANer
+        from src.core.weights import skip_weight_init
+
+        scale = spec["scale"]
+        weights = self._prepared_weights(model_path)
+        # Every weight is overwritten by its checkpoint, so the random initialization is skipped.
+        with skip_weight_init():
+            if spec["arch"] == "srvgg":
+                model = SRVGGNetCompact(num_in_ch=3, num_out_ch=3, num_feat=64, num_conv=32, upscale=scale, act_type="prelu")
+            else:
+                model = RRDBNet(num_in_ch=3, num_out_ch=3, num_feat=64, num_block=23, num_grow_ch=32, scale=scale)
+            upsampler = AdaptiveRealESRGANer(
+                scale=scale, model_path=weights, model=model, tile=self.config.TILE_SIZE,
+                tile_pad=self.config.TILE_PAD, pre_pad=0, half=self.half_precision, device=self.device,
+                memory_fraction=self.config.TILE_MEMORY_FRACTION, max_tile_batch=self.config.MAX_TILE_BATCH
+            )
+        nbytes = module_bytes(upsampler.model)
+        if self.device.type == "cpu" and self.config.MMAP_WEIGHTS:
+            self._map_weights(upsampler.model, weights)
+        if self.device.type == "cpu" and self.config.CPU_PRECISION != "fp32":
+            from src.core.precision import sample_inputs
+            upsampler.model = self._apply_cpu_precision(name, upsampler.model, sample_inputs(128))
+        return upsampler, nbytes
+
+    def _load_face_variant(self, name: str, spec: dict, model_path: str):
+        from src.core.batching import FaceBatcher
+        from src.core.export import ExportedModule, RestorationHead, model_fingerprint
+        from src.core.registry import module_bytes
+        from src.core.weights import checkpoint_state_dict, skip_weight_init
+
+        import torch
+
+        weights = self._prepared_weights(model_path)
+        with skip_weight_init():
+            net = self._build_face_net(spec["arch"], spec["channel_multiplier"])
+        net.load_state_dict(checkpoint_state_dict(torch.load(weights, map_location="cpu")), strict=True)
+        net = net.eval().to(self.device)
+        if self.device.type == "cpu" and self.config.MMAP_WEIGHTS:
+            self._map_weights(net, weights)
+        if self.config.FUSED_MODULATION:
+            self._fuse_modulation(name, net)
+        restore_net = RestorationHead(net).eval()
+        # Counts the convs the frozen network splits off on top of the checkpoint's weights.
+        nbytes = module_bytes(restore_net)
+        if self.device.type == "cpu" and self.config.CPU_PRECISION != "fp32":
+            from src.core.precision import sample_inputs
+            restore_net = self._apply_cpu_precision(name, restore_net, sample_inputs(512, value_range=(-1, 1)), (-1, 1))
+        if self.config.EXPORT_GFPGAN:
+            fingerprint = model_fingerprint(model_path, spec["arch"], self.device)
+            restore_net = ExportedModule(restore_net, self.config.COMPILED_MODEL_DIR, name, fingerprint,
+                                         max_batch=self.config.FACE_BATCH_SIZE)
+        batcher = FaceBatcher(
+            restore_net, self.device,
+            max_batch_size=self.config.FACE_BATCH_SIZE, max_wait_ms=self.config.FACE_BATCH_WAIT_MS
         )
-        
-        gfpgan_model_path = next(os.path.join(m[3], m[1]) for m in self.config.REQUIRED_MODELS if m[0] == "GFPGAN v1.4")
-        self.gfpganer = GFPGANer(
-            model_path=gfpgan_model_path, upscale=self.config.UPSCALE_FACTOR,
-            arch=self.config.ARCH, channel_multiplier=2, bg_upsampler=self.bg_upsampler,
-            device=self.device
+        return batcher, nbytes
+
+    def _build_face_net(self, arch: str, channel_multiplier: int):
+        """Builds an untrained GFPGAN network of the given arch, with the settings GFPGANer uses."""
+        from gfpgan.archs.gfpgan_bilinear_arch import GFPGANBilinear
+        from gfpgan.archs.gfpganv1_arch import GFPGANv1
+        from gfpgan.archs.gfpganv1_clean_arch import GFPGANv1Clean
+
+        if arch == "RestoreFormer":
+            from gfpgan.archs.restoreformer_arch import RestoreFormer
+            return RestoreFormer()
+        archs = {"clean": GFPGANv1Clean, "bilinear": GFPGANBilinear, "original": GFPGANv1}
+        if arch not in archs:
+            raise ValueError(f"Unknown GFPGAN arch '{arch}'.")
+        return archs[arch](
+            out_size=512, num_style_feat=512, channel_multiplier=channel_multiplier, decoder_load_path=None,
+            fix_decoder=arch == "original", num_mlp=8, input_is_latent=True, different_w=True, narrow=1, sft_half=True
         )
-        
-        self.is_initialized = True
-        self.logger.info("✅ All models loaded and ready to enhance.")
 
-    def enhance(self, image, upscale_factor: int):
-        if not self.is_initialized:
-            raise RuntimeError("Models are not loaded. Please ensure all models are downloaded and loaded first.")
-        self.gfpganer.upscale = upscale_factor
+    def _fuse_modulation(self, name: str, net):
+        """Switches the variant's clean-arch decoder to the fused modulation path, if it checks out."""
+        from src.archs.stylegan2_arch import set_fused_modulation
+
         try:
-            _, _, restored_img = self.gfpganer.enhance(
-                image, has_aligned=False, only_center_face=False, paste_back=True, weight=0.5
-            )
-            return restored_img
+            layers = set_fused_modulation(net)
+        except RuntimeError as e:
+            set_fused_modulation(net, enabled=False)
+            self.logger.warning(f"⚠️  Keeping the reference modulation for '{name}': {e}")
+            return
+        if layers:
+            self.logger.info(f"🧵 Fused modulation enabled for {layers} layer(s) of '{name}'.")
+
+    def _map_helper_weights(self):
+        """Swaps the face detector's and parser's weights for memory-mapped views of their checkpoints."""
+        self._map_weights(self.face_helper.face_det, self._prepared_weights(self._model_path("Face Detector")))
+        self._map_weights(self.face_helper.face_parse, self._prepared_weights(self._model_path("Face Parser")))
+
+    def _map_weights(self, module, model_path: str):
+        """Swaps a module's weights for a memory-mapped view of its checkpoint, shared between processes."""
+        from src.core.weights import map_weights
+
+        if map_weights(module, model_path):
+            self.logger.info(f"🗺️  Memory-mapped {os.path.basename(model_path)}.")
+
+    def _apply_cpu_precision(self, name: str, module, samples, value_range=(0, 1)):
+        """Converts a variant's network to config.CPU_PRECISION, guarded by a check against fp32."""
+        from src.core.precision import convert_with_check, resolve_cpu_precision
+
+        precision = resolve_cpu_precision(self.config.CPU_PRECISION)
+        module, self.cpu_precision[name] = convert_with_check(
+            module, precision, samples, self.config.PRECISION_MIN_PSNR, name, value_range=value_range
+        )
+        return module
+
+    def enhance(self, image, upscale_factor: float, tile_size=None, background_mode=None, max_long_edge=None,
+                face_model=None, background_model=None, on_preview=None):
+        """
+        Enhances a single image. Blocks until a worker is free, so call it from a worker thread.
+        `tile_size` and `background_mode` override config.TILE_SIZE and config.BACKGROUND_MODE.
+        `max_long_edge` caps the output size in pixels, lowering `upscale_factor` where needed.
+        `face_model` and `background_model` pick variants from config.FACE_MODEL_VARIANTS and
+        config.BACKGROUND_MODEL_VARIANTS. `on_preview(image)`, if given, is called with a quick
+        preview as soon as the faces are restored, before the background is upscaled.
+        """
+        restored, stages, faces = self.enhance_timed(image, upscale_factor, tile_size, background_mode, max_long_edge,
+                                                     face_model, background_model, on_preview)
+        record_enhance(stages, faces)
+        return restored
+
+    def enhance_timed(self, image, upscale_factor: float, tile_size=None, background_mode=None, max_long_edge=None,
+                      face_model=None, background_model=None, on_preview=None):
+        """Like enhance(), but returns the image with its per-stage timings and face count."""
+        from src.core.faces import paste_faces
+        from src.core.scaling import output_scale
+
+        background_mode, face_model = self._check_request(background_mode, face_model, background_model)
+        upscale_factor = output_scale(*image.shape[:2], upscale_factor, max_long_edge)
+        timer = PhaseTimer()
+        with timer.phase("wait_for_worker"):
+            face_helper = self._face_helper_pool.get()
+        try:
+            restored_faces, record = self._restore_faces(face_helper, face_model, image, upscale_factor, timer)
+            if on_preview:
+                with timer.phase("preview"):
+                    on_preview(self._preview(face_helper, restored_faces, record, upscale_factor))
+            background_mode = self._choose_background_mode(background_mode, face_helper)
+            with timer.phase("background"):
+                bg_img = self._upsample_background(background_mode, background_model, image, upscale_factor, tile_size)
+            with timer.phase("paste"):
+                restored = paste_faces(face_helper, restored_faces, record.masks, bg_img)
+            return restored, timer.phases, len(restored_faces)
+        except Exception as e:
+            self.logger.error(f"❌ An error occurred during enhancement: {e}", exc_info=True)
+            raise e
+        finally:
+            self._face_helper_pool.put(face_helper)
+
+    def should_stream(self, image_shape, upscale_factor: float, fmt: str, max_long_edge=None) -> bool:
+        """Whether an output is large enough to be streamed to disk rather than built in memory."""
+        from src.core.scaling import output_scale
+
+        height, width = image_shape[:2]
+        scale = output_scale(height, width, upscale_factor, max_long_edge)
+        limit = self.config.STREAM_OUTPUT_MEGAPIXELS
+        return fmt == "png" and limit is not None and height * width * scale ** 2 > limit * 1e6
+
+    def enhance_to_png(self, image, path: str, upscale_factor: float, tile_size=None, background_mode=None,
+                       max_long_edge=None, face_model=None, background_model=None, on_preview=None) -> dict:
+        """
+        Enhances an image straight into a PNG file at `path`, a strip of rows at a time, so the
+        upscaled image is never held in memory as a whole. Returns the write_image()-style report.
+        """
+        report, stages, faces = self.enhance_to_png_timed(image, path, upscale_factor, tile_size, background_mode,
+                                                          max_long_edge, face_model, background_model, on_preview)
+        record_enhance(stages, faces)
+        return report
+
+    def enhance_to_png_timed(self, image, path: str, upscale_factor: float, tile_size=None, background_mode=None,
+                             max_long_edge=None, face_model=None, background_model=None, on_preview=None):
+        """Like enhance_to_png(), but also returns the per-stage timings and face count."""
+        import cv2
+        from src.core.faces import paste_faces_into_strip
+        from src.core.scaling import output_scale
+        from src.core.streaming import stream_enhanced, strip_rows
+
+        background_mode, face_model = self._check_request(background_mode, face_model, background_model)
+        upscale_factor = output_scale(*image.shape[:2], upscale_factor, max_long_edge)
+        timer = PhaseTimer()
+        with timer.phase("wait_for_worker"):
+            face_helper = self._face_helper_pool.get()
+        try:
+            restored_faces, record = self._restore_faces(face_helper, face_model, image, upscale_factor, timer)
+            if on_preview:
+                with timer.phase("preview"):
+                    on_preview(self._preview(face_helper, restored_faces, record, upscale_factor))
+            background_mode = self._choose_background_mode(background_mode, face_helper)
+            rows = strip_rows(image.shape[1], upscale_factor, self.config.STREAM_STRIP_MB * 1024 * 1024)
+
+            def upscale_strip(piece):
+                bg_img = self._upsample_background(background_mode, background_model, piece, upscale_factor, tile_size)
+                if bg_img is None:
+                    height, width = piece.shape[:2]
+                    return cv2.resize(piece, (int(width * upscale_factor), int(height * upscale_factor)),
+                                      interpolation=cv2.INTER_LANCZOS4)
+                return bg_img
+
+            def paste_strip(strip, top):
+                paste_faces_into_strip(strip, top, face_helper, restored_faces, record.masks)
+
+            # Background, pasting and PNG encoding interleave strip by strip, so they share one stage.
+            with timer.phase("stream"):
+                report = stream_enhanced(path, image, upscale_factor, upscale_strip, paste_strip,
+                                         rows, self.config.STREAM_STRIP_PAD, self.config.PNG_COMPRESSION)
+            self.logger.info(f"🌊 Streamed a {int(image.shape[1] * upscale_factor)}x{int(image.shape[0] * upscale_factor)} "
+                             f"output in strips of {int(rows * upscale_factor)} rows.")
+            return report, timer.phases, len(restored_faces)
         except Exception as e:
             self.logger.error(f"❌ An error occurred during enhancement: {e}", exc_info=True)
             raise e
+        finally:
+            self._face_helper_pool.put(face_helper)
+
+    def enhance_frames(self, frames, upscale_factor: float, tile_size=None, background_mode=None, max_long_edge=None,
+                       face_model=None, background_model=None, detect_interval=None, window=None, stats=None):
+        """
+        Enhances a sequence of same-sized frames, such as a video's, yielding the enhanced frames
+        in order. Faces are detected on the first frame, every `detect_interval` frames after it
+        and whenever tracking loses them, and tracked from frame to frame in between. The faces of
+        `window` consecutive frames are restored in shared GFPGAN batches, and tracked faces reuse
+        the parse masks of their last detection. At most `window` input frames are held at a time.
+        `stats`, if given, is filled with frame, detection and face counts and seconds per phase.
+        """
+        from src.core.faces import FaceRecord, paste_faces, parse_masks
+        from src.core.scaling import output_scale
+        from src.core.tracking import FaceTracker
+
+        background_mode, face_model = self._check_request(background_mode, face_model, background_model)
+        detect_interval = max(1, detect_interval or self.config.VIDEO_DETECT_INTERVAL)
+        window = max(1, window or self.config.VIDEO_FRAME_WINDOW)
+        stats = {} if stats is None else stats
+        stats.update(frames=0, detections=0, tracked=0, faces=0, seconds={})
+        timer = PhaseTimer()
+
+        def timed(name):
+            # PhaseTimer keeps the last duration of a phase; the clip needs the totals.
+            stats["seconds"][name] = round(stats["seconds"].get(name, 0) + timer.phases.get(name, 0), 3)
+
+        tracker = FaceTracker()
+        face_helper = self._face_helper_pool.get()
+        keyframe, since_detection, scale = None, 0, None
+        try:
+            for batch in _windows(frames, window):
+                # (frame, its FaceRecord, the keyframe record whose masks it reuses)
+                entries = []
+                for frame in batch:
+                    if scale is None:
+                        scale = output_scale(*frame.shape[:2], upscale_factor, max_long_edge)
+                        face_helper.set_upscale_factor(scale)
+                    face_helper.clean_all()
+                    face_helper.read_image(frame)
+                    tracked = None
+                    if keyframe is not None and since_detection < detect_interval:
+                        with timer.phase("face_tracking"):
+                            tracked = tracker.track(face_helper.input_img)
+                        timed("face_tracking")
+                    if tracked is None:
+                        with timer.phase("face_detection"):
+                            # eye_dist_threshold=5 skips side faces and faces too small to restore.
+                            face_helper.get_face_landmarks_5(only_center_face=False, eye_dist_threshold=5)
+                            tracker.reset(face_helper.input_img, face_helper.det_faces, face_helper.all_landmarks_5)
+                        timed("face_detection")
+                        if keyframe is None:
+                            # Resolved once, so the background doesn't switch models mid-clip.
+                            background_mode = self._choose_background_mode(background_mode, face_helper)
+                        since_detection = 0
+                        stats["detections"] += 1
+                    else:
+                        face_helper.det_faces, face_helper.all_landmarks_5 = tracked
+                        stats["tracked"] += 1
+                    since_detection += 1
+                    face_helper.align_warp_face()
+                    record = FaceRecord.from_helper(face_helper, None)
+                    if tracked is None:
+                        keyframe = record
+                    entries.append((frame, record, keyframe))
+
+                crops = [face for _, record, _ in entries for face in record.cropped_faces]
+                with timer.phase("face_restoration"):
+                    with self.models.use(face_model) as face_batcher:
+                        restored = face_batcher.restore(crops) if crops else []
+                timed("face_restoration")
+                with timer.phase("face_parsing"):
+                    for _, record, source in entries:
+                        faces, restored = restored[:len(record.cropped_faces)], restored[len(record.cropped_faces):]
+                        record.cropped_faces = faces
+                        if source is record:
+                            record.masks = parse_masks(face_helper.face_parse, faces, self.device,
+                                                        self.config.FACE_BATCH_SIZE)
+                timed("face_parsing")
+
+                for frame, record, source in entries:
+                    with timer.phase("background"):
+                        bg_img = self._upsample_background(background_mode, background_model, frame, scale, tile_size)
+                    timed("background")
+                    with timer.phase("paste"):
+                        face_helper.read_image(frame)
+                        record.apply(face_helper)
+                        enhanced = paste_faces(face_helper, record.cropped_faces, source.masks, bg_img)
+                    timed("paste")
+                    stats["frames"] += 1
+                    stats["faces"] += len(record.cropped_faces)
+                    yield enhanced
+                # Only the masks of the last keyframe carry over to the next window.
+                keyframe.cropped_faces = []
+        finally:
+            self._face_helper_pool.put(face_helper)
+
+    def _check_request(self, background_mode, face_model=None, background_model=None):
+        """
+        Checks that the models are loaded and the requested variants are available. Returns the
+        background mode and face variant of the request.
+        """
+        if not self.is_initialized:
+            raise RuntimeError("Models are not loaded. Please ensure all models are downloaded and loaded first.")
+        background_mode = background_mode or self.config.BACKGROUND_MODE
+        if background_mode not in BACKGROUND_MODES:
+            raise ValueError(f"Unknown background mode '{background_mode}'. Choose one of: {', '.join(BACKGROUND_MODES)}")
+        face_model = face_model or self.config.DEFAULT_FACE_MODEL
+        for kind, name in (("face", face_model), ("background", background_model)):
+            if name is not None and name not in self.available_variants(kind):
+                raise ValueError(f"Unknown or not downloaded {kind} model '{name}'. "
+                                 f"Choose one of: {', '.join(self.available_variants(kind))}")
+        return background_mode, face_model
+
+    def _restore_faces(self, face_helper, face_model: str, image, upscale_factor: float, timer):
+        """Detects, restores and parses the faces of an image. Returns the faces and their record."""
+        from src.core.faces import FaceCache, FaceRecord, parse_masks
+
+        face_helper.set_upscale_factor(upscale_factor)
+        face_helper.clean_all()
+
+        # Re-runs of an image with other settings reuse its detection, alignment and parse masks.
+        image_key = FaceCache.key(image, face_model) if self.face_cache else None
+        record = self.face_cache.get(image_key) if self.face_cache else None
+
+        with self.models.use(face_model) as face_batcher:
+            # Detection runs in parallel across workers; restoration is batched across all of them.
+            face_batcher.announce()
+            try:
+                with timer.phase("face_cache" if record else "face_detection"):
+                    if record:
+                        face_helper.read_image(image)
+                        record.apply(face_helper)
+                    else:
+                        self._detect_faces(face_helper, image)
+            except Exception:
+                face_batcher.withdraw()
+                raise
+            with timer.phase("face_restoration"):
+                restored_faces = face_batcher.restore(face_helper.cropped_faces, announced=True)
+        if record is None:
+            with timer.phase("face_parsing"):
+                masks = parse_masks(face_helper.face_parse, restored_faces, self.device, self.config.FACE_BATCH_SIZE)
+                record = FaceRecord.from_helper(face_helper, masks)
+            if self.face_cache:
+                self.face_cache.put(image_key, record)
+        return restored_faces, record
+
+    def _preview(self, face_helper, restored_faces, record, upscale_factor: float):
+        """
+        The restored faces pasted on a Lanczos-resized background: everything but the background
+        model, which is most of the remaining work. Its long edge is at most config.PREVIEW_MAX_LONG_EDGE.
+        """
+        from src.core.faces import paste_faces
+        from src.core.scaling import output_scale
+
+        height, width = face_helper.input_img.shape[:2]
+        face_helper.set_upscale_factor(output_scale(height, width, upscale_factor, self.config.PREVIEW_MAX_LONG_EDGE))
+        try:
+            return paste_faces(face_helper, restored_faces, record.masks)
+        finally:
+            face_helper.set_upscale_factor(upscale_factor)
+
+    def _detect_faces(self, face_helper, image):
+        """Detects, aligns and crops every face in the image into the face helper."""
+        face_helper.read_image(image)
+        # eye_dist_threshold=5 skips side faces and faces too small to restore.
+        face_helper.get_face_landmarks_5(only_center_face=False, eye_dist_threshold=5)
+        face_helper.align_warp_face()
+
+    def _choose_background_mode(self, mode, face_helper):
+        """Resolves "auto" from how much of the image the detected faces cover."""
+        if mode == "auto":
+            height, width = face_helper.input_img.shape[:2]
+            face_area = sum((x2 - x1) * (y2 - y1) for x1, y1, x2, y2, *_ in face_helper.det_faces)
+            face_ratio = min(1.0, face_area / (height * width))
+            if face_ratio >= self.config.AUTO_RESIZE_FACE_RATIO:
+                mode = "resize"
+            elif face_ratio >= self.config.AUTO_LIGHT_FACE_RATIO:
+                mode = "light"
+            else:
+                mode = "realesrgan"
+            self.logger.info(f"🖼️  Faces cover {face_ratio:.0%} of the image; using the '{mode}' background.")
+        if mode == "light" and not self.available_variants("background", "light"):
+            mode = "realesrgan"
+        return mode
+
+    def _background_variant(self, mode, upscale_factor: float):
+        """The downloaded variant of the mode's family with the smallest scale that reaches `upscale_factor`."""
+        from src.core.scaling import plan_model_input
+
+        available = self.available_variants("background", mode)
+        if not available:
+            return None
+        scales = {self.config.BACKGROUND_MODEL_VARIANTS[name]["scale"]: name for name in available}
+        native, _ = plan_model_input(1, 1, upscale_factor, scales)
+        return scales[native]
+
+    def _upsample_background(self, mode, variant, image, upscale_factor, tile_size):
+        """
+        Upscales the background with the chosen model, or returns None for a plain resize. The
+        result is about `upscale_factor` times the input; the paste step resizes it to the exact size.
+        `variant` picks the background model; by default it follows the mode and the scale.
+        """
+        import cv2
+        from src.core.scaling import plan_model_input
+
+        # With no background image, paste_faces resizes the input with Lanczos. That is also all
+        # a model could add when the output is no larger than the input.
+        if mode == "resize" or upscale_factor <= 1:
+            return None
+        variant = variant or self._background_variant(mode, upscale_factor)
+        if variant is None:
+            return None
+        with self.models.use(variant) as prototype:
+            # Upsamplers keep per-image state, so each call gets a copy sharing the loaded network.
+            upsampler = copy.copy(prototype)
+            height, width = image.shape[:2]
+            native, input_size = plan_model_input(height, width, upscale_factor, [upsampler.scale])
+            if input_size is None:
+                bg_img = upsampler.enhance(image, outscale=upscale_factor, tile_size=tile_size)[0]
+            else:
+                self.logger.info(f"🎯 {upscale_factor:.2f}x output: shrinking the {width}x{height} input to "
+                                 f"{input_size[0]}x{input_size[1]} for the x{native} model instead of resizing its output.")
+                small = cv2.resize(image, input_size, interpolation=cv2.INTER_AREA)
+                bg_img = upsampler.enhance(small, outscale=native, tile_size=tile_size)[0]
+        self.last_tile_report = upsampler.last_report
+        return bg_img
+
+    def output_signature(self, upscale_factor: float, background_mode=None, max_long_edge=None,
+                         face_model=None, background_model=None) -> dict:
+        """Everything besides the input image that determines the enhanced output; used as a cache key."""
+        from src.core.export import model_fingerprint
+
+        variants = {**self.config.FACE_MODEL_VARIANTS, **self.config.BACKGROUND_MODEL_VARIANTS}
+        return {
+            "upscale": upscale_factor,
+            "max_long_edge": max_long_edge,
+            "background_mode": background_mode or self.config.BACKGROUND_MODE,
+            "face_model": face_model or self.config.DEFAULT_FACE_MODEL,
+            "background_model": background_model,
+            "auto_face_ratios": (self.config.AUTO_RESIZE_FACE_RATIO, self.config.AUTO_LIGHT_FACE_RATIO),
+            # Which background variant a request ends up with depends on which ones are downloaded.
+            "models": {name: model_fingerprint(self._model_path(spec["model"]), spec.get("arch"))
+                       for name, spec in variants.items() if os.path.exists(self._model_path(spec["model"]))},
+            "precision": self.config.CPU_PRECISION,
+        }
 
     def get_system_info(self):
         """Returns basic system and model status info."""
         return {
-            "gpu_detected": torch.cuda.get_device_name(0) if torch.cuda.is_available() else "CPU",
-            "half_precision": self.config.USE_HALF_PRECISION,
+            "gpu_detected": self.device_name,
+            "half_precision": self.half_precision,
+            "cpu_precision": self.cpu_precision,
+            "cpu_plan": self.worker_plan.to_dict() if self.worker_plan else None,
+            "background_mode": self.config.BACKGROUND_MODE,
+            "light_background_model": bool(self.available_variants("background", "light")),
+            "face_models": self.available_variants("face"),
+            "background_models": self.available_variants("background"),
+            "loaded_models": self.models.stats() if self.models else None,
+            "tile_size": "auto" if self.config.TILE_SIZE is None else self.config.TILE_SIZE,
+            "last_tile_plan": self.last_tile_report,
+            "face_cache": self.face_cache.stats() if self.face_cache else None,
+            "load_timings": self.load_timings,
             "models_loaded": self.is_initialized
-        }
\ No newline at end of file
+        }
+
+    def close(self):
+        """Stops the background threads started when the models were loaded."""
+        if self.models:
+            self.models.close()
@@ -0,0 +1,140 @@
+# src/core/export.py
+import os
+import hashlib
+import logging
+import threading
+import time
+
+import torch
+from torch import nn
+
+from src.core.utils import atomic_write
+
+
+class RestorationHead(nn.Module):
+    """Adapts a GFPGAN network to a plain `faces -> restored faces` module for tracing."""
+
+    def __init__(self, net: nn.Module):
+        from src.archs.gfpgan_arch import FrozenGFPGAN
+
+        super().__init__()
+        # GFPGAN layouts we know are frozen into straight-line code; other archs are traced as is.
+        self.frozen = FrozenGFPGAN.supports(net)
+        self.net = FrozenGFPGAN(net).eval() if self.frozen else net
+        # Grouped modulated convs bake the batch size into a trace; fused ones don't.
+        convs = [m for m in net.modules() if type(m).__name__ == "ModulatedConv2d"]
+        self.dynamic_batch = bool(convs) and all(getattr(m, "fused_modulation", False) for m in convs)
+
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        if self.frozen:
+            return self.net(x)
+        return self.net(x, return_rgb=False)[0]
+
+
+def model_fingerprint(model_path: str, *extra) -> str:
+    """Identifies a checkpoint and the settings an exported module was built with."""
+    stat = os.stat(model_path)
+    key = "|".join(map(str, (os.path.abspath(model_path), stat.st_size, stat.st_mtime_ns, torch.__version__, *extra)))
+    return hashlib.sha1(key.encode()).hexdigest()[:16]
+
+
+def _rebind(trace, module: nn.Module):
+    """Points a loaded trace at `module`'s parameters and buffers, dropping the copies it loaded."""
+    tensors = list(module.named_parameters(remove_duplicate=False))
+    tensors += list(module.named_buffers(remove_duplicate=False))
+    for name, tensor in tensors:
+        *path, attr = name.split(".")
+        owner = trace
+        for part in path:
+            owner = getattr(owner, part)
+        setattr(owner, attr, tensor)
+
+
+class ExportedModule:
+    """
+    Runs a module through TorchScript traces, which resolve Python control flow and module
+    lookups. The traces are not frozen: they keep using the module's parameters (memory-mapped
+    ones included) rather than holding a copy of the weights each.
+
+    A module with `dynamic_batch` set (see RestorationHead) gets a single trace for every batch
+    size. Otherwise the batch size ends up baked into the grouped convs, so batches are padded to
+    the next power of two up to `max_batch` and one trace is kept per padded size. Traces are
+    cached in `cache_dir`; warm restarts load them from disk instead of tracing again.
+    """
+
+    def __init__(self, module: nn.Module, cache_dir: str, name: str, fingerprint: str, max_batch: int = 8):
+        self.module = module.eval()
+        self.cache_dir = cache_dir
+        self.name = name
+        self.fingerprint = fingerprint
+        self.max_batch = max(1, max_batch)
+        self.dynamic_batch = getattr(module, "dynamic_batch", False)
+        self.logger = logging.getLogger(__name__)
+        self._traces = {}
+        self._lock = threading.Lock()
+
+    def _trace_path(self, batch, shape) -> str:
+        shape = "x".join(map(str, shape))
+        return os.path.join(self.cache_dir, f"{self.name}-{self.fingerprint}-b{batch or 'any'}-{shape}.pt")
+
+    def _batch_size(self, n: int) -> int:
+        """Size `n` faces are padded to when traces are specialized to the batch size."""
+        if n >= self.max_batch:
+            return n
+        return min(1 << (n - 1).bit_length(), self.max_batch)
+
+    def _get_trace(self, x: torch.Tensor):
+        """Returns the trace for `x` and the batch size it runs at."""
+        n, shape = x.shape[0], tuple(x.shape[1:])
+        with self._lock:
+            if self.dynamic_batch:
+                if (None, shape) not in self._traces:
+                    self._traces[None, shape] = self._load_or_trace(x, None, shape)
+                if self._traces[None, shape] is not None:
+                    return self._traces[None, shape], n
+                # The trace didn't generalize over batch sizes; pad and specialize instead.
+                self.dynamic_batch = False
+            batch = self._batch_size(n)
+            if (batch, shape) not in self._traces:
+                self._traces[batch, shape] = self._load_or_trace(x, batch, shape)
+            return self._traces[batch, shape], batch
+
+    def _load_or_trace(self, x: torch.Tensor, batch, shape):
+        path = self._trace_path(batch, shape)
+        if os.path.exists(path):
+            try:
+                trace = torch.jit.load(path, map_location=x.device)
+                _rebind(trace, self.module)
+                return trace
+            except Exception as e:
+                self.logger.warning(f"⚠️  Ignoring unreadable compiled model {path}: {e}")
+
+        start = time.time()
+        # A dynamic trace is made at batch 2, so no size-1 dimension gets specialized, then
+        # checked at batch 1.
+        sample = x[:1].expand(batch or 2, *shape).contiguous()
+        with torch.no_grad():
+            trace = torch.jit.trace(self.module, sample, check_trace=False)
+            if batch is None:
+                try:
+                    ok = trace(x[:1]).shape == self.module(x[:1]).shape
+                except RuntimeError:
+                    ok = False
+                if not ok:
+                    self.logger.warning(f"⚠️  The trace of {self.name} depends on the batch size; "
+                                        f"padding batches instead.")
+                    return None
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # Write to a temporary name first so a crash never leaves a truncated cache entry behind.
+        with atomic_write(path) as temp_path:
+            torch.jit.save(trace, temp_path)
+        size = f"batch {batch}" if batch else "any batch size"
+        self.logger.info(f"🧊 Exported {self.name} for {size} in {time.time() - start:.1f}s.")
+        return trace
+
+    def __call__(self, x: torch.Tensor) -> torch.Tensor:
+        trace, batch = self._get_trace(x)
+        n = x.shape[0]
+        if batch == n:
+            return trace(x)
+        return trace(torch.cat([x, x[-1:].expand(batch - n, *x.shape[1:])]))[:n]
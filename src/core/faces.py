@@ -0,0 +1,177 @@
+# src/core/faces.py
+import hashlib
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+import torch
+from basicsr.utils import img2tensor
+from torchvision.transforms.functional import normalize
+
+# Face parsing labels kept in the paste mask (skin, brows, eyes, nose, mouth...), as in facexlib.
+MASK_COLORMAP = np.array([0, 255, 255, 255, 255, 255, 255, 255, 255, 255, 255, 255, 255, 255, 0, 255, 0, 0, 0])
+
+
+class FaceRecord:
+    """Everything detection, alignment and parsing produced for one image."""
+
+    def __init__(self, det_faces, landmarks, affine_matrices, cropped_faces, masks):
+        self.det_faces = det_faces
+        self.landmarks = landmarks
+        self.affine_matrices = affine_matrices
+        self.cropped_faces = cropped_faces
+        self.masks = masks
+
+    @classmethod
+    def from_helper(cls, face_helper, masks):
+        return cls(list(face_helper.det_faces), list(face_helper.all_landmarks_5),
+                   list(face_helper.affine_matrices), list(face_helper.cropped_faces), masks)
+
+    def apply(self, face_helper):
+        """Fills a face helper that has read the image, as if detection and alignment had just run."""
+        face_helper.det_faces = list(self.det_faces)
+        face_helper.all_landmarks_5 = list(self.landmarks)
+        face_helper.affine_matrices = list(self.affine_matrices)
+        face_helper.cropped_faces = list(self.cropped_faces)
+
+
+class FaceCache:
+    """
+    In-memory LRU of FaceRecords keyed by a hash of the decoded image and the face model. The
+    parse masks come from the restored faces, so each face model gets its own record.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._records = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(image: np.ndarray, face_model: str) -> str:
+        digest = hashlib.blake2b(np.ascontiguousarray(image).data, digest_size=20)
+        digest.update(f"{image.shape}{image.dtype}|{face_model}".encode())
+        return digest.hexdigest()
+
+    def get(self, key: str):
+        with self._lock:
+            record = self._records.get(key)
+            if record is None:
+                self.misses += 1
+                return None
+            self._records.move_to_end(key)
+            self.hits += 1
+            return record
+
+    def put(self, key: str, record: FaceRecord):
+        with self._lock:
+            self._records[key] = record
+            self._records.move_to_end(key)
+            while len(self._records) > self.max_entries:
+                self._records.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._records), "max_entries": self.max_entries,
+                    "hits": self.hits, "misses": self.misses}
+
+
+@torch.no_grad()
+def parse_masks(face_parse, faces, device, batch_size: int = 8):
+    """
+    Soft paste masks for restored faces, in face coordinates. Same recipe as facexlib, run on
+    up to `batch_size` faces at a time: ParseNet's activations at 512x512 grow with the batch,
+    so parsing every face of a crowded image at once can run out of memory.
+    """
+    if not faces:
+        return []
+    labels = []
+    for start in range(0, len(faces), max(1, batch_size)):
+        inputs = []
+        for face in faces[start:start + max(1, batch_size)]:
+            face_input = cv2.resize(face, (512, 512), interpolation=cv2.INTER_LINEAR)
+            face_input = img2tensor(face_input.astype("float32") / 255., bgr2rgb=True, float32=True)
+            normalize(face_input, (0.5, 0.5, 0.5), (0.5, 0.5, 0.5), inplace=True)
+            inputs.append(face_input)
+        labels.extend(face_parse(torch.stack(inputs).to(device))[0].argmax(dim=1).cpu().numpy())
+
+    masks = []
+    for face, label in zip(faces, labels):
+        mask = MASK_COLORMAP[label].astype(np.float64)
+        mask = cv2.GaussianBlur(mask, (101, 101), 11)
+        mask = cv2.GaussianBlur(mask, (101, 101), 11)
+        # Remove the black borders.
+        mask[:10, :] = mask[-10:, :] = 0
+        mask[:, :10] = mask[:, -10:] = 0
+        masks.append(cv2.resize(mask / 255., face.shape[:2]))
+    return masks
+
+
+def paste_faces(face_helper, restored_faces, masks, upsample_img=None):
+    """
+    Blends restored faces into the upscaled image with precomputed masks. Equivalent to
+    FaceRestoreHelper.paste_faces_to_input_image with use_parse, minus the parsing.
+    """
+    input_img = face_helper.input_img
+    upscale = face_helper.upscale_factor
+    h, w = input_img.shape[:2]
+    h_up, w_up = int(h * upscale), int(w * upscale)
+    upsample_img = cv2.resize(input_img if upsample_img is None else upsample_img, (w_up, h_up),
+                              interpolation=cv2.INTER_LANCZOS4)
+
+    # Offset the inverse affine by half an upscaled pixel for more precise back alignment.
+    extra_offset = 0.5 * upscale if upscale > 1 else 0
+    for restored_face, mask, affine_matrix in zip(restored_faces, masks, face_helper.affine_matrices):
+        inverse_affine = cv2.invertAffineTransform(affine_matrix) * upscale
+        inverse_affine[:, 2] += extra_offset
+        inv_restored = cv2.warpAffine(restored_face, inverse_affine, (w_up, h_up))
+        inv_soft_mask = cv2.warpAffine(mask, inverse_affine, (w_up, h_up), flags=3)[:, :, None]
+        if upsample_img.ndim == 3 and upsample_img.shape[2] == 4:
+            alpha = upsample_img[:, :, 3:]
+            upsample_img = inv_soft_mask * inv_restored + (1 - inv_soft_mask) * upsample_img[:, :, 0:3]
+            upsample_img = np.concatenate((upsample_img, alpha), axis=2)
+        else:
+            upsample_img = inv_soft_mask * inv_restored + (1 - inv_soft_mask) * upsample_img
+
+    if np.max(upsample_img) > 256:  # 16-bit image
+        return upsample_img.astype(np.uint16)
+    return upsample_img.astype(np.uint8)
+
+
+def paste_faces_into_strip(strip, top, face_helper, restored_faces, masks):
+    """
+    Blends restored faces into one horizontal strip of the upscaled image, in place. `strip` holds
+    output rows `top` to `top + len(strip)`. Only the part of each face that overlaps the strip is
+    warped, so memory scales with the strip and the faces rather than with the whole output.
+    Matches paste_faces() to within rounding.
+    """
+    upscale = face_helper.upscale_factor
+    rows, width = strip.shape[:2]
+    extra_offset = 0.5 * upscale if upscale > 1 else 0
+    for restored_face, mask, affine_matrix in zip(restored_faces, masks, face_helper.affine_matrices):
+        inverse_affine = cv2.invertAffineTransform(affine_matrix) * upscale
+        inverse_affine[:, 2] += extra_offset
+        # Bounding box of the warped face in output coordinates, clipped to the strip.
+        face_h, face_w = restored_face.shape[:2]
+        corners = np.array([[0, 0, 1], [face_w, 0, 1], [0, face_h, 1], [face_w, face_h, 1]], dtype=np.float64)
+        xs, ys = (corners @ inverse_affine.T).T
+        x0, x1 = max(0, int(np.floor(xs.min())) - 1), min(width, int(np.ceil(xs.max())) + 2)
+        y0, y1 = max(top, int(np.floor(ys.min())) - 1), min(top + rows, int(np.ceil(ys.max())) + 2)
+        if x0 >= x1 or y0 >= y1:
+            continue
+
+        # Shifting the transform by the box origin warps only the box.
+        shifted = inverse_affine.copy()
+        shifted[:, 2] -= (x0, y0)
+        inv_restored = cv2.warpAffine(restored_face, shifted, (x1 - x0, y1 - y0))
+        inv_soft_mask = cv2.warpAffine(mask.astype(np.float32), shifted, (x1 - x0, y1 - y0), flags=3)[:, :, None]
+        region = strip[y0 - top:y1 - top, x0:x1]
+        # region + mask * (face - region), in place and in float32, so a large face costs a few
+        # bytes per pixel of temporaries rather than several float64 copies.
+        blended = inv_restored.astype(np.float32)
+        blended -= region
+        blended *= inv_soft_mask
+        blended += region
+        region[:] = blended
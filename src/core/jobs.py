@@ -0,0 +1,202 @@
+# src/core/jobs.py
+import time
+import uuid
+import asyncio
+import logging
+from collections import OrderedDict
+
+from src.core.metrics import IMAGES_TOTAL, JOB_QUEUE_SECONDS, REQUEST_SECONDS
+
+
+class JobQueueFull(Exception):
+    """Raised when the scheduler cannot accept another job."""
+
+
+class Job:
+    """A batch of images submitted together, tracked image by image."""
+
+    def __init__(self, items):
+        self.id = uuid.uuid4().hex
+        self.created_at = time.time()
+        self.finished_at = None
+        self.status = "queued"
+        self.items = items
+        self.images = [{"filename": item["filename"], "status": "queued", "output": None} for item in items]
+        self._subscribers = []
+
+    @property
+    def is_finished(self):
+        return self.status in ("completed", "failed")
+
+    def progress(self):
+        done = sum(1 for image in self.images if image["status"] in ("done", "failed"))
+        return (done / len(self.images)) * 100 if self.images else 100
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "progress": self.progress(),
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+            "images": self.images,
+        }
+
+
+class JobScheduler:
+    """
+    Runs enhancement jobs in the background. Jobs wait in a bounded queue and are picked up
+    by one asyncio task per inference worker; the actual work is handed to the executor.
+
+    Each image goes through `process_fn(item, on_preview)` on `executor` and, if given, through
+    `finish_fn(item, result)` on `finish_executor`. The finishing stage of one image overlaps
+    with processing of the next; at most `max_finishing` results wait for or go through it at a
+    time, and processing waits for a free slot, so finished images don't pile up in memory when
+    encoding falls behind. The last stage returns a dict of fields for the image record,
+    with "output" set to the output filename, or None if the image failed. `process_fn` may call
+    `on_preview(fields)` from its thread to add fields to the image record early and publish
+    them as a "preview" event.
+    """
+
+    def __init__(self, process_fn, executor, num_workers: int, max_queued_jobs: int, history_limit: int,
+                 finish_fn=None, finish_executor=None, max_finishing: int = 2):
+        self.process_fn = process_fn
+        self.executor = executor
+        self.finish_fn = finish_fn
+        self.finish_executor = finish_executor
+        self.max_finishing = max(1, max_finishing)
+        self.num_workers = max(1, num_workers)
+        self.max_queued_jobs = max_queued_jobs
+        self.history_limit = history_limit
+        self.logger = logging.getLogger(__name__)
+        self.jobs = OrderedDict()
+        self._queue = None
+        self._finishing = None
+        self._tasks = []
+
+    async def start(self):
+        self._queue = asyncio.Queue(maxsize=self.max_queued_jobs)
+        self._finishing = asyncio.Semaphore(self.max_finishing)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.num_workers)]
+        self.logger.info(f"🗂️  Job scheduler started with {self.num_workers} worker(s).")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def is_full(self):
+        return self._queue is None or self._queue.full()
+
+    def queue_depth(self):
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def submit(self, items):
+        """Queues a new job. Raises JobQueueFull when the queue is at capacity."""
+        if self.is_full():
+            raise JobQueueFull(f"Job queue is full ({self.max_queued_jobs} jobs waiting).")
+        job = Job(items)
+        self._queue.put_nowait(job)
+        self.jobs[job.id] = job
+        self._prune_history()
+        return job
+
+    def get(self, job_id: str):
+        return self.jobs.get(job_id)
+
+    async def subscribe(self, job_id: str):
+        """Yields the job's current state, then every progress event until the job finishes."""
+        job = self.jobs.get(job_id)
+        if job is None:
+            return
+        yield {"event": "snapshot", **job.to_dict()}
+        if job.is_finished:
+            return
+        events = asyncio.Queue()
+        job._subscribers.append(events)
+        try:
+            while True:
+                event = await events.get()
+                yield event
+                if event["event"] == "job" and event["status"] in ("completed", "failed"):
+                    return
+        finally:
+            job._subscribers.remove(events)
+
+    def _publish(self, job, event):
+        for subscriber in job._subscribers:
+            subscriber.put_nowait(event)
+
+    def _job_event(self, job):
+        return {"event": "job", "job_id": job.id, "status": job.status, "progress": job.progress()}
+
+    def _prune_history(self):
+        # Only finished jobs are forgotten; queued and running ones must stay reachable.
+        finished = [job_id for job_id, job in self.jobs.items() if job.is_finished]
+        while len(self.jobs) > self.history_limit and finished:
+            del self.jobs[finished.pop(0)]
+
+    async def _finish_image(self, job, index, item, image, result, loop):
+        try:
+            fields = await loop.run_in_executor(self.finish_executor, self.finish_fn, item, result)
+        except Exception as e:
+            self._fail_image(job, index, image, e)
+            return
+        finally:
+            self._finishing.release()
+        self._complete_image(job, index, image, fields)
+
+    def _complete_image(self, job, index, image, fields):
+        image.update(fields)
+        image["status"] = "done" if image.get("output") else "failed"
+        self._publish(job, {"event": "image", "job_id": job.id, "index": index, "progress": job.progress(), **image})
+
+    def _preview_image(self, job, index, image, fields):
+        image.update(fields)
+        self._publish(job, {"event": "preview", "job_id": job.id, "index": index, **image})
+
+    def _fail_image(self, job, index, image, error):
+        self.logger.error(f"Job {job.id}: error processing {image['filename']}: {error}", exc_info=error)
+        IMAGES_TOTAL.inc(outcome="failed")
+        image["status"] = "failed"
+        image["error"] = str(error)
+        self._publish(job, {"event": "image", "job_id": job.id, "index": index, "progress": job.progress(), **image})
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._run_job(job, loop)
+            finally:
+                self._queue.task_done()
+
+    async def _run_job(self, job, loop):
+        JOB_QUEUE_SECONDS.observe(time.time() - job.created_at)
+        job.status = "running"
+        self._publish(job, self._job_event(job))
+        finishing = []
+        for index, (item, image) in enumerate(zip(job.items, job.images)):
+            image["status"] = "processing"
+            self._publish(job, {"event": "image", "job_id": job.id, "index": index, **image})
+            def on_preview(fields, index=index, image=image):
+                loop.call_soon_threadsafe(self._preview_image, job, index, image, fields)
+            try:
+                result = await loop.run_in_executor(self.executor, self.process_fn, item, on_preview)
+            except Exception as e:
+                self._fail_image(job, index, image, e)
+                continue
+            if self.finish_fn is None:
+                self._complete_image(job, index, image, result)
+            else:
+                await self._finishing.acquire()
+                finishing.append(asyncio.create_task(self._finish_image(job, index, item, image, result, loop)))
+        await asyncio.gather(*finishing)
+
+        any_done = any(image["status"] == "done" for image in job.images)
+        job.status = "completed" if any_done or not job.images else "failed"
+        job.finished_at = time.time()
+        REQUEST_SECONDS.observe(job.finished_at - job.created_at, endpoint="/api/jobs")
+        self._publish(job, self._job_event(job))
+        self.logger.info(f"✅ Job {job.id} {job.status} ({len(job.images)} image(s)).")
@@ -0,0 +1,175 @@
+# src/core/metrics.py
+import os
+import sys
+import time
+import threading
+from contextlib import contextmanager
+
+# Latency buckets in seconds, from sub-millisecond stages (paste, cache lookups) to large batches.
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    escaped = (f'{name}="{str(value).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34)).replace(chr(10), chr(92) + "n")}"'
+               for name, value in labels.items())
+    return "{" + ",".join(escaped) + "}"
+
+
+def _format_value(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """A metric family in the Prometheus text format. Label values are passed as keyword arguments."""
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._function = None
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} takes the labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def set_function(self, function):
+        """Reads the value(s) from `function` at scrape time: a number, or {label values tuple: number}."""
+        self._function = function
+        return self
+
+    def _samples(self):
+        """Yields (suffix, labels, value) for every sample."""
+        if self._function is not None:
+            values = self._function()
+            if not isinstance(values, dict):
+                values = {(): values}
+        else:
+            with self._lock:
+                values = dict(self._values)
+        for key, value in values.items():
+            yield "", dict(zip(self.labelnames, key)), value
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        for suffix, labels, value in self._samples():
+            lines.append(f"{self.name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._values[key] = (counts, total + value)
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _samples(self):
+        with self._lock:
+            values = {key: (list(counts), total) for key, (counts, total) in self._values.items()}
+        for key, (counts, total) in values.items():
+            labels = dict(zip(self.labelnames, key))
+            for bound, count in zip(self.buckets, counts):
+                yield "_bucket", {**labels, "le": _format_value(bound)}, count
+            yield "_sum", labels, total
+            yield "_count", labels, counts[-1]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self._metrics.values()) + "\n"
+
+
+def resident_memory_bytes(pid="self") -> int:
+    """
+    Current resident set size of a process (Linux), or the peak of this one on other Unixes.
+    0 where neither is available (Windows).
+    """
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        if pid != "self":
+            return 0
+    try:
+        import resource
+    except ImportError:
+        return 0
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak * 1024 if sys.platform.startswith("linux") else peak
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "picture_perfect_stage_seconds", "Time spent in each stage of enhancing one image.", ["stage"]
+))
+REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "picture_perfect_request_seconds", "End-to-end latency of enhancement requests.", ["endpoint"]
+))
+JOB_QUEUE_SECONDS = REGISTRY.register(Histogram(
+    "picture_perfect_job_queue_seconds", "Time jobs wait in the queue before a worker picks them up."
+))
+IMAGES_TOTAL = REGISTRY.register(Counter(
+    "picture_perfect_images_total", "Images handled, by outcome (enhanced, cached or failed).", ["outcome"]
+))
+FACES_TOTAL = REGISTRY.register(Counter(
+    "picture_perfect_faces_total", "Faces restored."
+))
+
+
+def record_enhance(stages: dict, faces: int):
+    """Records the stage timings and face count of one enhanced image."""
+    for stage, seconds in stages.items():
+        STAGE_SECONDS.observe(seconds, stage=stage)
+    FACES_TOTAL.inc(faces)
@@ -0,0 +1,174 @@
+# src/core/precision.py
+import time
+import logging
+
+import cv2
+import numpy as np
+import torch
+from torch import nn
+from basicsr.metrics import calculate_psnr, calculate_ssim
+
+CPU_PRECISIONS = ("fp32", "bf16", "int8")
+
+logger = logging.getLogger(__name__)
+
+
+def bf16_supported() -> bool:
+    """True when oneDNN has native bfloat16 kernels for this CPU (AVX512-BF16 or AMX)."""
+    try:
+        return torch.backends.mkldnn.is_available() and torch.ops.mkldnn._is_mkldnn_bf16_supported()
+    except (AttributeError, RuntimeError):
+        return False
+
+
+def resolve_cpu_precision(requested: str) -> str:
+    """Validates a CPU precision mode, falling back to fp32 when the CPU cannot run it."""
+    if requested not in CPU_PRECISIONS:
+        raise ValueError(f"Unknown CPU precision '{requested}'. Choose one of: {', '.join(CPU_PRECISIONS)}")
+    if requested == "bf16" and not bf16_supported():
+        logger.warning("⚠️  This CPU has no native bfloat16 support; using fp32 instead.")
+        return "fp32"
+    return requested
+
+
+def _to_float(output):
+    if isinstance(output, torch.Tensor):
+        return output.float()
+    if isinstance(output, (tuple, list)):
+        return type(output)(_to_float(item) for item in output)
+    return output
+
+
+class AutocastModule(nn.Module):
+    """Runs the wrapped module under CPU bfloat16 autocast and hands back float32 outputs."""
+
+    def __init__(self, module: nn.Module):
+        super().__init__()
+        self.module = module
+
+    def forward(self, *args, **kwargs):
+        with torch.autocast("cpu", dtype=torch.bfloat16):
+            output = self.module(*args, **kwargs)
+        return _to_float(output)
+
+
+def _contiguous_dynamic_conv():
+    from torch.ao.nn.quantized import dynamic as nnqd
+
+    class ContiguousConv2d(nnqd.Conv2d):
+        """Dynamic INT8 conv that hands back contiguous NCHW output, as callers using .view() expect."""
+
+        def forward(self, input):
+            return super().forward(input).contiguous()
+
+    return ContiguousConv2d
+
+
+def quantize_int8(module: nn.Module) -> nn.Module:
+    """
+    Returns a copy of the module with every nn.Conv2d and nn.Linear replaced by its dynamically
+    quantized INT8 counterpart: weights are stored as int8, activations are quantized per call.
+    Modulated convs build their weights per sample, so they stay in fp32.
+    """
+    from torch.ao.nn.quantized import dynamic as nnqd
+    from torch.ao.quantization import default_dynamic_qconfig, quantize_dynamic
+
+    return quantize_dynamic(
+        module,
+        qconfig_spec={nn.Conv2d: default_dynamic_qconfig, nn.Linear: default_dynamic_qconfig},
+        mapping={nn.Conv2d: _contiguous_dynamic_conv(), nn.Linear: nnqd.Linear},
+        inplace=False,
+    )
+
+
+def apply_cpu_precision(module: nn.Module, precision: str) -> nn.Module:
+    """Returns the module converted to run at the given CPU precision."""
+    if precision == "bf16":
+        return AutocastModule(module).eval()
+    if precision == "int8":
+        return quantize_int8(module).eval()
+    return module
+
+
+def synthetic_sample(height: int, width: int, seed: int = 0) -> np.ndarray:
+    """A deterministic BGR test image with smooth gradients, hard edges and fine texture."""
+    rng = np.random.RandomState(seed)
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    img = np.stack([x / width, y / height, (x + y) / (width + height)], axis=2) * 255
+    for _ in range(6):
+        center = (int(rng.randint(width)), int(rng.randint(height)))
+        radius = int(rng.randint(4, max(5, min(height, width) // 3)))
+        cv2.circle(img, center, radius, tuple(float(c) for c in rng.randint(0, 255, 3)), -1)
+    img += rng.normal(0, 8, img.shape)
+    return np.clip(img, 0, 255).astype(np.uint8)
+
+
+def sample_inputs(size: int, value_range=(0, 1), count: int = 2):
+    """Synthetic samples as (1, 3, size, size) RGB tensors scaled to `value_range`."""
+    low, high = value_range
+    inputs = []
+    for seed in range(count):
+        img = synthetic_sample(size, size, seed)[:, :, ::-1] / 255.0
+        tensor = torch.from_numpy(np.ascontiguousarray(img.transpose(2, 0, 1))).float()
+        inputs.append((tensor * (high - low) + low).unsqueeze(0))
+    return inputs
+
+
+def _tensor_to_image(tensor: torch.Tensor, value_range) -> np.ndarray:
+    low, high = value_range
+    img = (tensor.detach().float().cpu().clamp(low, high) - low) / (high - low)
+    return (img.squeeze(0).permute(1, 2, 0).numpy() * 255).round().astype(np.uint8)
+
+
+@torch.no_grad()
+def check_precision(reference: nn.Module, candidate: nn.Module, inputs, value_range=(0, 1)) -> dict:
+    """
+    Compares a reduced-precision module against its fp32 reference on sample inputs and
+    reports mean PSNR/SSIM of the outputs and the speedup in wall-clock time.
+    """
+    psnrs, ssims = [], []
+    reference_time = candidate_time = 0.0
+    for x in inputs:
+        outputs = []
+        for module in (reference, candidate):
+            # Same seed for both runs, so layers that inject random noise draw the same noise.
+            with torch.random.fork_rng():
+                torch.manual_seed(0)
+                start = time.perf_counter()
+                output = module(x)
+                elapsed = time.perf_counter() - start
+            if module is reference:
+                reference_time += elapsed
+            else:
+                candidate_time += elapsed
+            outputs.append(_tensor_to_image(output, value_range))
+        psnrs.append(calculate_psnr(outputs[0], outputs[1], crop_border=0))
+        ssims.append(calculate_ssim(outputs[0], outputs[1], crop_border=0))
+    return {
+        "psnr": float(np.mean(psnrs)),
+        "ssim": float(np.mean(ssims)),
+        "speedup": reference_time / candidate_time if candidate_time > 0 else float("inf"),
+    }
+
+
+def convert_with_check(module: nn.Module, precision: str, inputs, min_psnr: float, name: str, value_range=(0, 1)):
+    """
+    Converts a module to the requested precision, checks it against fp32 and keeps it only if
+    its PSNR clears `min_psnr`. Returns the module to use and the precision it runs at.
+    """
+    if precision == "fp32":
+        return module, "fp32"
+    try:
+        candidate = apply_cpu_precision(module, precision)
+        report = check_precision(module, candidate, inputs, value_range)
+    except RuntimeError as e:
+        logger.warning(f"⚠️  {name} cannot run in {precision} ({e}); keeping fp32.")
+        return module, "fp32"
+    logger.info(
+        f"🎚️  {name} {precision}: PSNR {report['psnr']:.2f} dB, SSIM {report['ssim']:.4f}, "
+        f"{report['speedup']:.2f}x speed vs fp32."
+    )
+    if report["psnr"] < min_psnr:
+        logger.warning(f"⚠️  {name} {precision} output is below {min_psnr} dB PSNR; keeping fp32.")
+        return module, "fp32"
+    return candidate, precision
@@ -0,0 +1,137 @@
+# src/core/registry.py
+import time
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+def module_bytes(module) -> int:
+    """Memory held by a module's parameters and buffers, counting shared tensors once."""
+    seen, total = set(), 0
+    for tensor in list(module.parameters()) + list(module.buffers()):
+        if tensor.data_ptr() in seen:
+            continue
+        seen.add(tensor.data_ptr())
+        total += tensor.numel() * tensor.element_size()
+    return total
+
+
+class _Entry:
+    def __init__(self, model, nbytes: int):
+        self.model = model
+        self.nbytes = nbytes
+        self.users = 0
+
+
+class ModelRegistry:
+    """
+    Keeps loaded model variants in memory by name. A variant is loaded by `loader(name)`, which
+    returns (model, bytes held), on its first use; later requests for it reuse the loaded model.
+    Once the variants together hold more than `budget_bytes`, the least recently used ones that
+    no request is using are dropped, and load again from disk when next asked for.
+    """
+
+    def __init__(self, loader, budget_bytes: int):
+        self.loader = loader
+        self.budget_bytes = budget_bytes
+        self.logger = logging.getLogger(__name__)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._loading = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def use(self, name: str):
+        """Yields the loaded variant `name`, which stays in memory until the block exits."""
+        entry = self._acquire(name)
+        try:
+            yield entry.model
+        finally:
+            with self._lock:
+                entry.users -= 1
+                evicted = self._evict()
+            self._close(evicted)
+
+    def _acquire(self, name: str) -> _Entry:
+        with self._lock:
+            entry = self._hit(name)
+            if entry:
+                return entry
+            # One load per name at a time; requests for a variant that is loading wait for it.
+            load_lock = self._loading.setdefault(name, threading.Lock())
+        with load_lock:
+            with self._lock:
+                entry = self._hit(name)
+                if entry:
+                    return entry
+                self.misses += 1
+            start = time.perf_counter()
+            model, nbytes = self.loader(name)
+            with self._lock:
+                entry = self._entries[name] = _Entry(model, nbytes)
+                entry.users += 1
+                evicted = self._evict()
+                resident = self.resident_bytes()
+        self.logger.info(f"📦 Loaded model '{name}' in {time.perf_counter() - start:.2f}s "
+                         f"({nbytes / 2 ** 20:.0f} MB; {resident / 2 ** 20:.0f} of {self.budget_bytes / 2 ** 20:.0f} MB in use).")
+        self._close(evicted)
+        return entry
+
+    def _hit(self, name: str):
+        entry = self._entries.get(name)
+        if entry:
+            entry.users += 1
+            self._entries.move_to_end(name)
+            self.hits += 1
+        return entry
+
+    def _evict(self) -> list:
+        """Drops idle variants, least recently used first, until the rest fit the budget. Call with the lock held."""
+        evicted = []
+        resident = self.resident_bytes()
+        for name, entry in list(self._entries.items()):
+            if resident <= self.budget_bytes:
+                break
+            if entry.users:
+                continue
+            del self._entries[name]
+            resident -= entry.nbytes
+            self.evictions += 1
+            evicted.append((name, entry))
+        return evicted
+
+    def _close(self, evicted: list):
+        for name, entry in evicted:
+            self.logger.info(f"♻️  Evicted model '{name}' ({entry.nbytes / 2 ** 20:.0f} MB) to stay within the memory budget.")
+            if hasattr(entry.model, "close"):
+                entry.model.close()
+
+    def resident_bytes(self) -> int:
+        return sum(entry.nbytes for entry in self._entries.values())
+
+    def loaded(self) -> list:
+        """Names of the loaded variants, least recently used first."""
+        with self._lock:
+            return list(self._entries)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "loaded": {name: round(entry.nbytes / 2 ** 20, 1) for name, entry in self._entries.items()},
+                "resident_mb": round(self.resident_bytes() / 2 ** 20, 1),
+                "budget_mb": round(self.budget_bytes / 2 ** 20, 1),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def close(self):
+        """Drops every loaded variant."""
+        with self._lock:
+            evicted, self._entries = list(self._entries.items()), OrderedDict()
+        for _, entry in evicted:
+            if hasattr(entry.model, "close"):
+                entry.model.close()
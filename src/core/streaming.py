@@ -0,0 +1,116 @@
+# src/core/streaming.py
+import os
+import time
+import zlib
+import struct
+
+import cv2
+import numpy as np
+
+from src.core.utils import unique_temp_path
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+class PNGStripWriter:
+    """
+    Writes an 8-bit BGR image to a PNG file a strip of rows at a time, so the whole image never
+    has to be in memory. Rows use the PNG "Sub" filter and go through a single zlib stream; each
+    strip's compressed output is written as it is produced.
+    """
+
+    def __init__(self, path: str, width: int, height: int, compression: int = 1):
+        self.path = path
+        self.width = width
+        self.height = height
+        self.rows_written = 0
+        self.bytes_written = 0
+        self._compressor = zlib.compressobj(compression)
+        self._temp_path = unique_temp_path(path)
+        self._file = open(self._temp_path, "wb")
+        self._file.write(PNG_SIGNATURE)
+        # 8 bits per channel, color type 2 (RGB), default compression, filtering and no interlacing.
+        self._chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+
+    def _chunk(self, kind: bytes, data: bytes):
+        self._file.write(struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data)))
+        self.bytes_written += len(data) + 12
+
+    def write(self, strip: np.ndarray):
+        """Appends rows, given as a (rows, width, 3) uint8 BGR array."""
+        rows = strip.shape[0]
+        if strip.shape[1:] != (self.width, 3) or strip.dtype != np.uint8:
+            raise ValueError(f"Expected a strip of shape (rows, {self.width}, 3) and dtype uint8, got {strip.shape} {strip.dtype}")
+        if self.rows_written + rows > self.height:
+            raise ValueError(f"Image has {self.height} rows; got {self.rows_written + rows}")
+        flat = np.ascontiguousarray(strip[:, :, ::-1]).reshape(rows, self.width * 3)
+        # Filter type 1 ("Sub"): each byte minus the same channel of the pixel to its left, mod 256.
+        filtered = np.empty((rows, 1 + self.width * 3), dtype=np.uint8)
+        filtered[:, 0] = 1
+        filtered[:, 1:4] = flat[:, :3]
+        np.subtract(flat[:, 3:], flat[:, :-3], out=filtered[:, 4:])
+        compressed = self._compressor.compress(filtered.data)
+        if compressed:
+            self._chunk(b"IDAT", compressed)
+        self.rows_written += rows
+
+    def close(self):
+        """Finishes the file and moves it into place."""
+        if self.rows_written != self.height:
+            self.abort()
+            raise ValueError(f"Image has {self.height} rows, but only {self.rows_written} were written")
+        self._chunk(b"IDAT", self._compressor.flush())
+        self._chunk(b"IEND", b"")
+        self._file.close()
+        os.replace(self._temp_path, self.path)
+
+    def abort(self):
+        """Discards a partly written file."""
+        self._file.close()
+        if os.path.exists(self._temp_path):
+            os.remove(self._temp_path)
+
+
+def strip_rows(width: int, upscale_factor: float, budget_bytes: int, minimum: int = 16) -> int:
+    """
+    Input rows per strip so that one strip of output, with the float intermediates the background
+    upsampler makes of it (about 16 bytes per output pixel), stays within `budget_bytes`.
+    """
+    per_input_row = width * upscale_factor ** 2 * 16
+    return max(minimum, int(budget_bytes // per_input_row))
+
+
+def stream_enhanced(path: str, image: np.ndarray, upscale_factor: float, upscale_strip, paste_strip,
+                    rows_per_strip: int, pad: int, compression: int = 1) -> dict:
+    """
+    Builds the enhanced image strip by strip and writes it straight to a PNG at `path`.
+
+    `upscale_strip(piece)` upscales a slice of input rows by `upscale_factor`; each slice carries
+    `pad` extra rows of context on either side, which are cropped off again afterwards.
+    `paste_strip(strip, top)` pastes the faces into output rows `top` onwards, in place.
+    Returns the same kind of report as write_image().
+    """
+    height, width = image.shape[:2]
+    # Input row r starts at output row int(r * scale), the same rounding paste_faces() uses for the size.
+    out_row = lambda row: int(row * upscale_factor)
+    out_width = int(width * upscale_factor)
+    writer = PNGStripWriter(path, out_width, out_row(height), compression)
+    encode_seconds = 0.0
+    try:
+        for r0 in range(0, height, rows_per_strip):
+            r1 = min(height, r0 + rows_per_strip)
+            p0, p1 = max(0, r0 - pad), min(height, r1 + pad)
+            upscaled = upscale_strip(image[p0:p1])
+            if upscaled.shape[:2] != (out_row(p1) - out_row(p0), out_width):
+                upscaled = cv2.resize(upscaled, (out_width, out_row(p1) - out_row(p0)), interpolation=cv2.INTER_LANCZOS4)
+            strip = np.ascontiguousarray(upscaled[out_row(r0) - out_row(p0):out_row(r1) - out_row(p0)])
+            paste_strip(strip, out_row(r0))
+            start = time.perf_counter()
+            writer.write(strip)
+            encode_seconds += time.perf_counter() - start
+        writer.close()
+    except BaseException:
+        writer.abort()
+        raise
+    return {"format": "png", "output_bytes": writer.bytes_written + len(PNG_SIGNATURE),
+            "encode_seconds": round(encode_seconds, 4), "streamed": True}
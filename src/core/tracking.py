@@ -0,0 +1,57 @@
+# src/core/tracking.py
+import cv2
+import numpy as np
+
+# Landmarks that land more than this many pixels away from where they started when tracked back
+# to the previous frame count as lost.
+MAX_FORWARD_BACKWARD_ERROR = 1.5
+
+
+class FaceTracker:
+    """
+    Follows detected faces from frame to frame with pyramidal Lucas-Kanade optical flow on their
+    five landmarks, so faces only need detecting now and then. Each box moves and scales with its
+    landmarks. Every landmark is also tracked back to the previous frame; if any of them doesn't
+    return to where it started (occlusion, a fast turn, a cut), the faces are reported lost.
+    """
+
+    def __init__(self, win_size: int = 21, levels: int = 3):
+        self.lk_params = {"winSize": (win_size, win_size), "maxLevel": levels,
+                          "criteria": (cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 30, 0.01)}
+        self.gray = None
+        self.det_faces = []
+        self.landmarks = []
+
+    @staticmethod
+    def _gray(frame):
+        return frame if frame.ndim == 2 else cv2.cvtColor(frame[:, :, :3], cv2.COLOR_BGR2GRAY)
+
+    def reset(self, frame, det_faces, landmarks):
+        """Starts tracking the faces just detected in `frame`."""
+        self.gray = self._gray(frame)
+        self.det_faces = [np.array(face, dtype=np.float32) for face in det_faces]
+        self.landmarks = [np.array(points, dtype=np.float32).reshape(5, 2) for points in landmarks]
+
+    def track(self, frame):
+        """Moves the faces to `frame`. Returns (det_faces, landmarks) like the face helper's, or None if lost."""
+        gray = self._gray(frame)
+        if not self.landmarks:
+            self.gray = gray
+            return [], []
+        points = np.concatenate(self.landmarks).reshape(-1, 1, 2)
+        moved, status, _ = cv2.calcOpticalFlowPyrLK(self.gray, gray, points, None, **self.lk_params)
+        if moved is None or not status.all():
+            return None
+        back, back_status, _ = cv2.calcOpticalFlowPyrLK(gray, self.gray, moved, None, **self.lk_params)
+        if back is None or not back_status.all() or np.abs(back - points).max() > MAX_FORWARD_BACKWARD_ERROR:
+            return None
+
+        moved = moved.reshape(-1, 5, 2)
+        for i, (old, new) in enumerate(zip(self.landmarks, moved)):
+            old_center, new_center = old.mean(axis=0), new.mean(axis=0)
+            ratio = np.sqrt(((new - new_center) ** 2).sum(axis=1).mean() / max(((old - old_center) ** 2).sum(axis=1).mean(), 1e-6))
+            corners = self.det_faces[i][:4].reshape(2, 2)
+            self.det_faces[i][:4] = (new_center + (corners - old_center) * ratio).reshape(4)
+            self.landmarks[i] = new
+        self.gray = gray
+        return [face.copy() for face in self.det_faces], [points.copy() for points in self.landmarks]
@@ -1,4 +1,8 @@
 # src/core/utils.py
+import os
+import time
+import tempfile
+from contextlib import contextmanager
 
 
 def format_size(byte_count: int) -> str:
@@ -15,3 +19,46 @@ def format_size(byte_count: int) -> str:
         n += 1
 
     return f"{byte_count:.2f} {power_labels[n]}"
+
+
+def unique_temp_path(path: str) -> str:
+    """Creates an empty file with a unique name next to `path`, to be written and moved onto `path`."""
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=f"{os.path.basename(path)}.",
+                                     suffix=".tmp")
+    os.close(fd)
+    return temp_path
+
+
+@contextmanager
+def atomic_write(path: str):
+    """
+    Yields a temporary path to write `path`'s contents to, and moves it into place once the block
+    completes. Readers never see a half-written file, and concurrent writers, in other threads or
+    worker processes, each get their own temporary file. It is removed if the block fails.
+    """
+    temp_path = unique_temp_path(path)
+    try:
+        yield temp_path
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+class PhaseTimer:
+    """Records how long each named phase of a multi-step operation takes."""
+
+    def __init__(self):
+        self.phases = {}
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = round(time.perf_counter() - start, 3)
+
+    def summary(self) -> str:
+        return ", ".join(f"{name} {seconds:.2f}s" for name, seconds in self.phases.items())
@@ -0,0 +1,240 @@
+# src/core/video.py
+import os
+import time
+import queue
+import logging
+import threading
+
+import cv2
+
+from src.core.batch import INPUT_EXTENSIONS
+from src.core.encoding import OUTPUT_FORMATS, write_image
+
+# Files read and written as videos; any other path is a directory of frames.
+VIDEO_EXTENSIONS = (".mp4", ".mov", ".avi", ".mkv", ".webm", ".m4v")
+
+# Passed down the queues once there are no more frames.
+_DONE = object()
+
+
+def is_video(path: str) -> bool:
+    return path.lower().endswith(VIDEO_EXTENSIONS)
+
+
+class FrameSource:
+    """The frames of a video file, or of the images in a directory in name order, decoded one at a time."""
+
+    def __init__(self, path: str, fps: float = None):
+        self.path = path
+        self.files = None
+        if os.path.isdir(path):
+            self.files = sorted(name for name in os.listdir(path) if name.lower().endswith(INPUT_EXTENSIONS))
+            if not self.files:
+                raise ValueError(f"No images found in {path}")
+            self.fps = fps
+            self.count = len(self.files)
+        else:
+            capture = cv2.VideoCapture(path)
+            if not capture.isOpened():
+                raise ValueError(f"Cannot open the video {path}")
+            self.fps = fps or capture.get(cv2.CAP_PROP_FPS) or None
+            self.count = int(capture.get(cv2.CAP_PROP_FRAME_COUNT)) or None
+            capture.release()
+
+    def name(self, index: int) -> str:
+        """File name, without extension, for the frame when writing frames to a directory."""
+        if self.files is not None:
+            return os.path.splitext(self.files[index])[0]
+        return f"frame_{index + 1:06d}"
+
+    def __iter__(self):
+        if self.files is not None:
+            size = None
+            for name in self.files:
+                frame = cv2.imread(os.path.join(self.path, name), cv2.IMREAD_COLOR)
+                if frame is None:
+                    raise ValueError(f"{name} is not a readable image")
+                # The first frame sets the output size, which a video can't change mid-stream.
+                size = size or frame.shape
+                if frame.shape != size:
+                    raise ValueError(f"{name} is {frame.shape[1]}x{frame.shape[0]}, unlike the frames before it")
+                yield frame
+            return
+        capture = cv2.VideoCapture(self.path)
+        try:
+            while True:
+                ok, frame = capture.read()
+                if not ok:
+                    break
+                yield frame
+        finally:
+            capture.release()
+
+
+def _read_ahead(frames, size: int):
+    """Iterates `frames` on a separate thread, at most `size` frames ahead of the consumer."""
+    inbox = queue.Queue(maxsize=size)
+    stop = threading.Event()
+
+    def produce():
+        try:
+            for frame in frames:
+                inbox.put(frame)
+                if stop.is_set():
+                    return
+        except Exception as e:
+            inbox.put(e)
+        inbox.put(_DONE)
+
+    threading.Thread(target=produce, name="video-decode", daemon=True).start()
+    try:
+        while (frame := inbox.get()) is not _DONE:
+            if isinstance(frame, Exception):
+                raise frame
+            yield frame
+    finally:
+        # Unblock a producer waiting on a full queue when the consumer stops early.
+        stop.set()
+        while not inbox.empty():
+            inbox.get_nowait()
+
+
+class FrameWriter:
+    """
+    Writes frames, as they come, to a video file or, for any other path, to image files in a
+    directory. A video is written under a temporary name and renamed once complete.
+    """
+
+    def __init__(self, path: str, fps: float, fourcc: str, name, fmt: str, quality: int, png_compression: int):
+        self.path = path
+        self.fps = fps
+        self.fourcc = fourcc
+        self.name = name
+        self.fmt = fmt
+        self.quality = quality
+        self.png_compression = png_compression
+        self.frames = 0
+        self.size = None
+        self._video = None
+        root, ext = os.path.splitext(path)
+        self._partial = f"{root}.partial{ext}"
+        if not is_video(path):
+            os.makedirs(path, exist_ok=True)
+
+    def write(self, frame):
+        if not is_video(self.path):
+            write_image(frame, os.path.join(self.path, self.name(self.frames) + OUTPUT_FORMATS[self.fmt]),
+                        self.fmt, self.quality, self.png_compression)
+        else:
+            if self._video is None:
+                # The output size is only known once the first frame is enhanced.
+                self.size = (frame.shape[1], frame.shape[0])
+                self._video = cv2.VideoWriter(self._partial, cv2.VideoWriter_fourcc(*self.fourcc), self.fps, self.size)
+                if not self._video.isOpened():
+                    raise RuntimeError(f"OpenCV cannot write '{self.fourcc}' video to {self.path}")
+            self._video.write(frame)
+        self.frames += 1
+
+    def close(self, completed: bool):
+        """Finishes the output; an incomplete video is deleted rather than left half-written."""
+        if self._video is None:
+            return
+        self._video.release()
+        if completed:
+            os.replace(self._partial, self.path)
+        elif os.path.exists(self._partial):
+            os.remove(self._partial)
+
+
+class VideoPipeline:
+    """
+    Enhances a video file or an image sequence (a directory of frames) into a video file or a
+    directory of frames. Frames are decoded on one thread, enhanced by enhancer.enhance_frames()
+    on the calling thread and encoded on another, handing frames over through bounded queues of
+    VIDEO_QUEUE_SIZE. Together with the enhancer's window of VIDEO_FRAME_WINDOW frames, that
+    bounds the memory a clip takes, however long it is.
+
+    Faces are detected on keyframes only and tracked in between (see enhance_frames()), so the
+    frames of a clip must go through one enhancer in order.
+    """
+
+    def __init__(self, enhancer, config, input_path: str, output_path: str, upscale_factor: float = None,
+                 options: dict = None, fps: float = None, fmt: str = None, quality: int = None):
+        self.enhancer = enhancer
+        self.config = config
+        self.input_path = input_path
+        self.output_path = output_path
+        self.upscale_factor = upscale_factor or config.UPSCALE_FACTOR
+        self.options = options or {}
+        self.fps = fps
+        self.fmt = fmt or config.OUTPUT_FORMAT
+        self.quality = quality or config.OUTPUT_QUALITY
+        self.logger = logging.getLogger(__name__)
+
+    def run(self) -> dict:
+        """Enhances the whole clip and returns a throughput report."""
+        config = self.config
+        source = FrameSource(self.input_path, self.fps)
+        fps = source.fps or config.VIDEO_SEQUENCE_FPS
+        writer = FrameWriter(self.output_path, fps, config.VIDEO_FOURCC, source.name, self.fmt, self.quality,
+                             config.PNG_COMPRESSION)
+        queue_size = max(1, config.VIDEO_QUEUE_SIZE)
+        self.logger.info(f"🎞️  Enhancing {source.count or 'an unknown number of'} frame(s) from {self.input_path} "
+                         f"at {fps:g} fps.")
+
+        outbox = queue.Queue(maxsize=queue_size)
+        errors = []
+
+        def write_frames():
+            try:
+                while (frame := outbox.get()) is not _DONE:
+                    writer.write(frame)
+            except Exception as e:
+                errors.append(e)
+                # Keep taking frames, so the enhancer never blocks on a writer that has stopped.
+                while outbox.get() is not _DONE:
+                    pass
+
+        thread = threading.Thread(target=write_frames, name="video-encode", daemon=True)
+        thread.start()
+        stats, completed = {}, False
+        log_every = max(1, round(fps))
+        start = time.perf_counter()
+        frames = self.enhancer.enhance_frames(_read_ahead(source, queue_size), self.upscale_factor,
+                                              stats=stats, **self.options)
+        try:
+            for index, frame in enumerate(frames, 1):
+                if errors:
+                    break
+                outbox.put(frame)
+                if index % log_every == 0:
+                    self.logger.info(f"🎬 [{index}/{source.count or '?'}] frames enhanced "
+                                     f"({index / (time.perf_counter() - start):.2f} frames/s).")
+            else:
+                completed = True
+        finally:
+            # Hands the face helper back and stops decoding, also when stopping early.
+            frames.close()
+            outbox.put(_DONE)
+            thread.join()
+            writer.close(completed and not errors)
+        if errors:
+            raise errors[0]
+        elapsed = time.perf_counter() - start
+
+        report = {
+            "frames": writer.frames,
+            "fps": fps,
+            "output_size": list(writer.size) if writer.size else None,
+            "seconds": round(elapsed, 3),
+            "frames_per_second": round(writer.frames / elapsed, 3) if elapsed > 0 else 0,
+            "detections": stats.get("detections", 0),
+            "tracked_frames": stats.get("tracked", 0),
+            "faces": stats.get("faces", 0),
+            # Total time per step; the enhancer's steps run one after another.
+            "phase_seconds": stats.get("seconds", {}),
+        }
+        self.logger.info(f"🏁 Enhanced {report['frames']} frame(s) in {elapsed:.2f}s "
+                         f"({report['frames_per_second']:.2f} frames/s); faces detected on "
+                         f"{report['detections']} frame(s) and tracked on {report['tracked_frames']}.")
+        return report
@@ -0,0 +1,92 @@
+# src/core/weights.py
+import os
+import glob
+import logging
+import threading
+from contextlib import contextmanager
+
+import torch
+from torch import nn
+
+from src.core.export import model_fingerprint
+from src.core.utils import atomic_write
+
+logger = logging.getLogger(__name__)
+
+# skip_weight_init() patches torch.nn.init for the whole process; models are loaded from several
+# threads, so one block at a time patches and restores it.
+_init_lock = threading.Lock()
+
+
+def checkpoint_state_dict(checkpoint: dict) -> dict:
+    """Picks the weights out of a checkpoint the way basicsr and facexlib loaders do."""
+    for key in ("params_ema", "params"):
+        if key in checkpoint:
+            checkpoint = checkpoint[key]
+            break
+    return {(k[len("module."):] if k.startswith("module.") else k): v for k, v in checkpoint.items()}
+
+
+def prepare_weights(model_path: str, cache_dir: str) -> str:
+    """
+    Converts a checkpoint once into a file that loads fast: just the weights that get loaded,
+    stored contiguously in torch's zip format, which torch.load can memory-map. Returns the
+    converted file's path, or `model_path` itself if the checkpoint can't be converted.
+    """
+    name = os.path.splitext(os.path.basename(model_path))[0]
+    prepared_path = os.path.join(cache_dir, f"{name}-{model_fingerprint(model_path)}.pth")
+    if os.path.exists(prepared_path):
+        return prepared_path
+    try:
+        state_dict = checkpoint_state_dict(torch.load(model_path, map_location="cpu"))
+        os.makedirs(cache_dir, exist_ok=True)
+        with atomic_write(prepared_path) as temp_path:
+            torch.save({"params": {k: v.contiguous() for k, v in state_dict.items()}}, temp_path)
+    except Exception as e:
+        logger.warning(f"⚠️  Could not prepare {model_path} for fast loading; using it as is ({e}).")
+        return model_path
+    # Conversions of earlier versions of the checkpoint are of no further use.
+    for stale_path in glob.glob(os.path.join(cache_dir, f"{glob.escape(name)}-*.pth")):
+        if stale_path != prepared_path:
+            os.remove(stale_path)
+    logger.info(f"📦 Prepared {os.path.basename(model_path)} for fast loading.")
+    return prepared_path
+
+
+@contextmanager
+def skip_weight_init():
+    """
+    Turns torch.nn.init into no-ops for the models built inside the block. Randomly initializing
+    every layer is a large part of building a model, and wasted when a checkpoint overwrites all
+    of its weights right after, as it does for every model here (they load with strict=True).
+    """
+    names = ("uniform_", "normal_", "trunc_normal_", "constant_", "zeros_", "ones_",
+             "kaiming_uniform_", "kaiming_normal_", "xavier_uniform_", "xavier_normal_", "orthogonal_")
+    with _init_lock:
+        originals = {name: getattr(nn.init, name) for name in names}
+        for name in names:
+            setattr(nn.init, name, lambda tensor, *args, **kwargs: tensor)
+        try:
+            yield
+        finally:
+            for name, function in originals.items():
+                setattr(nn.init, name, function)
+
+
+def map_weights(module: nn.Module, model_path: str) -> bool:
+    """
+    Re-points a CPU module's parameters and buffers at a memory-mapped view of its checkpoint.
+    The pages then live in the OS page cache, where every process that maps the same file
+    shares them, instead of in a private copy per process. Returns False and leaves the module
+    untouched if the checkpoint cannot be mapped (e.g. it predates the zip format).
+    """
+    try:
+        state_dict = checkpoint_state_dict(torch.load(model_path, map_location="cpu", mmap=True))
+        dtypes = {name: tensor.dtype for name, tensor in module.state_dict().items()}
+        if any(dtypes.get(name) != tensor.dtype for name, tensor in state_dict.items()):
+            return False
+        module.load_state_dict(state_dict, strict=True, assign=True)
+    except Exception as e:
+        logger.warning(f"⚠️  Could not memory-map {model_path}; keeping a private copy ({e}).")
+        return False
+    return True
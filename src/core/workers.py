@@ -0,0 +1,331 @@
+# src/core/workers.py
+import os
+import time
+import queue
+import logging
+import multiprocessing
+from types import SimpleNamespace
+
+import numpy as np
+
+from src.core.cpu import WorkerPlan, format_cores, plan_workers
+from src.core.enhancer import PicturePerfectEnhancer
+
+
+def config_snapshot(config) -> dict:
+    """The settings of a config module, in a form that can be sent to another process."""
+    return {name: getattr(config, name) for name in dir(config) if name.isupper()}
+
+
+def create_enhancer(config) -> PicturePerfectEnhancer:
+    """The enhancer the config asks for: a process pool with INFERENCE_PROCESSES, or the threaded one."""
+    if config.INFERENCE_PROCESSES > 0:
+        return ProcessPoolEnhancer(config, config.INFERENCE_PROCESSES, config.THREADS_PER_WORKER)
+    return PicturePerfectEnhancer(config)
+
+
+def _worker_main(settings: dict, conn, plan: WorkerPlan):
+    """Entry point of an inference process: loads the models, then serves enhance requests."""
+    logging.basicConfig(level=settings.get("LOG_LEVEL", logging.INFO),
+                        format=f"%(asctime)s - %(levelname)s - [{multiprocessing.current_process().name}] %(message)s")
+    enhancer = PicturePerfectEnhancer(SimpleNamespace(**settings), worker_plan=plan)
+    try:
+        enhancer.load_models_into_memory()
+    except Exception as e:
+        conn.send(("error", f"{type(e).__name__}: {e}"))
+        return
+    conn.send(("ready", {
+        "cpu_precision": enhancer.cpu_precision,
+        "device_name": enhancer.device_name,
+        "half_precision": enhancer.half_precision,
+        "load_timings": enhancer.load_timings,
+    }))
+
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            return
+        if message is None:
+            return
+        if isinstance(message[0], str):
+            # ("frames", upscale_factor, options): a clip, frame by frame.
+            _serve_frames(enhancer, conn, *message[1:])
+            continue
+        image, upscale_factor, options = message
+        output_path = options.pop("output_path", None)
+        if options.pop("preview", False):
+            options["on_preview"] = lambda preview: _send_image(conn, "preview", np.ascontiguousarray(preview))
+        try:
+            if output_path:
+                # Streamed outputs go straight to disk; only the report comes back.
+                report, stages, faces = enhancer.enhance_to_png_timed(image, output_path, upscale_factor, **options)
+                conn.send(("written", report, stages, faces))
+                continue
+            restored, stages, faces = enhancer.enhance_timed(image, upscale_factor, **options)
+            restored = np.ascontiguousarray(restored)
+        except Exception as e:
+            conn.send(("error", f"{type(e).__name__}: {e}"))
+            continue
+        _send_image(conn, "ok", restored, stages, faces)
+
+
+def _serve_frames(enhancer, conn, upscale_factor: float, options: dict):
+    """
+    Runs enhance_frames() on frames it asks the parent for one at a time ("next"), sending each
+    enhanced frame back as it is done, and the clip's stats at the end.
+    """
+    def incoming():
+        while True:
+            conn.send(("next",))
+            status, *payload = conn.recv()
+            if status == "done":
+                return
+            yield payload[0]
+
+    stats = {}
+    try:
+        for frame in enhancer.enhance_frames(incoming(), upscale_factor, stats=stats, **options):
+            _send_image(conn, "frame", np.ascontiguousarray(frame))
+    except Exception as e:
+        conn.send(("error", f"{type(e).__name__}: {e}"))
+        return
+    conn.send(("done", stats))
+
+
+def _send_image(conn, status: str, image: np.ndarray, *fields):
+    # The pixels follow as raw bytes, which skips pickling the largest object we send.
+    conn.send((status, image.shape, image.dtype.str, *fields))
+    conn.send_bytes(image.data.cast("B"))
+
+
+def _recv_image(conn, shape, dtype) -> np.ndarray:
+    return np.frombuffer(conn.recv_bytes(), dtype=dtype).reshape(shape)
+
+
+class _WorkerProcess:
+    def __init__(self, index, process, conn):
+        self.index = index
+        self.process = process
+        self.conn = conn
+
+
+class ProcessPoolEnhancer(PicturePerfectEnhancer):
+    """
+    Runs the enhancer in `num_processes` separate inference processes, so inference scales
+    across cores without one GIL or one set of torch threads in between. Each process loads
+    the models with memory-mapped weights (MMAP_WEIGHTS), so the checkpoints are held once in
+    the page cache rather than once per process. Callers block on an idle process the same way
+    the threaded enhancer blocks on an idle worker. Cores are split between the processes, and
+    optionally pinned, by config.CPU_AFFINITY.
+    """
+
+    def __init__(self, config, num_processes: int, threads_per_process=None):
+        super().__init__(config)
+        self.num_processes = max(1, num_processes)
+        self.worker_plans = plan_workers(self.num_processes, threads_per_process, config.CPU_AFFINITY,
+                                         config.INTEROP_THREADS)
+        self.threads_per_process = self.worker_plans[0].threads
+        self._settings = config_snapshot(config)
+        self._context = multiprocessing.get_context("spawn")
+        self._idle = queue.Queue()
+        self._processes = []
+
+    def load_models_into_memory(self):
+        """Starts the inference processes and waits until every one of them has loaded the models."""
+        if self.is_initialized:
+            return
+        self.logger.info(f"🧠 Starting {self.num_processes} inference process(es) with "
+                         f"{self.threads_per_process} thread(s) each..."
+                         + "".join(f"\n   - inference-{plan.index}: cores {format_cores(plan.cores)}"
+                                   for plan in self.worker_plans if plan.cores))
+        # Start them all before waiting, so they load their models in parallel.
+        starting = [self._start_process(index) for index in range(self.num_processes)]
+        for worker in starting:
+            self._await_ready(worker)
+            self._processes.append(worker)
+            self._idle.put(worker)
+        self.is_initialized = True
+        self.logger.info("✅ All inference processes are ready to enhance.")
+
+    def _start_process(self, index: int) -> _WorkerProcess:
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(
+            target=_worker_main, args=(self._settings, child_conn, self.worker_plans[index]),
+            name=f"inference-{index}", daemon=True
+        )
+        process.start()
+        child_conn.close()
+        return _WorkerProcess(index, process, parent_conn)
+
+    def _await_ready(self, worker: _WorkerProcess):
+        try:
+            status, payload = worker.conn.recv()
+        except EOFError:
+            worker.process.join(timeout=5)
+            status, payload = "error", f"exited with code {worker.process.exitcode}"
+        if status != "ready":
+            self.close()
+            raise RuntimeError(f"Inference process {worker.index} failed to load the models: {payload}")
+        self.cpu_precision = payload["cpu_precision"]
+        self.device_name = payload["device_name"]
+        self.half_precision = payload["half_precision"]
+        self.load_timings = payload["load_timings"]
+
+    def _restart(self, worker: _WorkerProcess) -> _WorkerProcess:
+        worker.process.kill()
+        worker.process.join()
+        replacement = self._start_process(worker.index)
+        self._await_ready(replacement)
+        self._processes[self._processes.index(worker)] = replacement
+        return replacement
+
+    def enhance_timed(self, image, upscale_factor: float, tile_size=None, background_mode=None, max_long_edge=None,
+                      face_model=None, background_model=None, on_preview=None):
+        """Enhances a single image in the next idle inference process. Blocks until it is done."""
+        return self._run(image, upscale_factor, {"tile_size": tile_size, "background_mode": background_mode,
+                                                 "max_long_edge": max_long_edge, "face_model": face_model,
+                                                 "background_model": background_model}, on_preview)
+
+    def enhance_to_png_timed(self, image, path: str, upscale_factor: float, tile_size=None, background_mode=None,
+                             max_long_edge=None, face_model=None, background_model=None, on_preview=None):
+        """Has the next idle inference process stream an enhanced image into a PNG at `path`."""
+        return self._run(image, upscale_factor, {"tile_size": tile_size, "background_mode": background_mode,
+                                                 "max_long_edge": max_long_edge, "face_model": face_model,
+                                                 "background_model": background_model,
+                                                 "output_path": os.path.abspath(path)}, on_preview)
+
+    def _acquire(self) -> _WorkerProcess:
+        """Waits for an idle inference process, restarting it if it has exited."""
+        if not self.is_initialized:
+            raise RuntimeError("Models are not loaded. Please ensure all models are downloaded and loaded first.")
+        worker = self._idle.get()
+        if not worker.process.is_alive():
+            self.logger.warning(f"⚠️  Inference process {worker.index} exited while idle; restarting it.")
+            try:
+                worker = self._restart(worker)
+            except Exception:
+                self._idle.put(worker)
+                raise
+        return worker
+
+    def _run(self, image, upscale_factor: float, options: dict, on_preview=None):
+        start = time.perf_counter()
+        worker = self._acquire()
+        waited = time.perf_counter() - start
+        try:
+            worker.conn.send((image, upscale_factor, {**options, "preview": on_preview is not None}))
+            status, *payload = worker.conn.recv()
+            if status == "preview":
+                preview = _recv_image(worker.conn, *payload)
+                try:
+                    on_preview(preview)
+                except Exception as e:
+                    # The result is still on its way down the pipe, so it must be read either way.
+                    self.logger.warning(f"⚠️  Could not deliver a preview: {e}")
+                status, *payload = worker.conn.recv()
+            if status == "error":
+                raise RuntimeError(payload[0])
+            if status == "written":
+                result, stages, faces = payload
+            else:
+                shape, dtype, stages, faces = payload
+                result = _recv_image(worker.conn, shape, dtype)
+            stages["wait_for_worker"] = round(waited, 3)
+            return result, stages, faces
+        except (EOFError, OSError) as e:
+            self.logger.error(f"❌ Inference process {worker.index} died ({e}); restarting it.")
+            worker = self._restart(worker)
+            raise RuntimeError(f"Inference process {worker.index} died while enhancing the image.") from e
+        finally:
+            self._idle.put(worker)
+
+    def enhance_frames(self, frames, upscale_factor: float, tile_size=None, background_mode=None, max_long_edge=None,
+                       face_model=None, background_model=None, detect_interval=None, window=None, stats=None):
+        """
+        Enhances a sequence of frames in one inference process, which keeps tracking the faces
+        across the whole clip; see PicturePerfectEnhancer.enhance_frames(). Frames are sent as the
+        process asks for them, so it holds no more than its window of them at a time.
+        """
+        options = {"tile_size": tile_size, "background_mode": background_mode, "max_long_edge": max_long_edge,
+                   "face_model": face_model, "background_model": background_model,
+                   "detect_interval": detect_interval, "window": window}
+        frames = iter(frames)
+        worker = self._acquire()
+        finished = asked = False
+        try:
+            worker.conn.send(("frames", upscale_factor, options))
+            while True:
+                status, *payload = worker.conn.recv()
+                if status == "next":
+                    asked = True
+                    frame = next(frames, None)
+                    worker.conn.send(("done",) if frame is None else ("frame", frame))
+                    asked = False
+                elif status == "frame":
+                    yield _recv_image(worker.conn, *payload)
+                else:
+                    finished = True
+                    if status == "error":
+                        raise RuntimeError(payload[0])
+                    if stats is not None:
+                        stats.update(payload[0])
+                    return
+        except (EOFError, OSError) as e:
+            finished = True
+            self.logger.error(f"❌ Inference process {worker.index} died ({e}); restarting it.")
+            worker = self._restart(worker)
+            raise RuntimeError(f"Inference process {worker.index} died while enhancing the frames.") from e
+        finally:
+            if not finished:
+                worker = self._end_frames(worker, asked)
+            self._idle.put(worker)
+
+    def _end_frames(self, worker: _WorkerProcess, asked: bool) -> _WorkerProcess:
+        """
+        Ends a clip the caller stopped reading or whose frames failed: sends no more frames and
+        drops the enhanced ones. `asked` means the process is waiting for an answer to "next".
+        """
+        try:
+            if asked:
+                worker.conn.send(("done",))
+            while True:
+                status, *payload = worker.conn.recv()
+                if status == "next":
+                    worker.conn.send(("done",))
+                elif status == "frame":
+                    worker.conn.recv_bytes()
+                else:
+                    return worker
+        except (EOFError, OSError):
+            return self._restart(worker)
+
+    def process_ids(self) -> dict:
+        """The PID of each inference process, by index."""
+        return {worker.index: worker.process.pid for worker in self._processes}
+
+    def close(self):
+        """Stops every inference process."""
+        for worker in self._processes:
+            try:
+                worker.conn.send(None)
+            except (OSError, ValueError):
+                pass
+        for worker in self._processes:
+            worker.process.join(timeout=10)
+            if worker.process.is_alive():
+                worker.process.kill()
+        self._processes = []
+        self.is_initialized = False
+
+    def get_system_info(self):
+        info = super().get_system_info()
+        info.update({
+            "inference_processes": self.num_processes,
+            "threads_per_process": self.threads_per_process,
+            "cpu_plan": [plan.to_dict() for plan in self.worker_plans],
+            # Each process loads and evicts model variants on its own.
+            "loaded_models": None,
+            "face_cache": None,
+        })
+        return info
@@ -1,26 +1,94 @@
+import time
+# Taken before anything else is imported, so the startup log covers the imports as well.
+IMPORT_STARTED = time.perf_counter()
+
 import os
+import sys
 import cv2
 import json
-import zipfile
+import asyncio
 import logging
-from typing import List
-from fastapi import FastAPI, Request, UploadFile, File, Form, HTTPException
-from fastapi.responses import JSONResponse, HTMLResponse, FileResponse, StreamingResponse
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import List, Optional
+from fastapi import FastAPI, Request, UploadFile, File, Form, HTTPException, Query
+from fastapi.responses import JSONResponse, HTMLResponse, FileResponse, PlainTextResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from werkzeug.utils import secure_filename
-from basicsr.utils import imwrite
 
 import config
-from src.core.enhancer import PicturePerfectEnhancer
+from src.core.archive import stream_zip
+from src.core.cache import ResultCache
+from src.core.encoding import OUTPUT_FORMATS, available_formats, write_image
+from src.core.enhancer import BACKGROUND_MODES
+from src.core.jobs import JobScheduler, JobQueueFull
+from src.core.metrics import (
+    REGISTRY, REQUEST_SECONDS, STAGE_SECONDS, IMAGES_TOTAL, Counter, Gauge, resident_memory_bytes
+)
+from src.core.workers import ProcessPoolEnhancer, create_enhancer
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await job_scheduler.start()
+    logger.info(f"🚀 Server started in {time.perf_counter() - IMPORT_STARTED:.2f}s.")
+    if config.PRELOAD_MODELS and not enhancer.check_models():
+        logger.info("🧠 Loading the models in the background...")
+        start_model_load()
+    yield
+    await job_scheduler.stop()
+    enhancer.close()
 
-app = FastAPI(title="PicturePerfect API", version=config.PROJECT_VERSION)
+app = FastAPI(title="PicturePerfect API", version=config.PROJECT_VERSION, lifespan=lifespan)
 app.mount("/static", StaticFiles(directory=config.STATIC_DIR), name="static")
 
 templates = Jinja2Templates(directory=config.STATIC_DIR)
-enhancer = PicturePerfectEnhancer(config)
+enhancer = create_enhancer(config)
+# One inference thread per worker; with processes, each thread waits on one process.
+inference_workers = max(1, config.INFERENCE_PROCESSES or config.INFERENCE_WORKERS)
+result_cache = ResultCache(config.RESULT_CACHE_DIR, config.RESULT_CACHE_MAX_MB * 1024 * 1024) if config.RESULT_CACHE_MAX_MB > 0 else None
 logger = logging.getLogger(__name__)
 
+# Inference runs here, never on the event loop. Images are submitted one at a time per request,
+# so concurrent requests interleave in the executor's FIFO queue instead of waiting on each other.
+inference_executor = ThreadPoolExecutor(
+    max_workers=inference_workers, thread_name_prefix="inference"
+)
+# Finished images are encoded here, overlapping with inference of the next image.
+encode_executor = ThreadPoolExecutor(max_workers=max(1, config.ENCODE_WORKERS), thread_name_prefix="encode")
+# Model downloads block on the network, so they get their own threads.
+download_executor = ThreadPoolExecutor(max_workers=max(1, config.DOWNLOAD_WORKERS), thread_name_prefix="download")
+
+# The running or finished model load, shared by the startup preload and /api/load_models.
+model_load_task = None
+model_load_error = None
+
+def start_model_load() -> asyncio.Task:
+    """Starts loading the models on an inference thread, unless they are loaded or already loading."""
+    global model_load_task
+    if model_load_task is None or (model_load_task.done() and not enhancer.is_initialized):
+        model_load_task = asyncio.create_task(run_model_load())
+    return model_load_task
+
+async def run_model_load():
+    global model_load_error
+    model_load_error = None
+    try:
+        await asyncio.get_running_loop().run_in_executor(inference_executor, enhancer.load_models_into_memory)
+        logger.info(f"✅ Ready to enhance {time.perf_counter() - IMPORT_STARTED:.2f}s after startup.")
+    except Exception as e:
+        # Recorded rather than raised: nobody may be awaiting a load started at startup.
+        model_load_error = str(e)
+        logger.error(f"Failed to load models into memory: {e}", exc_info=True)
+
+def startup_state() -> str:
+    if enhancer.is_initialized:
+        return "ready"
+    if model_load_task is not None and not model_load_task.done():
+        return "loading"
+    return "failed" if model_load_error else "idle"
+
 # --- NEW API ENDPOINTS FOR MODEL MANAGEMENT ---
 
 @app.get("/api/status")
@@ -30,30 +98,65 @@ async def get_status():
     system_info = enhancer.get_system_info()
     return JSONResponse({
         "missing_models": missing_models,
-        "system_info": system_info
+        "system_info": system_info,
+        "result_cache": result_cache.stats() if result_cache else None,
+        "startup": {"state": startup_state(), "error": model_load_error}
     })
 
-@app.post("/api/download_model")
-async def download_model_route(model_info: dict):
-    """Streams the download progress for a single requested model."""
-    async def stream_download():
-        try:
-            for update in enhancer.download_model(model_info):
-                yield f"data: {json.dumps(update)}\n\n"
-        except Exception as e:
-            logger.error(f"Download stream failed: {e}", exc_info=True)
-            yield f"data: {json.dumps({'status': 'error', 'model_name': model_info.get('name', 'Unknown'), 'error_message': str(e)})}\n\n"
-    return StreamingResponse(stream_download(), media_type="text/event-stream")
+@app.get("/api/ready")
+async def get_ready():
+    """Readiness probe: 200 once the models are loaded, 503 until then."""
+    state = startup_state()
+    return JSONResponse({"ready": state == "ready", "state": state, "error": model_load_error},
+                        status_code=200 if state == "ready" else 503)
 
-@app.post("/api/load_models")
-async def load_models_route():
-    """Triggers the loading of models into GPU/CPU memory."""
+def _run_download(model_info: dict, loop, events: asyncio.Queue):
+    """Runs one blocking download on a download thread, passing its events to the event loop."""
     try:
-        enhancer.load_models_into_memory()
-        return JSONResponse({"status": "success", "message": "Models loaded into memory."})
+        for update in enhancer.download_model(model_info):
+            loop.call_soon_threadsafe(events.put_nowait, update)
     except Exception as e:
-        logger.error(f"Failed to load models into memory: {e}", exc_info=True)
-        raise HTTPException(status_code=500, detail=f"Failed to load models: {str(e)}")
+        logger.error(f"Download stream failed: {e}", exc_info=True)
+        loop.call_soon_threadsafe(events.put_nowait, {
+            'status': 'error', 'model_name': model_info.get('name', 'Unknown'), 'error_message': str(e)
+        })
+
+async def stream_downloads(model_infos: List[dict]):
+    """Downloads the models concurrently and streams their merged progress as server-sent events."""
+    loop = asyncio.get_running_loop()
+    events = asyncio.Queue()
+    downloads = [loop.run_in_executor(download_executor, _run_download, info, loop, events) for info in model_infos]
+    finished = asyncio.gather(*downloads)
+    while not (finished.done() and events.empty()):
+        getter = asyncio.ensure_future(events.get())
+        await asyncio.wait([getter, finished], return_when=asyncio.FIRST_COMPLETED)
+        if getter.done():
+            yield f"data: {json.dumps(getter.result())}\n\n"
+        else:
+            getter.cancel()
+    yield f"data: {json.dumps({'status': 'finished'})}\n\n"
+
+@app.api_route("/api/download_model", methods=["GET", "POST"])
+async def download_model_route(request: Request, model_info: Optional[str] = None):
+    """Streams the download progress for a single requested model (GET `?model_info=` or a POST body)."""
+    if model_info is not None:
+        info = json.loads(model_info)
+    else:
+        info = await request.json()
+    return StreamingResponse(stream_downloads([info]), media_type="text/event-stream")
+
+@app.get("/api/download_models")
+async def download_missing_models_route():
+    """Downloads every missing model concurrently and streams their progress."""
+    return StreamingResponse(stream_downloads(enhancer.check_models()), media_type="text/event-stream")
+
+@app.post("/api/load_models")
+async def load_models_route():
+    """Triggers the loading of models into GPU/CPU memory, or waits for the load already under way."""
+    await asyncio.shield(start_model_load())
+    if not enhancer.is_initialized:
+        raise HTTPException(status_code=500, detail=f"Failed to load models: {model_load_error}")
+    return JSONResponse({"status": "success", "message": "Models loaded into memory."})
         
 # --- END OF NEW API ENDPOINTS ---
 
@@ -61,29 +164,300 @@ async def load_models_route():
 async def get_index(request: Request):
     return templates.TemplateResponse("index.html", {"request": request})
 
+def decode_image(data):
+    """Decodes an encoded image straight from memory; np.frombuffer wraps the bytes without a copy."""
+    return cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+
+def fetch_cached(item: dict) -> bool:
+    """Writes the cached result for an uploaded image to its output path, if there is one."""
+    if result_cache is None:
+        return False
+    output_path = os.path.join(config.OUTPUT_DIR, item["output_filename"])
+    with STAGE_SECONDS.time(stage="cache_lookup"):
+        hit = result_cache.get(item["cache_key"], output_path)
+    if hit:
+        IMAGES_TOTAL.inc(outcome="cached")
+    return hit
+
+def preview_writer(item: dict, on_preview):
+    """An enhancer on_preview callback that saves the preview as a JPEG and reports its filename."""
+    def write_preview(preview_img):
+        filename = f"Preview_{os.path.splitext(item['output_filename'])[0]}.jpg"
+        try:
+            with STAGE_SECONDS.time(stage="preview"):
+                write_image(preview_img, os.path.join(config.PREVIEW_DIR, filename), "jpeg", config.PREVIEW_QUALITY)
+        except Exception as e:
+            # A lost preview only means waiting for the full result.
+            logger.warning(f"⚠️  Could not write the preview of {item['filename']}: {e}")
+            return
+        on_preview({"preview": filename})
+    return write_preview
+
+def enhance_item(item: dict, on_preview=None):
+    """
+    Inference stage: decodes and enhances one uploaded image. Runs on an inference worker thread.
+    With `on_preview`, a preview is written as soon as the faces are restored and reported through it.
+    """
+    # Drop the upload buffer with the item's last use, so queued jobs only hold unprocessed images.
+    with STAGE_SECONDS.time(stage="decode"):
+        img = decode_image(item.pop("data"))
+    if img is None: return None
+    options = item["options"]
+    if on_preview:
+        options = {**options, "on_preview": preview_writer(item, on_preview)}
+    if enhancer.should_stream(img.shape, options["upscale_factor"], item["encoding"]["fmt"], options["max_long_edge"]):
+        # Too large to build in memory: written strip by strip here, and the write report passed on.
+        output_path = os.path.join(config.OUTPUT_DIR, item["output_filename"])
+        return enhancer.enhance_to_png(img, output_path, **options)
+    return enhancer.enhance(img, **options)
+
+def encode_item(item: dict, restored_img) -> dict:
+    """Encoding stage: writes the enhanced image in the requested format and caches it."""
+    if restored_img is None:
+        IMAGES_TOTAL.inc(outcome="failed")
+        return {"output": None}
+    output_path = os.path.join(config.OUTPUT_DIR, item["output_filename"])
+    if isinstance(restored_img, dict):
+        # Streamed outputs are already on disk; enhance_item passed on their write report.
+        report = restored_img
+    else:
+        with STAGE_SECONDS.time(stage="encode"):
+            report = write_image(restored_img, output_path, **item["encoding"])
+    IMAGES_TOTAL.inc(outcome="enhanced")
+    if result_cache is not None:
+        result_cache.put(item["cache_key"], output_path)
+    return {"output": item["output_filename"], **report}
+
+def process_job_item(item: dict, on_preview=None):
+    """Job scheduler inference stage: answers from the result cache or enhances the image."""
+    item["cached"] = fetch_cached(item)
+    if item["cached"]:
+        item.pop("data", None)
+        return None
+    return enhance_item(item, on_preview if item.get("preview") else None)
+
+def finish_job_item(item: dict, restored_img) -> dict:
+    """Job scheduler encoding stage."""
+    if item["cached"]:
+        return {"output": item["output_filename"], "cached": True}
+    return encode_item(item, restored_img)
+
+job_scheduler = JobScheduler(
+    process_job_item, inference_executor, num_workers=inference_workers,
+    max_queued_jobs=config.MAX_QUEUED_JOBS, history_limit=config.JOB_HISTORY_LIMIT,
+    finish_fn=finish_job_item, finish_executor=encode_executor, max_finishing=max(1, config.ENCODE_WORKERS)
+)
+
+# --- METRICS ---
+# Everything below is read at scrape time, so /metrics always shows the current state.
+
+def process_metric(read_main, read_inference_process):
+    """A per-process value for the server and, when inference runs in processes, for each of them."""
+    values = {("main",): read_main()}
+    if isinstance(enhancer, ProcessPoolEnhancer):
+        for index, pid in enhancer.process_ids().items():
+            values[(f"inference-{index}",)] = read_inference_process(pid)
+    return values
+
+def cache_metric(key: str):
+    caches = {"result": result_cache.stats() if result_cache else None,
+              "face": enhancer.face_cache.stats() if enhancer.face_cache else None}
+    return {(name,): stats[key] for name, stats in caches.items() if stats}
+
+REGISTRY.register(Gauge(
+    "picture_perfect_queue_depth", "Work waiting to start, per queue.", ["queue"]
+)).set_function(lambda: {
+    ("jobs",): job_scheduler.queue_depth(),
+    ("inference",): inference_executor._work_queue.qsize(),
+    ("encode",): encode_executor._work_queue.qsize(),
+})
+REGISTRY.register(Counter(
+    "picture_perfect_cache_hits_total", "Cache hits, per cache.", ["cache"]
+)).set_function(lambda: cache_metric("hits"))
+REGISTRY.register(Counter(
+    "picture_perfect_cache_misses_total", "Cache misses, per cache.", ["cache"]
+)).set_function(lambda: cache_metric("misses"))
+REGISTRY.register(Gauge(
+    "picture_perfect_cache_entries", "Entries held, per cache.", ["cache"]
+)).set_function(lambda: cache_metric("entries"))
+REGISTRY.register(Gauge(
+    "picture_perfect_models_loaded", "1 once the models are loaded and ready to enhance."
+)).set_function(lambda: int(enhancer.is_initialized))
+REGISTRY.register(Gauge(
+    "process_resident_memory_bytes", "Resident memory size, per process.", ["process"]
+)).set_function(lambda: process_metric(resident_memory_bytes, resident_memory_bytes))
+# torch is only asked once the models have imported it.
+REGISTRY.register(Gauge(
+    "picture_perfect_torch_threads", "Threads torch uses for inference, per process.", ["process"]
+)).set_function(lambda: process_metric(
+    lambda: sys.modules["torch"].get_num_threads() if "torch" in sys.modules else 0,
+    lambda pid: enhancer.threads_per_process,
+))
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Metrics in the Prometheus text exposition format."""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+async def read_upload(uploaded_file: UploadFile) -> bytearray:
+    """Reads an upload in chunks, rejecting it with HTTP 413 as soon as it exceeds MAX_UPLOAD_MB."""
+    limit = config.MAX_UPLOAD_MB * 1024 * 1024
+    data = bytearray()
+    while chunk := await uploaded_file.read(config.UPLOAD_CHUNK_SIZE):
+        data += chunk
+        if len(data) > limit:
+            raise HTTPException(status_code=413, detail=f"{uploaded_file.filename} exceeds the {config.MAX_UPLOAD_MB} MB upload limit.")
+    return data
+
+async def save_upload(uploaded_file: UploadFile, options: dict, encoding: dict) -> dict:
+    """Reads an upload into memory and returns it with the output name and cache key needed to enhance it."""
+    filename = secure_filename(uploaded_file.filename)
+    data = await read_upload(uploaded_file)
+    signature = enhancer.output_signature(options["upscale_factor"], options["background_mode"], options["max_long_edge"],
+                                          options["face_model"], options["background_model"])
+    cache_key = ResultCache.key(data, {**signature, "encoding": encoding})
+    # File names carry part of the cache key, so different uploads sharing a name never collide.
+    if config.PERSIST_INPUTS:
+        with open(os.path.join(config.INPUT_DIR, f"{cache_key[:12]}_{filename}"), "wb") as f: f.write(data)
+    return {
+        "filename": filename,
+        "data": data,
+        "output_filename": f"Enhanced_{os.path.splitext(filename)[0]}_{cache_key[:12]}{OUTPUT_FORMATS[encoding['fmt']]}",
+        "cache_key": cache_key,
+        "options": options,
+        "encoding": encoding,
+    }
+
+def enhance_options(tile_size: Optional[int], background_mode: Optional[str], upscale: Optional[float] = None,
+                    max_long_edge: Optional[int] = None, face_model: Optional[str] = None,
+                    background_model: Optional[str] = None) -> dict:
+    """Validates the per-request enhancement form fields and returns them as enhance() kwargs."""
+    if upscale is not None and not 1 <= upscale <= config.MAX_UPSCALE_FACTOR:
+        raise HTTPException(status_code=400, detail=f"upscale must be between 1 and {config.MAX_UPSCALE_FACTOR}.")
+    if max_long_edge is not None and max_long_edge < 64:
+        raise HTTPException(status_code=400, detail="max_long_edge must be at least 64 pixels.")
+    if tile_size is not None and tile_size < 0:
+        raise HTTPException(status_code=400, detail="tile_size must be 0 (no tiling) or a positive number of pixels.")
+    if background_mode is not None and background_mode not in BACKGROUND_MODES:
+        raise HTTPException(status_code=400, detail=f"background_mode must be one of: {', '.join(BACKGROUND_MODES)}.")
+    for kind, name in (("face", face_model), ("background", background_model)):
+        if name is not None and name not in enhancer.available_variants(kind):
+            raise HTTPException(status_code=400, detail=f"{kind}_model must be one of the downloaded models: "
+                                                        f"{', '.join(enhancer.available_variants(kind))}.")
+    return {"upscale_factor": upscale or config.UPSCALE_FACTOR, "max_long_edge": max_long_edge,
+            "tile_size": tile_size, "background_mode": background_mode,
+            "face_model": face_model, "background_model": background_model}
+
+def encoding_options(output_format: Optional[str], quality: Optional[int]) -> dict:
+    """Validates the per-request output format fields and returns them as write_image() kwargs."""
+    output_format = output_format or config.OUTPUT_FORMAT
+    if output_format not in available_formats():
+        raise HTTPException(status_code=400, detail=f"output_format must be one of: {', '.join(available_formats())}.")
+    if quality is not None and not 1 <= quality <= 100:
+        raise HTTPException(status_code=400, detail="quality must be between 1 and 100.")
+    return {"fmt": output_format, "quality": quality or config.OUTPUT_QUALITY, "png_compression": config.PNG_COMPRESSION}
+
 @app.post("/enhance")
-async def enhance_images(files: List[UploadFile] = File(...)):
+async def enhance_images(
+    files: List[UploadFile] = File(...),
+    tile_size: Optional[int] = Form(None),
+    background_mode: Optional[str] = Form(None),
+    output_format: Optional[str] = Form(None),
+    quality: Optional[int] = Form(None),
+    upscale: Optional[float] = Form(None),
+    max_long_edge: Optional[int] = Form(None),
+    face_model: Optional[str] = Form(None),
+    background_model: Optional[str] = Form(None),
+):
     if not enhancer.is_initialized:
         raise HTTPException(status_code=400, detail="Models are not yet loaded and ready.")
-    
-    processed_images = []
+    options = enhance_options(tile_size, background_mode, upscale, max_long_edge, face_model, background_model)
+    encoding = encoding_options(output_format, quality)
+
+    start = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    pending = []
     for uploaded_file in files:
-        filename = secure_filename(uploaded_file.filename)
-        input_path = os.path.join(config.INPUT_DIR, filename)
         try:
-            with open(input_path, "wb") as f: f.write(await uploaded_file.read())
-            img = cv2.imread(input_path, cv2.IMREAD_COLOR)
-            if img is None: continue
-            restored_img = enhancer.enhance(img, upscale_factor=config.UPSCALE_FACTOR)
-            if restored_img is None: continue
-            output_filename = f"Enhanced_{os.path.splitext(filename)[0]}.png"
-            output_path = os.path.join(config.OUTPUT_DIR, output_filename)
-            imwrite(restored_img, output_path)
-            processed_images.append(output_filename)
+            item = await save_upload(uploaded_file, options, encoding)
+            # Cache hits are copied on the default executor, so they never queue behind inference.
+            if await loop.run_in_executor(None, fetch_cached, item):
+                pending.append((item, None))
+                continue
+            restored_img = await loop.run_in_executor(inference_executor, enhance_item, item)
+            # Encoding overlaps with inference of the next upload.
+            pending.append((item, loop.run_in_executor(encode_executor, encode_item, item, restored_img)))
+        except HTTPException:
+            raise
         except Exception as e:
-            logger.error(f"Error processing file {filename}: {e}", exc_info=True)
-            
-    return JSONResponse({"status": "success", "images": processed_images})
+            IMAGES_TOTAL.inc(outcome="failed")
+            logger.error(f"Error processing file {uploaded_file.filename}: {e}", exc_info=True)
+
+    results = []
+    for item, encoding_future in pending:
+        try:
+            report = await encoding_future if encoding_future else {"output": item["output_filename"], "cached": True}
+            results.append({"filename": item["filename"], **report})
+        except Exception as e:
+            IMAGES_TOTAL.inc(outcome="failed")
+            logger.error(f"Error encoding file {item['filename']}: {e}", exc_info=True)
+    processed_images = [result["output"] for result in results if result["output"]]
+    REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint="/enhance")
+    return JSONResponse({"status": "success", "images": processed_images, "results": results})
+
+# --- ASYNCHRONOUS JOB API ---
+
+@app.post("/api/jobs", status_code=202)
+async def create_job(
+    files: List[UploadFile] = File(...),
+    tile_size: Optional[int] = Form(None),
+    background_mode: Optional[str] = Form(None),
+    output_format: Optional[str] = Form(None),
+    quality: Optional[int] = Form(None),
+    upscale: Optional[float] = Form(None),
+    max_long_edge: Optional[int] = Form(None),
+    face_model: Optional[str] = Form(None),
+    background_model: Optional[str] = Form(None),
+    preview: bool = Form(False),
+):
+    """
+    Queues a batch of images for enhancement and returns its job ID immediately. With `preview`,
+    each image also gets a quick preview, announced by a "preview" event, before its full result.
+    """
+    if not enhancer.is_initialized:
+        raise HTTPException(status_code=400, detail="Models are not yet loaded and ready.")
+    options = enhance_options(tile_size, background_mode, upscale, max_long_edge, face_model, background_model)
+    encoding = encoding_options(output_format, quality)
+    if job_scheduler.is_full():
+        raise HTTPException(status_code=429, detail="Too many queued jobs. Please retry later.")
+
+    items = [await save_upload(uploaded_file, options, encoding) for uploaded_file in files]
+    for item in items:
+        item["preview"] = preview
+    try:
+        job = job_scheduler.submit(items)
+    except JobQueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    return JSONResponse(job.to_dict(), status_code=202)
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Reports the overall and per-image state of a job."""
+    job = job_scheduler.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return JSONResponse(job.to_dict())
+
+@app.get("/api/jobs/{job_id}/events")
+async def stream_job_events(job_id: str):
+    """Streams job progress as server-sent events until the job finishes."""
+    if job_scheduler.get(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def stream_events():
+        async for event in job_scheduler.subscribe(job_id):
+            yield f"data: {json.dumps(event)}\n\n"
+    return StreamingResponse(stream_events(), media_type="text/event-stream")
 
 @app.get("/output/{filename}")
 async def get_output_image(filename: str):
@@ -92,21 +466,44 @@ async def get_output_image(filename: str):
         return FileResponse(file_path)
     return HTTPException(status_code=404, detail="File not found")
 
+@app.get("/preview/{filename}")
+async def get_preview_image(filename: str):
+    file_path = os.path.join(config.PREVIEW_DIR, os.path.basename(filename))
+    if os.path.exists(file_path):
+        return FileResponse(file_path)
+    raise HTTPException(status_code=404, detail="File not found")
+
 @app.post("/clear_history")
 async def clear_history():
-    for folder in [config.INPUT_DIR, config.OUTPUT_DIR]:
+    for folder in [config.INPUT_DIR, config.OUTPUT_DIR, config.PREVIEW_DIR]:
         for filename in os.listdir(folder):
             file_path = os.path.join(folder, filename)
             if os.path.isfile(file_path):
                 os.unlink(file_path)
     return JSONResponse({"status": "success"})
 
-@app.post("/download_all")
-async def download_all_as_zip():
+@app.api_route("/download_all", methods=["GET", "POST"])
+async def download_all_as_zip(job_id: Optional[str] = None, files: Optional[List[str]] = Query(None)):
+    """
+    Streams enhanced images as a ZIP built on the fly. Downloads every output by default, the
+    outputs of one job with `job_id`, or the outputs named in repeated `files` parameters.
+    """
     zip_filename = "Enhanced-Images.zip"
-    zip_path = os.path.join(config.OUTPUT_DIR, zip_filename)
-    with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as zipf:
-        for filename in os.listdir(config.OUTPUT_DIR):
-            if filename.lower().endswith('.png'):
-                zipf.write(os.path.join(config.OUTPUT_DIR, filename), arcname=filename)
-    return FileResponse(zip_path, filename=zip_filename, media_type="application/zip")
\ No newline at end of file
+    if job_id is not None:
+        job = job_scheduler.get(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="Job not found")
+        filenames = [image["output"] for image in job.images if image.get("output")]
+        zip_filename = f"Enhanced-Images-{job_id[:8]}.zip"
+    elif files:
+        # Only bare names are accepted, so a selection can never reach outside OUTPUT_DIR.
+        filenames = [os.path.basename(filename) for filename in files]
+    else:
+        filenames = sorted(filename for filename in os.listdir(config.OUTPUT_DIR)
+                           if filename.lower().endswith(tuple(OUTPUT_FORMATS.values())))
+
+    entries = [(os.path.join(config.OUTPUT_DIR, filename), filename) for filename in filenames]
+    return StreamingResponse(
+        stream_zip(entries), media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{zip_filename}"'}
+    )
\ No newline at end of file
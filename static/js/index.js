@@ -11,6 +11,9 @@ document.addEventListener("DOMContentLoaded", () => {
     },
     dropZone: document.getElementById("drop-zone"),
     fileInput: document.getElementById("file-input"),
+    backgroundMode: document.getElementById("background-mode"),
+    outputFormat: document.getElementById("output-format"),
+    outputSize: document.getElementById("output-size"),
     enhanceBtn: document.getElementById("enhance-btn"),
     clearBtn: document.getElementById("clear-btn"),
     downloadAllBtn: document.getElementById("download-all-btn"),
@@ -67,9 +70,8 @@ document.addEventListener("DOMContentLoaded", () => {
   };
 
   const processDownloadQueue = async (queue) => {
-    for (const model of queue) {
-      await startDownload(model);
-    }
+    // The models download concurrently; the server caps how many run at once.
+    await Promise.all(queue.map(startDownload));
     // After all downloads are attempted, check if any failed
     const failedItems = DOMElements.modal.list.querySelectorAll(".retry-btn");
     if (failedItems.length === 0) {
@@ -96,6 +98,8 @@ document.addEventListener("DOMContentLoaded", () => {
           item.querySelector(
             ".progress-fill"
           ).style.width = `${data.progress}%`;
+        } else if (data.status === "verifying") {
+          statusDiv.textContent = "Verifying...";
         } else if (data.status === "completed") {
           statusDiv.innerHTML = '<i class="fa-solid fa-check-circle"></i>';
           eventSource.close();
@@ -131,6 +135,9 @@ document.addEventListener("DOMContentLoaded", () => {
     DOMElements.modal.overlay.classList.remove("modal-hidden");
     try {
       await fetch("/api/load_models", { method: "POST" });
+      // The device is only known once the models have loaded.
+      const status = await (await fetch("/api/status")).json();
+      updateSystemInfo(status.system_info);
       DOMElements.modal.overlay.classList.add("modal-hidden");
       isAppReady = true;
       updateButtonStates();
@@ -187,21 +194,31 @@ document.addEventListener("DOMContentLoaded", () => {
 
     const formData = new FormData();
     filesToUpload.forEach((file) => formData.append("files", file));
+    if (DOMElements.backgroundMode.value)
+      formData.append("background_mode", DOMElements.backgroundMode.value);
+    if (DOMElements.outputFormat.value)
+      formData.append("output_format", DOMElements.outputFormat.value);
+    const outputSize = DOMElements.outputSize.value;
+    if (outputSize.startsWith("max-"))
+      formData.append("max_long_edge", outputSize.slice(4));
+    else if (outputSize) formData.append("upscale", outputSize);
+    // Each image shows up as a quick preview first, then the full result replaces it.
+    formData.append("preview", "true");
 
     try {
-      const response = await fetch("/enhance", {
+      const response = await fetch("/api/jobs", {
         method: "POST",
         body: formData,
       });
       if (!response.ok)
         throw new Error((await response.json()).detail || "Enhancement failed");
 
-      const result = await response.json();
-      displayEnhancedImages(result.images);
+      const job = await response.json();
+      const enhancedCount = await followJob(job, notifId);
       updateNotification(
         notifId,
         "info",
-        `Successfully enhanced ${result.images.length} image(s).`,
+        `Successfully enhanced ${enhancedCount} image(s).`,
         5000
       );
     } catch (error) {
@@ -229,17 +246,20 @@ document.addEventListener("DOMContentLoaded", () => {
   const updateButtonStates = () => {
     const hasOriginals = filesToUpload.length > 0;
     const hasEnhanced =
-      DOMElements.enhancedGrid.querySelector(".image-card") !== null;
+      DOMElements.enhancedGrid.querySelector('.image-card[data-type="enhanced"]') !== null;
     DOMElements.enhanceBtn.disabled = !isAppReady || !hasOriginals;
     DOMElements.clearBtn.disabled = !hasOriginals && !hasEnhanced;
     DOMElements.downloadAllBtn.disabled = !hasEnhanced;
   };
 
   const updateSystemInfo = (info) => {
-    DOMElements.gpuName.textContent = info.gpu_detected;
-    DOMElements.halfPrecision.textContent = info.half_precision
-      ? "Enabled"
-      : "Disabled";
+    DOMElements.gpuName.textContent = info.gpu_detected ?? "Detecting...";
+    DOMElements.halfPrecision.textContent =
+      info.half_precision === null
+        ? "Detecting..."
+        : info.half_precision
+        ? "Enabled"
+        : "Disabled";
   };
 
   const createNotification = (type, message, duration = 4000) => {
@@ -268,14 +288,16 @@ document.addEventListener("DOMContentLoaded", () => {
   const createImageCard = (filename, src, type) => {
     const card = document.createElement("div");
     card.className = "image-card";
+    card.dataset.type = type;
+    const actions = {
+      original: `<button class="action-btn-icon" data-remove="${filename}" title="Remove"><i class="fa-solid fa-xmark"></i></button>`,
+      preview: `<span class="action-btn-icon" title="Preview; the full result is on its way"><i class="fa-solid fa-spinner fa-spin"></i></span>`,
+      enhanced: `<a href="${src}" download="${filename}" class="action-btn-icon" title="Download"><i class="fa-solid fa-download"></i></a>`,
+    };
     card.innerHTML = `
             <img src="${src}" alt="${filename}" class="image-preview">
             <div class="image-actions">
-                ${
-                  type === "original"
-                    ? `<button class="action-btn-icon" data-remove="${filename}" title="Remove"><i class="fa-solid fa-xmark"></i></button>`
-                    : `<a href="${src}" download="${filename}" class="action-btn-icon" title="Download"><i class="fa-solid fa-download"></i></a>`
-                }
+                ${actions[type]}
             </div>`;
     if (type === "original") {
       card.querySelector("[data-remove]").addEventListener("click", (e) => {
@@ -297,19 +319,71 @@ document.addEventListener("DOMContentLoaded", () => {
     updateButtonStates();
   };
 
-  const displayEnhancedImages = (enhancedFiles) => {
-    DOMElements.enhancedGrid.innerHTML = "";
-    DOMElements.noEnhanced.style.display =
-      enhancedFiles.length > 0 ? "none" : "flex";
-    enhancedFiles.forEach((filename) => {
-      const src = `/output/${filename}?t=${Date.now()}`;
-      DOMElements.enhancedGrid.appendChild(
-        createImageCard(filename, src, "enhanced")
-      );
+  // Follows a job's events, showing each image's preview as soon as it arrives and replacing
+  // it with the full result when that is done. Resolves with the number of enhanced images.
+  const followJob = (job, notifId) =>
+    new Promise((resolve, reject) => {
+      DOMElements.enhancedGrid.innerHTML = "";
+      DOMElements.noEnhanced.style.display = "none";
+      switchTab("enhanced");
+      const cards = [];
+      const total = job.images.length;
+      let enhancedCount = 0;
+
+      const showImage = (index, image) => {
+        let card;
+        if (image.status === "done" && image.output) {
+          card = createImageCard(
+            image.output,
+            `/output/${image.output}?t=${Date.now()}`,
+            "enhanced"
+          );
+        } else if (image.status === "failed") {
+          // A failed image keeps no preview around.
+          if (cards[index]) cards[index].remove();
+          return;
+        } else if (image.preview) {
+          card = createImageCard(image.filename, `/preview/${image.preview}`, "preview");
+        } else {
+          return;
+        }
+        if (cards[index]) cards[index].replaceWith(card);
+        else DOMElements.enhancedGrid.appendChild(card);
+        cards[index] = card;
+        if (card.dataset.type === "enhanced") {
+          enhancedCount += 1;
+          updateNotification(
+            notifId,
+            "info",
+            `Enhancing... ${enhancedCount}/${total} done.`,
+            -1
+          );
+        }
+        updateButtonStates();
+      };
+
+      const eventSource = new EventSource(`/api/jobs/${job.job_id}/events`);
+      eventSource.onmessage = (event) => {
+        const data = JSON.parse(event.data);
+        if (data.event === "snapshot") {
+          data.images.forEach((image, index) => showImage(index, image));
+        } else if (data.event === "preview" || data.event === "image") {
+          showImage(data.index, data);
+        }
+        const finished =
+          data.status === "completed" || data.status === "failed";
+        if ((data.event === "job" || data.event === "snapshot") && finished) {
+          eventSource.close();
+          if (enhancedCount === 0)
+            DOMElements.noEnhanced.style.display = "flex";
+          resolve(enhancedCount);
+        }
+      };
+      eventSource.onerror = () => {
+        eventSource.close();
+        reject(new Error("Lost connection to the server."));
+      };
     });
-    updateButtonStates();
-    if (enhancedFiles.length > 0) switchTab("enhanced");
-  };
 
   const switchTab = (tabName) => {
     DOMElements.tabs.forEach((t) =>
@@ -335,19 +409,11 @@ document.addEventListener("DOMContentLoaded", () => {
   };
 
   const handleDownloadAll = () => {
-    fetch("/download_all", { method: "POST" })
-      .then((res) =>
-        res.ok ? res.blob() : Promise.reject("Failed to create ZIP.")
-      )
-      .then((blob) => {
-        const url = URL.createObjectURL(blob);
-        const a = document.createElement("a");
-        a.href = url;
-        a.download = "PicturePerfect_Enhanced.zip";
-        a.click();
-        URL.revokeObjectURL(url);
-      })
-      .catch((err) => createNotification("error", err));
+    // Navigating to the archive lets the browser save it as it streams in.
+    const a = document.createElement("a");
+    a.href = "/download_all";
+    a.download = "PicturePerfect_Enhanced.zip";
+    a.click();
   };
 
   // --- START THE APP ---
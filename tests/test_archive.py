@@ -0,0 +1,25 @@
+# tests/test_archive.py
+import io
+import zipfile
+
+from src.core.archive import stream_zip
+
+
+def test_streamed_zip_holds_every_file(tmp_path):
+    files = {"a.txt": b"hello " * 1000, "b.png": bytes(range(256)) * 40, "nested/c.json": b"{}"}
+    paths = []
+    for arcname, data in files.items():
+        path = tmp_path / arcname.replace("/", "_")
+        path.write_bytes(data)
+        paths.append((str(path), arcname))
+    paths.append((str(tmp_path / "missing.txt"), "missing.txt"))
+
+    chunks = list(stream_zip(paths, chunk_size=1024))
+
+    with zipfile.ZipFile(io.BytesIO(b"".join(chunks))) as archive:
+        assert archive.testzip() is None
+        assert archive.namelist() == list(files)
+        for arcname, data in files.items():
+            assert archive.read(arcname) == data
+        assert archive.getinfo("a.txt").compress_type == zipfile.ZIP_DEFLATED
+        assert archive.getinfo("b.png").compress_type == zipfile.ZIP_STORED
@@ -0,0 +1,148 @@
+# tests/test_batching.py
+import time
+import threading
+
+import numpy as np
+import pytest
+
+from src.core.batching import FaceBatcher
+
+
+class _Restorer:
+    """Stands in for the GFPGAN network: returns its input and records the batch sizes it saw."""
+
+    def __init__(self, error=None):
+        self.error = error
+        self.batches = []
+
+    def __call__(self, x):
+        self.batches.append(x.shape[0])
+        if self.error:
+            raise self.error
+        return x
+
+
+def _faces(*values):
+    return [np.full((8, 8, 3), value, dtype=np.uint8) for value in values]
+
+
+def _values(faces):
+    return [int(face[0, 0, 0]) for face in faces]
+
+
+@pytest.fixture
+def make_batcher():
+    batchers = []
+
+    def make(restorer, **kwargs):
+        batcher = FaceBatcher(restorer, "cpu", **kwargs)
+        batchers.append(batcher)
+        return batcher
+
+    yield make
+    for batcher in batchers:
+        batcher.close()
+
+
+def _restore_in_thread(batcher, faces, results, key, announced=True):
+    def run():
+        try:
+            results[key] = batcher.restore(faces, announced=announced)
+        except Exception as e:
+            results[key] = e
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+
+def test_announced_requests_share_a_batch_and_get_their_own_faces_back(make_batcher):
+    restorer = _Restorer()
+    batcher = make_batcher(restorer, max_batch_size=8, max_wait_ms=10_000)
+    results = {}
+    batcher.announce()
+    batcher.announce()
+
+    threads = [_restore_in_thread(batcher, _faces(10, 20), results, "a"),
+               _restore_in_thread(batcher, _faces(30, 40, 50), results, "b")]
+    for thread in threads:
+        thread.join(5)
+
+    assert restorer.batches == [5]
+    assert _values(results["a"]) == [10, 20]
+    assert _values(results["b"]) == [30, 40, 50]
+
+
+def test_large_requests_are_split_into_max_batch_size(make_batcher):
+    restorer = _Restorer()
+    batcher = make_batcher(restorer, max_batch_size=2)
+
+    restored = batcher.restore(_faces(1, 2, 3, 4, 5))
+
+    assert restorer.batches == [2, 2, 1]
+    assert _values(restored) == [1, 2, 3, 4, 5]
+
+
+def test_partial_batch_is_flushed_after_max_wait(make_batcher):
+    restorer = _Restorer()
+    batcher = make_batcher(restorer, max_batch_size=8, max_wait_ms=50)
+    batcher.announce()
+    batcher.announce()
+
+    start = time.monotonic()
+    restored = batcher.restore(_faces(7), announced=True)
+    elapsed = time.monotonic() - start
+    batcher.withdraw()
+
+    assert _values(restored) == [7]
+    assert restorer.batches == [1]
+    assert 0.04 <= elapsed < 5
+
+
+def test_withdraw_releases_a_waiting_batch(make_batcher):
+    restorer = _Restorer()
+    batcher = make_batcher(restorer, max_batch_size=8, max_wait_ms=10_000)
+    results = {}
+    batcher.announce()
+    batcher.announce()
+
+    start = time.monotonic()
+    thread = _restore_in_thread(batcher, _faces(9), results, "a")
+    time.sleep(0.05)
+    assert thread.is_alive()
+    batcher.withdraw()
+    thread.join(5)
+
+    assert time.monotonic() - start < 5
+    assert _values(results["a"]) == [9]
+
+
+def test_unrecoverable_error_reaches_every_waiter(make_batcher):
+    restorer = _Restorer(error=ValueError("bad batch"))
+    batcher = make_batcher(restorer, max_batch_size=8, max_wait_ms=10_000)
+    results = {}
+    batcher.announce()
+    batcher.announce()
+
+    threads = [_restore_in_thread(batcher, _faces(1), results, "a"),
+               _restore_in_thread(batcher, _faces(2, 3), results, "b")]
+    for thread in threads:
+        thread.join(5)
+
+    assert restorer.batches == [3]
+    assert all(isinstance(results[key], ValueError) for key in ("a", "b"))
+
+
+def test_inference_error_returns_the_faces_unrestored(make_batcher):
+    restorer = _Restorer(error=RuntimeError("out of memory"))
+    batcher = make_batcher(restorer)
+
+    assert _values(batcher.restore(_faces(4, 5))) == [4, 5]
+
+
+def test_restore_after_close_raises(make_batcher):
+    batcher = make_batcher(_Restorer())
+    batcher.close()
+
+    with pytest.raises(RuntimeError):
+        batcher.restore(_faces(1))
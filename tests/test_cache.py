@@ -0,0 +1,121 @@
+# tests/test_cache.py
+import os
+from types import SimpleNamespace
+
+import pytest
+
+from src.core.cache import ResultCache
+from src.core.enhancer import PicturePerfectEnhancer
+
+DATA = b"input image bytes"
+SIGNATURE = {
+    "upscale": 4,
+    "max_long_edge": None,
+    "background_mode": "realesrgan",
+    "face_model": "gfpgan-1.4",
+    "background_model": None,
+    "models": {"gfpgan-1.4": "0123456789abcdef"},
+    "precision": "fp32",
+    "encoding": {"fmt": "png", "quality": 90, "png_compression": 1},
+}
+
+
+@pytest.mark.parametrize("setting, value", [
+    ("upscale", 2),
+    ("max_long_edge", 2048),
+    ("background_mode", "resize"),
+    ("face_model", "gfpgan-1.3"),
+    ("background_model", "realesrgan-x2"),
+    ("models", {"gfpgan-1.4": "fedcba9876543210"}),
+    ("precision", "int8"),
+    ("encoding", {"fmt": "jpeg", "quality": 90, "png_compression": 1}),
+    ("encoding", {"fmt": "png", "quality": 80, "png_compression": 1}),
+])
+def test_key_changes_with_every_output_setting(setting, value):
+    assert ResultCache.key(DATA, {**SIGNATURE, setting: value}) != ResultCache.key(DATA, SIGNATURE)
+
+
+def test_key_depends_on_the_input_but_not_on_setting_order():
+    assert ResultCache.key(DATA, SIGNATURE) == ResultCache.key(DATA, dict(reversed(list(SIGNATURE.items()))))
+    assert ResultCache.key(DATA + b"!", SIGNATURE) != ResultCache.key(DATA, SIGNATURE)
+
+
+def _enhancer(tmp_path, **settings):
+    model_path = tmp_path / "GFPGANv1.4.pth"
+    if not model_path.exists():
+        model_path.write_bytes(b"weights")
+    config = SimpleNamespace(
+        REQUIRED_MODELS=[("GFPGAN", "GFPGANv1.4.pth", "", str(tmp_path), None)], OPTIONAL_MODELS=[],
+        FACE_MODEL_VARIANTS={"gfpgan-1.4": {"model": "GFPGAN", "arch": "clean", "channel_multiplier": 2}},
+        BACKGROUND_MODEL_VARIANTS={}, BACKGROUND_MODE="realesrgan", DEFAULT_FACE_MODEL="gfpgan-1.4",
+        AUTO_RESIZE_FACE_RATIO=0.3, AUTO_LIGHT_FACE_RATIO=0.1, CPU_PRECISION="fp32",
+    )
+    for name, value in settings.items():
+        setattr(config, name, value)
+    return PicturePerfectEnhancer(config), model_path
+
+
+def test_output_signature_tracks_the_model_file_and_settings(tmp_path):
+    enhancer, model_path = _enhancer(tmp_path)
+    signature = enhancer.output_signature(4)
+
+    assert enhancer.output_signature(4) == signature
+    assert enhancer.output_signature(2) != signature
+    assert enhancer.output_signature(4, background_mode="resize") != signature
+    assert _enhancer(tmp_path, CPU_PRECISION="int8")[0].output_signature(4) != signature
+
+    # A replaced checkpoint changes the fingerprint, so old results stop matching.
+    stat = os.stat(model_path)
+    os.utime(model_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert enhancer.output_signature(4) != signature
+
+
+def _source(tmp_path, name, size):
+    path = tmp_path / name
+    path.write_bytes(name.encode().ljust(size, b"."))
+    return str(path)
+
+
+def test_hit_copies_the_result_and_miss_reports_false(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache"), max_bytes=1000)
+    cache.put("k1", _source(tmp_path, "a", 100))
+    destination = tmp_path / "out.png"
+
+    assert cache.get("k1", str(destination))
+    assert destination.read_bytes() == (tmp_path / "a").read_bytes()
+    assert not cache.get("k2", str(tmp_path / "missing.png"))
+    assert not (tmp_path / "missing.png").exists()
+    assert {key: cache.stats()[key] for key in ("hits", "misses", "entries")} == {"hits": 1, "misses": 1, "entries": 1}
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache"), max_bytes=250)
+    cache.put("a", _source(tmp_path, "a", 100))
+    cache.put("b", _source(tmp_path, "b", 100))
+    assert cache.get("a", str(tmp_path / "hit.png"))  # "b" is now the least recently used.
+
+    cache.put("c", _source(tmp_path, "c", 100))
+
+    assert not cache.get("b", str(tmp_path / "b.png"))
+    assert cache.get("a", str(tmp_path / "a.png"))
+    assert cache.get("c", str(tmp_path / "c.png"))
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["size_bytes"] == 200
+    assert sorted(os.listdir(tmp_path / "cache")) == ["a.bin", "c.bin"]
+
+
+def test_entries_larger_than_the_cache_are_not_stored(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache"), max_bytes=50)
+    cache.put("big", _source(tmp_path, "big", 100))
+
+    assert not cache.get("big", str(tmp_path / "out.png"))
+
+
+def test_index_is_rebuilt_from_disk(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache"), max_bytes=1000)
+    cache.put("a", _source(tmp_path, "a", 100))
+
+    reopened = ResultCache(str(tmp_path / "cache"), max_bytes=1000)
+
+    assert reopened.stats()["entries"] == 1
+    assert reopened.get("a", str(tmp_path / "out.png"))
@@ -0,0 +1,83 @@
+# tests/test_cpu.py
+from types import SimpleNamespace
+
+import pytest
+
+from src.core import cpu
+from src.core.cpu import format_cores, numa_nodes, plan_workers, thread_plan
+
+CORES = list(range(8))
+
+
+def _summary(plans):
+    return [(plan.index, plan.threads, plan.cores) for plan in plans]
+
+
+def test_workers_split_the_cores_without_pinning():
+    assert _summary(plan_workers(2, cores=CORES)) == [(0, 4, None), (1, 4, None)]
+    assert _summary(plan_workers(3, cores=CORES)) == [(0, 2, None), (1, 2, None), (2, 2, None)]
+
+
+def test_every_worker_gets_at_least_one_thread():
+    assert [plan.threads for plan in plan_workers(12, cores=CORES)] == [1] * 12
+    assert len(plan_workers(0, cores=CORES)) == 1
+
+
+def test_threads_per_worker_overrides_the_split():
+    assert [plan.threads for plan in plan_workers(2, threads_per_worker=3, cores=CORES)] == [3, 3]
+
+
+def test_core_affinity_gives_each_worker_its_own_slice():
+    plans = plan_workers(2, affinity="cores", cores=CORES)
+
+    assert _summary(plans) == [(0, 4, [0, 1, 2, 3]), (1, 4, [4, 5, 6, 7])]
+    assert plans[1].to_dict() == {"threads": 4, "interop_threads": 1, "cores": "4-7"}
+
+
+def test_core_slices_wrap_when_threads_outnumber_the_cores():
+    plans = plan_workers(3, threads_per_worker=4, affinity="cores", cores=CORES)
+
+    assert [plan.cores for plan in plans] == [[0, 1, 2, 3], [4, 5, 6, 7], [0, 1, 2, 3]]
+
+
+def test_numa_affinity_spreads_workers_over_the_nodes(monkeypatch):
+    monkeypatch.setattr(cpu, "numa_nodes", lambda cores: [[0, 1, 2, 3], [4, 5, 6, 7]])
+
+    plans = plan_workers(3, affinity="numa", cores=CORES)
+
+    # Two workers share node 0, so each takes half of its cores; the third has node 1 to itself.
+    assert _summary(plans) == [(0, 2, [0, 1, 2, 3]), (1, 4, [4, 5, 6, 7]), (2, 2, [0, 1, 2, 3])]
+
+
+def test_numa_nodes_keep_only_usable_cores(monkeypatch, tmp_path):
+    for node, cpulist in enumerate(["0-3,8", "4-7"]):
+        (tmp_path / f"node{node}").mkdir()
+        (tmp_path / f"node{node}" / "cpulist").write_text(cpulist + "\n")
+    monkeypatch.setattr(cpu.glob, "glob", lambda pattern: sorted(str(p) for p in tmp_path.glob("node*/cpulist")))
+
+    assert numa_nodes([0, 1, 2, 3, 8]) == [[0, 1, 2, 3, 8]]
+    assert numa_nodes([2, 5]) == [[2], [5]]
+
+
+def test_numa_nodes_fall_back_to_one_group(monkeypatch):
+    monkeypatch.setattr(cpu.glob, "glob", lambda pattern: [])
+
+    assert numa_nodes(CORES) == [CORES]
+
+
+def test_format_cores():
+    assert format_cores([6, 0, 1, 2, 3, 9, 10]) == "0-3,6,9-10"
+
+
+def test_unknown_affinity_is_rejected():
+    with pytest.raises(ValueError):
+        plan_workers(2, affinity="sockets", cores=CORES)
+
+
+def test_thread_plan_shares_the_cores_between_inference_threads(monkeypatch):
+    monkeypatch.setattr(cpu, "usable_cores", lambda: CORES)
+    config = SimpleNamespace(INFERENCE_WORKERS=2, THREADS_PER_WORKER=None, INTEROP_THREADS=1)
+
+    plan = thread_plan(config)
+
+    assert (plan.threads, plan.interop_threads, plan.cores) == (4, 1, None)
@@ -0,0 +1,98 @@
+# tests/test_downloads.py
+import os
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.core import downloads
+
+DATA = os.urandom(300 * 1024)
+SHA256 = hashlib.sha256(DATA).hexdigest()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Serves DATA; the server's settings decide whether Range is honored and which responses are cut short."""
+
+    def do_GET(self):
+        server = self.server
+        server.ranges.append(self.headers.get("Range"))
+        offset = 0
+        if server.honor_range and self.headers.get("Range"):
+            offset = int(self.headers["Range"].split("=")[1].rstrip("-"))
+        body = DATA[offset:]
+        self.send_response(206 if offset else 200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if server.truncate:
+            # Announce the whole body, send part of it and drop the connection.
+            server.truncate -= 1
+            self.wfile.write(body[:len(body) // 3])
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    httpd.honor_range, httpd.truncate, httpd.ranges = True, 0, []
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(downloads.time, "sleep", lambda seconds: None)
+
+
+def _download(server, destination, sha256=SHA256):
+    url = f"http://127.0.0.1:{server.server_address[1]}/model.pth"
+    return list(downloads.download_file("model", url, str(destination), sha256=sha256, retries=2, timeout=5))
+
+
+def test_resumes_a_truncated_transfer_with_a_range_request(server, tmp_path):
+    server.truncate = 1
+    destination = tmp_path / "model.pth"
+
+    events = _download(server, destination)
+
+    assert events[-1]["status"] == "completed"
+    assert events[-1]["sha256"] == SHA256
+    assert destination.read_bytes() == DATA
+    assert not os.path.exists(f"{destination}.part")
+    # The retry picks up after the bytes that reached the partial file.
+    assert server.ranges[0] is None
+    assert 0 < int(server.ranges[1][len("bytes="):-1]) <= len(DATA) // 3
+
+
+def test_checksum_mismatch_rejects_the_file(server, tmp_path):
+    destination = tmp_path / "model.pth"
+
+    events = _download(server, destination, sha256="0" * 64)
+
+    assert events[-1]["status"] == "error"
+    assert "Checksum mismatch" in events[-1]["error_message"]
+    assert not destination.exists()
+    assert not os.path.exists(f"{destination}.part")
+
+
+def test_restarts_when_the_server_ignores_range(server, tmp_path):
+    server.honor_range = False
+    destination = tmp_path / "model.pth"
+    # A partial file from an earlier attempt whose bytes don't match the server's.
+    with open(f"{destination}.part", "wb") as f:
+        f.write(b"\0" * 1000)
+
+    events = _download(server, destination)
+
+    assert events[-1]["status"] == "completed"
+    assert server.ranges == ["bytes=1000-"]
+    assert destination.read_bytes() == DATA
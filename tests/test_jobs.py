@@ -0,0 +1,177 @@
+# tests/test_jobs.py
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src.core.jobs import JobQueueFull, JobScheduler
+
+
+def _items(count):
+    return [{"filename": f"{index}.png", "index": index} for index in range(count)]
+
+
+def _output(item, result=None):
+    return {"output": f"out-{item['index']}.png"}
+
+
+def _run(coroutine):
+    return asyncio.run(asyncio.wait_for(coroutine, timeout=10))
+
+
+async def _wait_until(condition):
+    while not condition():
+        await asyncio.sleep(0.01)
+
+
+@pytest.fixture
+def executors():
+    process, finish = ThreadPoolExecutor(max_workers=1), ThreadPoolExecutor(max_workers=1)
+    yield process, finish
+    process.shutdown(wait=False)
+    finish.shutdown(wait=False)
+
+
+def test_submit_rejects_jobs_beyond_the_queue(executors):
+    async def main():
+        scheduler = JobScheduler(lambda item, on_preview: _output(item), executors[0], num_workers=1,
+                                 max_queued_jobs=1, history_limit=10)
+        with pytest.raises(JobQueueFull):
+            scheduler.submit(_items(1))  # Not started yet.
+        await scheduler.start()
+        # The worker has not picked the first job up yet, so the queue is full.
+        scheduler.submit(_items(1))
+        with pytest.raises(JobQueueFull):
+            scheduler.submit(_items(1))
+        await scheduler.stop()
+
+    _run(main())
+
+
+def test_history_pruning_keeps_unfinished_jobs(executors):
+    release = threading.Event()
+
+    def process(item, on_preview):
+        release.wait(5)
+        return _output(item)
+
+    async def main():
+        scheduler = JobScheduler(process, executors[0], num_workers=1, max_queued_jobs=5, history_limit=1)
+        await scheduler.start()
+        running, queued = scheduler.submit(_items(1)), scheduler.submit(_items(1))
+        await _wait_until(lambda: running.status == "running")
+        assert list(scheduler.jobs) == [running.id, queued.id]
+
+        release.set()
+        await _wait_until(lambda: queued.is_finished)
+        latest = scheduler.submit(_items(1))
+        assert list(scheduler.jobs) == [latest.id]
+        await scheduler.stop()
+
+    _run(main())
+
+
+def test_subscribe_yields_snapshot_then_image_and_job_events(executors):
+    def process(item, on_preview):
+        on_preview({"preview": "p.jpg"})
+        return {"restored": True}
+
+    async def main():
+        scheduler = JobScheduler(process, executors[0], num_workers=1, max_queued_jobs=5, history_limit=10,
+                                 finish_fn=_output, finish_executor=executors[1])
+        await scheduler.start()
+        job = scheduler.submit(_items(1))
+        events = [event async for event in scheduler.subscribe(job.id)]
+        await scheduler.stop()
+        return job, events
+
+    job, events = _run(main())
+    assert [(event["event"], event.get("status")) for event in events] == [
+        ("snapshot", "queued"),
+        ("job", "running"),
+        ("image", "processing"),
+        ("preview", "processing"),
+        ("image", "done"),
+        ("job", "completed"),
+    ]
+    assert events[3]["preview"] == "p.jpg"
+    assert events[4]["output"] == "out-0.png"
+    assert job.images[0]["output"] == "out-0.png"
+
+
+def test_finishing_overlaps_processing_of_the_next_image(executors):
+    second_started = threading.Event()
+    overlapped = []
+
+    def process(item, on_preview):
+        if item["index"] == 1:
+            second_started.set()
+        return {}
+
+    def finish(item, result):
+        if item["index"] == 0:
+            overlapped.append(second_started.wait(5))
+        return _output(item)
+
+    async def main():
+        scheduler = JobScheduler(process, executors[0], num_workers=1, max_queued_jobs=5, history_limit=10,
+                                 finish_fn=finish, finish_executor=executors[1])
+        await scheduler.start()
+        job = scheduler.submit(_items(2))
+        await _wait_until(lambda: job.is_finished)
+        await scheduler.stop()
+        return job
+
+    job = _run(main())
+    assert overlapped == [True]
+    assert job.status == "completed"
+
+
+def test_results_waiting_for_finishing_are_bounded(executors):
+    timeline = []
+
+    def process(item, on_preview):
+        timeline.append(("process", item["index"]))
+        return {}
+
+    def finish(item, result):
+        time.sleep(0.05)
+        timeline.append(("finished", item["index"]))
+        return _output(item)
+
+    async def main():
+        scheduler = JobScheduler(process, executors[0], num_workers=1, max_queued_jobs=5, history_limit=10,
+                                 finish_fn=finish, finish_executor=executors[1], max_finishing=1)
+        await scheduler.start()
+        job = scheduler.submit(_items(3))
+        await _wait_until(lambda: job.is_finished)
+        await scheduler.stop()
+
+    _run(main())
+    # With one slot, image 2 is only processed once image 0 has been finished.
+    assert timeline.index(("process", 2)) > timeline.index(("finished", 0))
+    assert sorted(timeline) == [("finished", 0), ("finished", 1), ("finished", 2),
+                                ("process", 0), ("process", 1), ("process", 2)]
+
+
+def test_job_fails_when_no_image_succeeds(executors):
+    def process(item, on_preview):
+        if item["index"] == 0:
+            raise ValueError("unreadable image")
+        return {"output": None}
+
+    async def main():
+        scheduler = JobScheduler(process, executors[0], num_workers=1, max_queued_jobs=5, history_limit=10)
+        await scheduler.start()
+        job = scheduler.submit(_items(2))
+        events = [event async for event in scheduler.subscribe(job.id)]
+        await scheduler.stop()
+        return job, events
+
+    job, events = _run(main())
+    assert job.status == "failed"
+    assert [image["status"] for image in job.images] == ["failed", "failed"]
+    assert job.images[0]["error"] == "unreadable image"
+    assert events[-1] == {"event": "job", "job_id": job.id, "status": "failed", "progress": 100}
@@ -0,0 +1,42 @@
+# tests/test_metrics.py
+import sys
+import types
+import builtins
+
+import pytest
+
+from src.core import metrics
+
+
+@pytest.fixture
+def no_proc(monkeypatch):
+    real_open = builtins.open
+
+    def fake_open(path, *args, **kwargs):
+        if str(path).startswith("/proc/"):
+            raise FileNotFoundError(path)
+        return real_open(path, *args, **kwargs)
+
+    monkeypatch.setattr(builtins, "open", fake_open)
+
+
+def _fake_resource(monkeypatch, peak):
+    usage = types.SimpleNamespace(ru_maxrss=peak)
+    module = types.SimpleNamespace(RUSAGE_SELF=0, getrusage=lambda who: usage)
+    monkeypatch.setitem(sys.modules, "resource", module)
+
+
+def test_without_resource_module_reports_zero(no_proc, monkeypatch):
+    monkeypatch.setitem(sys.modules, "resource", None)
+    assert metrics.resident_memory_bytes() == 0
+
+
+@pytest.mark.parametrize("platform, expected", [("linux", 4096 * 1024), ("darwin", 4096)])
+def test_peak_rss_units_follow_the_platform(no_proc, monkeypatch, platform, expected):
+    _fake_resource(monkeypatch, 4096)
+    monkeypatch.setattr(metrics.sys, "platform", platform)
+    assert metrics.resident_memory_bytes() == expected
+
+
+def test_other_processes_without_proc_report_zero(no_proc):
+    assert metrics.resident_memory_bytes(pid=1) == 0
@@ -0,0 +1,67 @@
+# tests/test_precision.py
+import pytest
+import torch
+from torch import nn
+
+from src.core import precision
+from src.core.precision import check_precision, convert_with_check, resolve_cpu_precision, sample_inputs
+
+
+def _net():
+    torch.manual_seed(0)
+    return nn.Sequential(nn.Conv2d(3, 8, 3, padding=1), nn.ReLU(), nn.Conv2d(8, 3, 3, padding=1), nn.Sigmoid()).eval()
+
+
+INPUTS = sample_inputs(32)
+
+
+def test_identical_outputs_score_perfectly():
+    net = _net()
+
+    report = check_precision(net, net, INPUTS)
+
+    assert report["psnr"] == float("inf")
+    assert report["ssim"] == pytest.approx(1.0)
+
+
+def test_int8_is_kept_when_it_clears_the_psnr_floor():
+    net = _net()
+
+    module, used = convert_with_check(net, "int8", INPUTS, min_psnr=20.0, name="net")
+
+    assert used == "int8"
+    assert module is not net
+    assert not any(type(m) is nn.Conv2d for m in module.modules())
+
+
+def test_falls_back_to_fp32_below_the_psnr_floor():
+    net = _net()
+
+    module, used = convert_with_check(net, "int8", INPUTS, min_psnr=1000.0, name="net")
+
+    assert (module, used) == (net, "fp32")
+
+
+def test_falls_back_to_fp32_when_conversion_fails(monkeypatch):
+    def unsupported(module, precision):
+        raise RuntimeError("no kernel for this CPU")
+
+    monkeypatch.setattr(precision, "apply_cpu_precision", unsupported)
+    net = _net()
+
+    assert convert_with_check(net, "bf16", INPUTS, min_psnr=0.0, name="net") == (net, "fp32")
+
+
+def test_fp32_is_returned_unchanged():
+    net = _net()
+
+    assert convert_with_check(net, "fp32", INPUTS, min_psnr=1000.0, name="net") == (net, "fp32")
+
+
+def test_bf16_resolves_to_fp32_without_cpu_support(monkeypatch):
+    monkeypatch.setattr(precision, "bf16_supported", lambda: False)
+
+    assert resolve_cpu_precision("bf16") == "fp32"
+    assert resolve_cpu_precision("int8") == "int8"
+    with pytest.raises(ValueError):
+        resolve_cpu_precision("fp8")
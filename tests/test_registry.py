@@ -0,0 +1,53 @@
+# tests/test_registry.py
+from src.core.registry import ModelRegistry
+
+
+class _Model:
+    def __init__(self, name):
+        self.name = name
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def _registry(budget_bytes, sizes):
+    loads = []
+
+    def loader(name):
+        loads.append(name)
+        return _Model(name), sizes[name]
+
+    return ModelRegistry(loader, budget_bytes), loads
+
+
+def test_evicts_least_recently_used_variant():
+    registry, loads = _registry(100, {"a": 40, "b": 40, "c": 40})
+    with registry.use("a") as a:
+        pass
+    with registry.use("b"):
+        pass
+    with registry.use("a"):
+        pass
+    with registry.use("c"):
+        pass
+
+    assert registry.loaded() == ["a", "c"]
+    assert registry.resident_bytes() == 80
+    assert registry.stats()["evictions"] == 1
+    assert not a.closed
+
+    with registry.use("b"):
+        pass
+    assert loads == ["a", "b", "c", "b"]
+    assert a.closed
+
+
+def test_variants_in_use_are_not_evicted():
+    registry, _ = _registry(50, {"a": 40, "b": 40})
+    with registry.use("a") as a:
+        with registry.use("b"):
+            assert registry.loaded() == ["a", "b"]
+        assert not a.closed
+        assert registry.loaded() == ["a"]
+    assert registry.resident_bytes() == 40
@@ -0,0 +1,22 @@
+# tests/test_scaling.py
+from src.core.scaling import output_scale, plan_model_input
+
+
+def test_picks_smallest_native_scale_that_reaches_the_request():
+    assert plan_model_input(100, 200, 2, [4, 2]) == (2, None)
+    assert plan_model_input(100, 200, 3, [2, 4]) == (4, (150, 75))
+
+
+def test_shrinks_the_input_below_the_native_scale():
+    assert plan_model_input(100, 200, 2, [4]) == (4, (100, 50))
+    assert plan_model_input(1, 3, 0.5, [4]) == (4, (1, 1))
+
+
+def test_scales_beyond_every_model_use_the_largest():
+    assert plan_model_input(100, 200, 8, [2, 4]) == (4, None)
+
+
+def test_output_scale_respects_the_long_edge_limit():
+    assert output_scale(100, 200, 4) == 4
+    scale = output_scale(100, 200, 4, max_long_edge=500)
+    assert int(200 * scale) == 500
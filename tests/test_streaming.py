@@ -0,0 +1,30 @@
+# tests/test_streaming.py
+import cv2
+import numpy as np
+import pytest
+
+from src.core.streaming import PNGStripWriter
+
+
+def test_strips_decode_to_the_written_image(tmp_path):
+    image = np.random.RandomState(0).randint(0, 256, (37, 53, 3), dtype=np.uint8)
+    path = str(tmp_path / "out.png")
+
+    writer = PNGStripWriter(path, width=53, height=37)
+    for top in range(0, 37, 10):
+        writer.write(image[top:top + 10])
+    writer.close()
+
+    decoded = cv2.imread(path, cv2.IMREAD_UNCHANGED)
+    assert decoded.shape == image.shape
+    assert np.array_equal(decoded, image)
+
+
+def test_incomplete_image_is_discarded(tmp_path):
+    path = tmp_path / "out.png"
+    writer = PNGStripWriter(str(path), width=8, height=4)
+    writer.write(np.zeros((2, 8, 3), dtype=np.uint8))
+
+    with pytest.raises(ValueError):
+        writer.close()
+    assert list(tmp_path.iterdir()) == []
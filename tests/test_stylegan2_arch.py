@@ -0,0 +1,87 @@
+# tests/test_stylegan2_arch.py
+import pytest
+import torch
+
+from src.archs.stylegan2_arch import ModulatedConv2d, StyleConv, ToRGB
+
+
+def _fused_and_reference(module, *inputs, **kwargs):
+    module.eval()
+    with torch.no_grad():
+        module.apply(lambda m: setattr(m, "fused_modulation", False) if isinstance(m, ModulatedConv2d) else None)
+        reference = module(*inputs, **kwargs)
+        module.apply(lambda m: setattr(m, "fused_modulation", True) if isinstance(m, ModulatedConv2d) else None)
+        fused = module(*inputs, **kwargs)
+    return fused, reference
+
+
+@pytest.fixture(autouse=True)
+def seed():
+    torch.manual_seed(0)
+
+
+@pytest.mark.parametrize("batch", [1, 3])
+@pytest.mark.parametrize("sample_mode, kernel_size", [(None, 3), ("upsample", 3), ("upsample", 1), (None, 1)])
+def test_modulated_conv_matches_reference(batch, sample_mode, kernel_size):
+    conv = ModulatedConv2d(16, 8, kernel_size, num_style_feat=32, sample_mode=sample_mode)
+    x, style = torch.randn(batch, 16, 9, 7), torch.randn(batch, 32)
+
+    fused, reference = _fused_and_reference(conv, x, style)
+
+    assert fused.shape == reference.shape
+    assert torch.allclose(fused, reference, atol=1e-5)
+
+
+def test_upsampling_conv_folds_the_upsample():
+    assert ModulatedConv2d(16, 8, 3, 32, sample_mode="upsample").fold_upsample
+    assert not ModulatedConv2d(16, 8, 3, 32).fold_upsample
+
+
+@pytest.mark.parametrize("batch", [1, 2])
+@pytest.mark.parametrize("sample_mode", [None, "upsample"])
+def test_style_conv_matches_reference(batch, sample_mode):
+    layer = StyleConv(16, 8, 3, num_style_feat=32, sample_mode=sample_mode)
+    x, style = torch.randn(batch, 16, 8, 8), torch.randn(batch, 32)
+    size = 16 if sample_mode else 8
+    noise = torch.randn(batch, 1, size, size)
+
+    fused, reference = _fused_and_reference(layer, x, style, noise=noise)
+
+    assert torch.allclose(fused, reference, atol=1e-5)
+
+
+@pytest.mark.parametrize("batch", [1, 2])
+@pytest.mark.parametrize("upsample", [False, True])
+def test_to_rgb_matches_reference(batch, upsample):
+    layer = ToRGB(16, num_style_feat=32, upsample=upsample)
+    x, style = torch.randn(batch, 16, 8, 8), torch.randn(batch, 32)
+    skip = torch.randn(batch, 3, 4, 4) if upsample else torch.randn(batch, 3, 8, 8)
+
+    fused, reference = _fused_and_reference(layer, x, style, skip)
+
+    assert torch.allclose(fused, reference, atol=1e-5)
+
+
+def test_check_fused_modulation_reports_a_small_error():
+    conv = ModulatedConv2d(16, 8, 3, num_style_feat=32, sample_mode="upsample")
+    assert conv.check_fused_modulation() < 1e-4
+
+
+@pytest.mark.parametrize("batch", [1, 2])
+@pytest.mark.parametrize("sample_mode", [None, "upsample"])
+def test_clean_arch_layers_switched_to_fused_modulation_match(batch, sample_mode):
+    import copy
+
+    from gfpgan.archs.stylegan2_clean_arch import StyleConv as CleanStyleConv
+    from src.archs.stylegan2_arch import set_fused_modulation
+
+    reference = CleanStyleConv(16, 8, 3, num_style_feat=32, sample_mode=sample_mode).eval()
+    layer = copy.deepcopy(reference)
+    assert set_fused_modulation(layer) == 1
+    x, style = torch.randn(batch, 16, 8, 8), torch.randn(batch, 32)
+    size = 16 if sample_mode else 8
+    noise = torch.randn(batch, 1, size, size)
+
+    with torch.no_grad():
+        assert torch.allclose(layer(x, style, noise=noise), reference(x, style, noise=noise), atol=1e-5)
+    assert isinstance(layer.modulated_conv, ModulatedConv2d)
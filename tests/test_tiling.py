@@ -0,0 +1,78 @@
+# tests/test_tiling.py
+import math
+
+import pytest
+
+from src.core.tiling import MAX_TILE_SIZE, MIN_TILE_SIZE, bytes_per_input_pixel, plan_tiles
+
+GIB = 2 ** 30
+
+
+def _peak_bytes(plan, scale=4, element_size=4):
+    """Activation memory of one tile batch, as the planner estimates it."""
+    window = min(plan.height, plan.tile_size + 2 * plan.tile_pad) * min(plan.width, plan.tile_size + 2 * plan.tile_pad)
+    return plan.batch_size * window * bytes_per_input_pixel(scale, element_size)
+
+
+def test_small_image_runs_in_one_pass():
+    plan = plan_tiles(100, 150, 4, free_bytes=GIB)
+
+    assert (plan.tile_size, plan.batch_size, plan.num_tiles) == (0, 1, 1)
+    assert plan.reason == "fits in memory"
+
+
+@pytest.mark.parametrize("free_gib", [0.5, 1, 2])
+def test_tiles_fit_in_the_memory_budget(free_gib):
+    plan = plan_tiles(2000, 3000, 4, free_bytes=int(free_gib * GIB), memory_fraction=0.5)
+
+    assert MIN_TILE_SIZE <= plan.tile_size <= MAX_TILE_SIZE
+    assert _peak_bytes(plan) <= free_gib * GIB * 0.5
+    assert plan.num_tiles == math.ceil(2000 / plan.tile_size) * math.ceil(3000 / plan.tile_size)
+
+
+def test_more_free_memory_means_larger_tiles():
+    sizes = [plan_tiles(2000, 3000, 4, free_bytes=free).tile_size for free in (GIB // 4, GIB, 4 * GIB)]
+
+    assert sizes == sorted(sizes) and sizes[0] < sizes[-1]
+
+
+def test_tiles_are_evened_out_across_the_image():
+    plan = plan_tiles(1000, 1500, 4, free_bytes=2 * GIB)
+
+    # No sliver at the right or bottom edge: the last tile is at least half as wide as the others.
+    for length, count in ((1500, plan.tiles_x), (1000, plan.tiles_y)):
+        assert length - (count - 1) * plan.tile_size >= plan.tile_size / 2
+
+
+def test_spare_memory_batches_tiles_up_to_max_batch():
+    plan = plan_tiles(4096, 4096, 4, free_bytes=64 * GIB, max_batch=4)
+
+    assert plan.tile_size == MAX_TILE_SIZE
+    assert plan.batch_size == 4
+    assert _peak_bytes(plan) <= 32 * GIB
+
+
+def test_half_precision_fits_larger_tiles():
+    fp32 = plan_tiles(2000, 3000, 4, free_bytes=GIB, element_size=4)
+    half = plan_tiles(2000, 3000, 4, free_bytes=GIB, element_size=2)
+
+    assert half.tile_size > fp32.tile_size
+
+
+def test_scarce_memory_uses_the_smallest_tile():
+    plan = plan_tiles(2000, 3000, 4, free_bytes=64 * 2 ** 20)
+
+    assert plan.tile_size == MIN_TILE_SIZE
+    assert plan.batch_size == 1
+
+
+def test_unknown_free_memory_falls_back_to_a_fixed_tile():
+    plan = plan_tiles(2000, 3000, 4, free_bytes=0, fallback_tile=400)
+
+    assert (plan.tile_size, plan.batch_size) == (400, 1)
+
+
+def test_requested_tile_size_is_kept():
+    assert plan_tiles(2000, 3000, 4, free_bytes=GIB, tile_size=0).tile_size == 0
+    plan = plan_tiles(2000, 3000, 4, free_bytes=64 * GIB, tile_size=300, max_batch=4)
+    assert (plan.tile_size, plan.batch_size, plan.reason) == (300, 4, "requested size")
@@ -0,0 +1,153 @@
+# tests/test_tracking.py
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+import cv2
+import numpy as np
+import pytest
+import torch
+
+from src.core.enhancer import PicturePerfectEnhancer
+from src.core.tracking import FaceTracker
+
+SIZE = 48
+
+
+def _texture(seed):
+    noise = np.random.RandomState(seed).randint(1, 255, (SIZE, SIZE, 3)).astype(np.uint8)
+    return cv2.GaussianBlur(noise, (5, 5), 0)
+
+
+def _frame(x, y, texture):
+    """A textured square standing in for a face at (x, y) on a black 160x120 frame."""
+    frame = np.zeros((120, 160, 3), dtype=np.uint8)
+    frame[y:y + SIZE, x:x + SIZE] = texture
+    return frame
+
+
+def _face(x, y):
+    """Detection box and five landmarks of the square at (x, y)."""
+    box = np.array([x, y, x + SIZE, y + SIZE, 0.99], dtype=np.float32)
+    landmarks = np.array([[14, 16], [34, 16], [24, 26], [16, 36], [32, 36]], dtype=np.float32) + [x, y]
+    return box, landmarks
+
+
+def test_tracks_a_moving_face():
+    texture = _texture(0)
+    tracker = FaceTracker()
+    box, landmarks = _face(40, 30)
+    tracker.reset(_frame(40, 30, texture), [box], [landmarks])
+
+    for step in range(1, 5):
+        x, y = 40 + 3 * step, 30 + 2 * step
+        det_faces, landmarks = tracker.track(_frame(x, y, texture))
+        box, points = _face(x, y)
+        np.testing.assert_allclose(det_faces[0][:4], box[:4], atol=0.1)
+        np.testing.assert_allclose(landmarks[0], points, atol=0.1)
+
+
+def test_reports_faces_lost_after_a_cut():
+    tracker = FaceTracker()
+    box, landmarks = _face(40, 30)
+    tracker.reset(_frame(40, 30, _texture(0)), [box], [landmarks])
+
+    assert tracker.track(_frame(44, 32, _texture(1))) is None
+
+
+def test_frames_without_faces_track_nothing():
+    tracker = FaceTracker()
+    tracker.reset(_frame(40, 30, _texture(0)), [], [])
+
+    assert tracker.track(_frame(44, 32, _texture(0))) == ([], [])
+
+
+class _FaceHelper:
+    """Stands in for facexlib's FaceRestoreHelper: 'detects' the textured square and crops it."""
+
+    def __init__(self):
+        self.detected_at = []
+        self.upscale_factor = 1
+        self.clean_all()
+
+    def face_parse(self, x):
+        return (torch.zeros(x.shape[0], 19, 512, 512),)
+
+    def set_upscale_factor(self, upscale_factor):
+        self.upscale_factor = upscale_factor
+
+    def clean_all(self):
+        self.det_faces, self.all_landmarks_5, self.affine_matrices, self.cropped_faces = [], [], [], []
+
+    def read_image(self, img):
+        self.input_img = img
+
+    def get_face_landmarks_5(self, only_center_face, eye_dist_threshold):
+        ys, xs = np.nonzero(self.input_img.any(axis=2))
+        box, landmarks = _face(xs.min(), ys.min())
+        self.det_faces, self.all_landmarks_5 = [box], [landmarks]
+        self.detected_at.append((int(xs.min()), int(ys.min())))
+
+    def align_warp_face(self):
+        for box in self.det_faces:
+            matrix = np.array([[1, 0, -box[0]], [0, 1, -box[1]]], dtype=np.float32)
+            self.affine_matrices.append(matrix)
+            self.cropped_faces.append(cv2.warpAffine(self.input_img, matrix, (SIZE, SIZE)))
+
+
+class _Models:
+    """Registry and face batcher in one: restoring returns the crops unchanged and keeps them."""
+
+    def __init__(self):
+        self.crops = []
+
+    @contextmanager
+    def use(self, name):
+        yield self
+
+    def restore(self, crops):
+        self.crops.extend(crops)
+        return crops
+
+
+@pytest.fixture
+def enhancer():
+    config = SimpleNamespace(VIDEO_DETECT_INTERVAL=10, VIDEO_FRAME_WINDOW=2, BACKGROUND_MODE="resize",
+                             DEFAULT_FACE_MODEL="gfpgan-1.4", FACE_BATCH_SIZE=8)
+    enhancer = PicturePerfectEnhancer(config)
+    enhancer.device, enhancer.models, enhancer.is_initialized = "cpu", _Models(), True
+    enhancer.available_variants = lambda kind, family=None: ["gfpgan-1.4"]
+    enhancer.face_helper = _FaceHelper()
+    enhancer._face_helper_pool.put(enhancer.face_helper)
+    return enhancer
+
+
+def _assert_crops_follow(crops, textures):
+    for crop, texture in zip(crops, textures):
+        assert np.abs(crop.astype(int) - texture).mean() < 2
+
+
+def test_clip_redetects_when_tracking_is_lost(enhancer):
+    first, second = _texture(0), _texture(1)
+    # Four frames of a face moving right, a cut to another face, then that face moving.
+    positions = [(40, 30, first), (43, 32, first), (46, 34, first), (49, 36, first),
+                 (90, 50, second), (92, 51, second)]
+    stats = {}
+
+    frames = list(enhancer.enhance_frames((_frame(*p) for p in positions), 1, stats=stats))
+
+    assert len(frames) == 6 and frames[0].shape == (120, 160, 3)
+    assert enhancer.face_helper.detected_at == [(40, 30), (90, 50)]
+    assert (stats["frames"], stats["detections"], stats["tracked"], stats["faces"]) == (6, 2, 4, 6)
+    _assert_crops_follow(enhancer.models.crops, [texture for *_, texture in positions])
+
+
+def test_clip_redetects_every_detect_interval(enhancer):
+    texture = _texture(0)
+    stats = {}
+
+    list(enhancer.enhance_frames((_frame(40 + 2 * i, 30, texture) for i in range(5)), 1,
+                                 detect_interval=2, stats=stats))
+
+    assert enhancer.face_helper.detected_at == [(40, 30), (44, 30), (48, 30)]
+    assert (stats["detections"], stats["tracked"]) == (3, 2)
+    _assert_crops_follow(enhancer.models.crops, [texture] * 5)
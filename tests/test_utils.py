@@ -0,0 +1,27 @@
+# tests/test_utils.py
+import pytest
+
+from src.core.utils import atomic_write
+
+
+def test_concurrent_writers_get_their_own_temporary_file(tmp_path):
+    path = tmp_path / "model.pth"
+    with atomic_write(str(path)) as first, atomic_write(str(path)) as second:
+        assert first != second
+        with open(first, "wb") as f:
+            f.write(b"first")
+        with open(second, "wb") as f:
+            f.write(b"second")
+    # Both complete; the last one moved into place wins, and no temporary file is left.
+    assert path.read_bytes() == b"first"
+    assert list(tmp_path.iterdir()) == [path]
+
+
+def test_failed_write_leaves_nothing_behind(tmp_path):
+    path = tmp_path / "out.png"
+    with pytest.raises(RuntimeError):
+        with atomic_write(str(path)) as temp_path:
+            with open(temp_path, "wb") as f:
+                f.write(b"partial")
+            raise RuntimeError("encoder failed")
+    assert list(tmp_path.iterdir()) == []
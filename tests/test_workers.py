@@ -0,0 +1,96 @@
+# tests/test_workers.py
+import threading
+import multiprocessing
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from src.core.workers import ProcessPoolEnhancer, _WorkerProcess, _serve_frames
+
+
+class _ClipEnhancer:
+    """Stands in for the enhancer inside an inference process: doubles each frame's pixel values."""
+
+    def __init__(self, fail_after=None):
+        self.fail_after = fail_after
+
+    def enhance_frames(self, frames, upscale_factor, stats=None, **options):
+        stats.update(frames=0, window=options["window"])
+        for frame in frames:
+            if stats["frames"] == self.fail_after:
+                raise ValueError("face model crashed")
+            stats["frames"] += 1
+            yield frame * 2
+
+
+@pytest.fixture
+def pool():
+    """A one-process pool whose 'process' is a thread serving clips over a pipe."""
+    parent_conn, child_conn = multiprocessing.Pipe()
+    clip_enhancer = _ClipEnhancer()
+
+    def serve():
+        while True:
+            message = child_conn.recv()
+            if message is None:
+                return
+            _serve_frames(clip_enhancer, child_conn, *message[1:])
+
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+    config = SimpleNamespace(CPU_AFFINITY=None, INTEROP_THREADS=1)
+    enhancer = ProcessPoolEnhancer(config, 1)
+    worker = _WorkerProcess(0, SimpleNamespace(is_alive=lambda: True, pid=0), parent_conn)
+    enhancer._processes.append(worker)
+    enhancer._idle.put(worker)
+    enhancer.is_initialized = True
+    enhancer.clip_enhancer = clip_enhancer
+    yield enhancer
+    parent_conn.send(None)
+    thread.join(5)
+
+
+def _frames(count):
+    return [np.full((4, 6, 3), index, dtype=np.uint8) for index in range(count)]
+
+
+def test_clip_frames_round_trip_in_order(pool):
+    stats = {}
+
+    enhanced = list(pool.enhance_frames(iter(_frames(5)), 2, window=3, stats=stats))
+
+    assert [int(frame[0, 0, 0]) for frame in enhanced] == [0, 2, 4, 6, 8]
+    assert stats == {"frames": 5, "window": 3}
+    assert pool._idle.qsize() == 1
+
+
+def test_clip_stopped_early_frees_the_process(pool):
+    clip = pool.enhance_frames(iter(_frames(5)), 2)
+    next(clip)
+    clip.close()
+
+    assert pool._idle.qsize() == 1
+    assert len(list(pool.enhance_frames(iter(_frames(2)), 2))) == 2
+
+
+def test_frame_source_errors_reach_the_caller(pool):
+    def frames():
+        yield from _frames(2)
+        raise ValueError("decode failed")
+
+    with pytest.raises(ValueError, match="decode failed"):
+        list(pool.enhance_frames(frames(), 2))
+
+    assert pool._idle.qsize() == 1
+    assert len(list(pool.enhance_frames(iter(_frames(2)), 2))) == 2
+
+
+def test_process_errors_are_raised(pool):
+    pool.clip_enhancer.fail_after = 1
+
+    with pytest.raises(RuntimeError, match="face model crashed"):
+        list(pool.enhance_frames(iter(_frames(3)), 2))
+
+    pool.clip_enhancer.fail_after = None
+    assert len(list(pool.enhance_frames(iter(_frames(2)), 2))) == 2